@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+asyncio execution mode of the bot
+
+Telegram updates and sends, Lighter RPCs and the fiat rate refresh share
+one event loop. The handlers of bot.py run on a few executor threads and
+reach the loop through LoopBridge, they are CPU-bound work (rendering,
+qr codes). The bot must be paired with ./bot.py first.
+"""
+import asyncio
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import telepot
+import bot as handlers
+import config_manager
+from aiolighterer import AsyncLighterer
+from lighterer import read_options
+from fiat_rate import REFRESH, RETRY
+from qr import FileIds
+from outbox import Outbox
+from dispatcher import chat_of
+from samples import Samples
+
+
+class LoopBridge:
+    """Blocking facade of an asyncio object for executor threads
+
+    Coroutine methods run on the loop, the caller waits for their result.
+    name_future(...) runs name(...) and returns a concurrent future, as
+    Lighterer does."""
+
+    def __init__(self, target, loop):
+        self._target = target
+        self._loop = loop
+
+    def _submit(self, method, *args, **kwargs):
+        return asyncio.run_coroutine_threadsafe(
+            method(*args, **kwargs), self._loop)
+
+    def __getattr__(self, name):
+        if name.endswith('_future'):
+            method = getattr(self._target, name[:-len('_future')])
+            return lambda *args, **kwargs: self._submit(
+                method, *args, **kwargs)
+        attr = getattr(self._target, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+        return lambda *args, **kwargs: self._submit(
+            attr, *args, **kwargs).result()
+
+
+class LoopDispatcher:
+    """Run the handler on the executor, in order for every chat
+
+    Messages selected by concurrent(msg) do not wait for the previous
+    messages of their chat. handle is the telepot.aio handler, depth and
+    wait_percentiles are the ones of dispatcher.Dispatcher."""
+
+    def __init__(self, handler, executor, concurrent=None):
+        self._handler = handler
+        self._executor = executor
+        self._concurrent = concurrent or (lambda msg: False)
+        self._locks = {}  # chat_id: [lock, handlers holding or waiting]
+        self._pending = 0
+        self._waits = Samples()
+
+    async def _run(self, msg, enqueued):
+        self._pending -= 1
+        self._waits.append(time.monotonic() - enqueued)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._handler, msg)
+        except Exception:
+            traceback.print_exc()
+
+    async def handle(self, msg):
+        if telepot.flavor(msg) not in ('chat', 'callback_query'):
+            return
+        enqueued = time.monotonic()
+        self._pending += 1
+        if self._concurrent(msg):
+            await self._run(msg, enqueued)
+            return
+        # asyncio locks are fair, messages keep their order
+        chat_id = chat_of(msg)
+        entry = self._locks.get(chat_id)
+        if entry is None:
+            entry = self._locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(msg, enqueued)
+        finally:
+            # Drop the lock of an idle chat, nobody holds or waits on it
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[chat_id]
+
+    def depth(self):
+        return self._pending
+
+    def wait_percentiles(self, *ps):
+        return self._waits.percentiles(*ps)
+
+
+async def refresh_rates(fiat, executor):
+    """Keep the rates warm, requests is blocking"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await loop.run_in_executor(executor, fiat.update)
+        await asyncio.sleep(REFRESH if fiat.age() < REFRESH else RETRY)
+
+
+async def main():
+    # telepot.aio needs a running loop at import
+    import telepot.aio
+    from telepot.aio.loop import MessageLoop
+
+    loop = asyncio.get_running_loop()
+    config = config_manager.load()
+    token = config.get('telegram', 'token', fallback=None)
+    authorized = config.getint('telegram', 'user', fallback=None)
+    if not token or not authorized:
+        print('Pair the bot with ./bot.py first')
+        return
+
+    workers = config.getint('telegram', 'workers', fallback=4)
+    executor = ThreadPoolExecutor(workers)
+
+    try:
+        cert = AsyncLighterer.read_cert(
+            config.get('lighter', 'cert', fallback=None))
+        macaroon = AsyncLighterer.read_macaroon(
+            config.get('lighter', 'macaroon', fallback=None))
+    except FileNotFoundError:
+        print('No cert and macaroon: use insecure connection')
+        cert = macaroon = None
+    lit = AsyncLighterer(
+        config.get('lighter', 'host', fallback=None),
+        config.get('lighter', 'port', fallback=None),
+        cert, macaroon, read_options(config['lighter']))
+    await lit.wait_ready()
+
+    fiat = handlers.build_fiat(config)
+    loop.create_task(refresh_rates(fiat, executor))
+
+    # Commands init calls Lighter, it must not block the loop
+    handlers.commands = await loop.run_in_executor(
+        executor, handlers.build_commands,
+        config, fiat, LoopBridge(lit, loop))
+    bot = telepot.aio.Bot(token)
+    handlers.bot = Outbox(LoopBridge(bot, loop))
+    handlers.authorized = authorized
+    handlers.qr_files = FileIds(
+        config.get('qr', 'cache', fallback='qr_cache.json'))
+    handlers.dispatcher = LoopDispatcher(
+        handlers.on_message, executor, handlers.is_read_only)
+
+    handlers.commands.watch_invoices(
+        lambda message: handlers.bot.sendMessage(authorized, message))
+
+    await MessageLoop(bot, handlers.dispatcher.handle).run_forever()
+    print('Listening ...')
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+asyncio interface to lighter, it mirrors lighterer.Lighterer
+"""
+import re
+import time
+import asyncio
+from grpc import aio
+from grpc import RpcError
+import lighter_pb2 as pb
+import lighter_pb2_grpc as pb_grpc
+from lighterer import (
+    LightererGrpc, RpcStats, DEFAULT_OPTIONS, channel_options,
+    method_timeout)
+
+
+class DeadlineInterceptor(aio.UnaryUnaryClientInterceptor):
+    """Set the default deadline to calls without one"""
+
+    def __init__(self, options):
+        self._options = options
+
+    async def intercept_unary_unary(self, continuation, client_call_details,
+                                    request):
+        if client_call_details.timeout is None:
+            client_call_details = client_call_details._replace(
+                timeout=method_timeout(
+                    self._options, client_call_details.method))
+        return await continuation(client_call_details, request)
+
+
+class StatsInterceptor(aio.UnaryUnaryClientInterceptor):
+    """Record every call in a RpcStats object"""
+
+    def __init__(self, stats):
+        self._stats = stats
+
+    async def intercept_unary_unary(self, continuation, client_call_details,
+                                    request):
+        method = client_call_details.method
+        if isinstance(method, bytes):
+            method = method.decode('ascii')
+        method = method.rsplit('/', 1)[-1]
+        start = time.monotonic()
+        call = await continuation(client_call_details, request)
+        try:
+            response = await call
+        except RpcError as error:
+            self._stats.record(
+                method, time.monotonic() - start, error.code().name)
+            raise
+        self._stats.record(
+            method, time.monotonic() - start, size=response.ByteSize())
+        return response
+
+
+class AsyncLightererGrpc:
+    """Connection must be created inside a running event loop"""
+
+    credentials_init = staticmethod(LightererGrpc.credentials_init)
+    read_cert = staticmethod(LightererGrpc.read_cert)
+    read_macaroon = staticmethod(LightererGrpc.read_macaroon)
+
+    def __init__(self, host, port, cert=None, macaroon=None, options=None):
+        assert isinstance(host, str)
+        assert isinstance(port, int) or re.match(r'^\d+$', port)
+        self._options = dict(DEFAULT_OPTIONS, **(options or {}))
+        self.stats = RpcStats()
+        interceptors = [
+            DeadlineInterceptor(self._options), StatsInterceptor(self.stats)]
+        if cert and macaroon:
+            self._channel = aio.secure_channel(
+                '{}:{}'.format(host, port),
+                self.credentials_init(cert, macaroon),
+                channel_options(self._options),
+                interceptors=interceptors)
+        else:
+            self._channel = aio.insecure_channel(
+                '{}:{}'.format(host, port), channel_options(self._options),
+                interceptors=interceptors)
+        self.stub = pb_grpc.LightningStub(self._channel)
+
+    async def wait_ready(self, timeout=None):
+        """Connect to lighter, return True if the channel is ready"""
+        if timeout is None:
+            timeout = self._options['connect_timeout']
+        try:
+            await asyncio.wait_for(self._channel.channel_ready(), timeout)
+        except asyncio.TimeoutError:
+            print('Lighter is not reachable, it will be retried on demand')
+            return False
+        return True
+
+    async def close_connection(self):
+        await self._channel.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close_connection()
+        return False
+
+
+class AsyncLighterer(AsyncLightererGrpc):
+    """asyncio interface to lighter"""
+
+    async def channelbalance(self):
+        request = pb.ChannelBalanceRequest()
+        return (await self.stub.ChannelBalance(request)).balance
+
+    async def checkinvoice(self, payment_hash):
+        request = pb.CheckInvoiceRequest(payment_hash=payment_hash)
+        return (await self.stub.CheckInvoice(request)).settled
+
+    async def createinvoice(
+            self, amount_bits=None, description=None, expiry_time=None,
+            min_final_cltv_expiry=None, fallback_addr=None):
+        request = pb.CreateInvoiceRequest(
+            amount_bits=amount_bits,
+            description=description,
+            expiry_time=expiry_time,
+            min_final_cltv_expiry=min_final_cltv_expiry,
+            fallback_addr=fallback_addr)
+        return await self.stub.CreateInvoice(request)
+
+    async def decodeinvoice(self, payment_request):
+        assert isinstance(payment_request, str)
+        request = pb.DecodeInvoiceRequest(payment_request=payment_request)
+        return await self.stub.DecodeInvoice(request)
+
+    async def getinfo(self):
+        request = pb.GetInfoRequest()
+        return await self.stub.GetInfo(request)
+
+    async def listchannels(self, active_only=False):
+        assert isinstance(active_only, bool)
+        request = pb.ListChannelsRequest(active_only=active_only)
+        return (await self.stub.ListChannels(request)).channels
+
+    async def listinvoices(
+            self, max_items=200, search_timestamp=None,
+            search_order='ASCENDING', list_order='ASCENDING', paid=False,
+            pending=False, expired=False):
+        assert search_order in ('ASCENDING', 'DESCENDING')
+        assert list_order in ('ASCENDING', 'DESCENDING')
+        request = pb.ListInvoicesRequest(
+            max_items=max_items,
+            search_timestamp=search_timestamp,
+            search_order=search_order,
+            list_order=list_order,
+            paid=paid,
+            pending=pending,
+            expired=expired)
+        return (await self.stub.ListInvoices(request)).invoices
+
+    async def listpayments(self):
+        request = pb.ListPaymentsRequest()
+        return await self.stub.ListPayments(request)
+
+    async def listpeers(self):
+        request = pb.ListPeersRequest()
+        return (await self.stub.ListPeers(request)).peers
+
+    async def listtransactions(self):
+        request = pb.ListTransactionsRequest()
+        return (await self.stub.ListTransactions(request)).transactions
+
+    async def newaddress(self, address_type='P2WKH'):
+        assert address_type in ('P2WKH', 'NP2WKH')
+        request = pb.NewAddressRequest(type=address_type)
+        return (await self.stub.NewAddress(request)).address
+
+    async def openchannel(
+            self, node_uri, funding_bits, push_bits=0, private=False):
+        assert re.match(r'[a-fA-F\d]{66}@[\da-zA-Z.-]+:\d+', node_uri)
+        request = pb.OpenChannelRequest(
+            node_uri=node_uri,
+            funding_bits=funding_bits,
+            push_bits=push_bits,
+            private=private)
+        return await self.stub.OpenChannel(request)
+
+    async def payinvoice(
+            self, payment_request, amount_bits=None, description=None,
+            cltv_expiry_delta=None):
+        request = pb.PayInvoiceRequest(
+            payment_request=payment_request,
+            amount_bits=amount_bits,
+            description=description,
+            cltv_expiry_delta=cltv_expiry_delta)
+        return (await self.stub.PayInvoice(request)).payment_preimage
+
+    async def payonchain(self, address, amount_bits, fee_sat_byte=None):
+        request = pb.PayOnChainRequest(
+            address=address,
+            amount_bits=amount_bits,
+            fee_sat_byte=fee_sat_byte)
+        return await self.stub.PayOnChain(request)
+
+    async def unlocklighter(self, password):
+        """Unlock Lighter, the Lightning service is available after it"""
+        request = pb.UnlockLighterRequest(password=password)
+        unlocker = pb_grpc.UnlockerStub(self._channel)
+        return await unlocker.UnlockLighter(request)
+
+    async def walletbalance(self):
+        request = pb.WalletBalanceRequest()
+        return (await self.stub.WalletBalance(request)).balance
+
+
+__all__ = [
+    'AsyncLighterer',
+    'RpcError',
+]
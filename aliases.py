@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Node aliases kept across restarts
+"""
+import json
+import os
+import threading
+import time
+
+
+class AliasStore:
+    """Aliases and colors of nodes, by pubkey
+
+    Updates are merged by their last_update timestamp: older data never
+    overwrites newer data. If path is provided the store is saved on disk
+    after every merge that changes it and it is loaded at creation."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._nodes = {}  # pubkey: [alias, color, last_update]
+        self.graph_updated = 0
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self._path, 'rt') as fd:
+                data = json.load(fd)
+        except (OSError, ValueError):
+            return
+        self._nodes = data.get('nodes', {})
+        self.graph_updated = data.get('graph_updated', 0)
+
+    def save(self):
+        if not self._path:
+            return
+        tmp = self._path + '.tmp'
+        with open(tmp, 'wt') as fd:
+            json.dump({
+                'nodes': self._nodes,
+                'graph_updated': self.graph_updated,
+            }, fd)
+        os.replace(tmp, self._path)
+
+    def get(self, pubkey, default=None):
+        node = self._nodes.get(pubkey)
+        return node[0] if node else default
+
+    def color(self, pubkey):
+        node = self._nodes.get(pubkey)
+        return node[1] if node else None
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, pubkey):
+        return pubkey in self._nodes
+
+    def merge(self, nodes):
+        """Merge (pubkey, alias, color, last_update) tuples,
+        return the number of changed nodes"""
+        changed = 0
+        with self._lock:
+            for pubkey, alias, color, last_update in nodes:
+                old = self._nodes.get(pubkey)
+                if old and old[2] >= last_update:
+                    continue
+                if not old or old[:2] != [alias, color]:
+                    changed += 1
+                self._nodes[pubkey] = [alias, color, last_update]
+            if changed:
+                self.save()
+        return changed
+
+    def merge_peers(self, peers, now=None):
+        """Merge Lighter ListPeers peers, they are fresh data"""
+        now = now or int(time.time())
+        return self.merge(
+            (peer.pubkey, peer.alias, peer.color, now)
+            for peer in peers if peer.alias)
+
+    def merge_graph(self, graph):
+        """Merge the nodes of lnd describegraph"""
+        changed = self.merge(
+            (node['pub_key'], node['alias'], node.get('color', ''),
+             int(node.get('last_update', 0)))
+            for node in graph['nodes'] if node.get('alias'))
+        with self._lock:
+            self.graph_updated = time.time()
+            self.save()
+        return changed
+
+
+__all__ = [
+    'AliasStore',
+]
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmarks, ./benchmarks.py [--save] [name ...]
+
+The Lighter of the config is used by the benchmarks of RPC paths, they
+are skipped if it is not reachable.
+The commands benchmark runs offline on mocked nodes of growing sizes and
+is compared with BASELINE, --save replaces it with the current results.
+Times depend on the machine, the baseline is not in the repository:
+save one with --save before changing the code.
+The fake benchmark loads a fakelighter server through the real Lighterer,
+with the fake_lighter section of the config.
+"""
+import json
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+import config_manager
+import lighter_pb2 as pb
+import bolt11
+import fakelighter
+from commands import Commands
+from fiat_rate import Fiat, Local
+from lighterer import Lighterer, read_options
+from mocker import get_lightning_stub, load
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'benchmarks.json')
+SIZES = (10, 1000, 10000)
+# Concurrent users and commands of each one of the fake benchmark
+USERS = 8
+USER_COMMANDS = 25
+# Slowdown and memory growth over the baseline flagged as regressions,
+# times are noisy while peaks and RPC counts are repeatable
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.1
+
+
+def timed(func, number=100, repeat=3):
+    """Best seconds per call"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(name, seconds):
+    print('{:<32} {:>12.1f} us'.format(name, seconds * 1e6))
+
+
+def connect():
+    """Lighter of the config, None if it is not reachable"""
+    config = config_manager.load()
+    host = config.get('lighter', 'host', fallback=None)
+    if not host:
+        return None
+    try:
+        cert = Lighterer.read_cert(
+            config.get('lighter', 'cert', fallback=None))
+        macaroon = Lighterer.read_macaroon(
+            config.get('lighter', 'macaroon', fallback=None))
+    except FileNotFoundError:
+        cert = macaroon = None
+    lit = Lighterer(
+        host, config.get('lighter', 'port', fallback=None), cert, macaroon,
+        read_options(config['lighter']))
+    return lit if lit.wait_ready() else None
+
+
+def bench_bolt11(lit):
+    pay_req = load()['pay_req']
+    report('bolt11.decode', timed(lambda: bolt11._decode.__wrapped__(pay_req)))
+    report('bolt11.decode, cached', timed(lambda: bolt11.decode(pay_req)))
+    if lit is None:
+        print('DecodeInvoice RPC: Lighter is not reachable, skipped')
+        return
+    # The stub skips the response cache of Lighterer
+    request = pb.DecodeInvoiceRequest(payment_request=pay_req)
+    report('DecodeInvoice RPC',
+           timed(lambda: lit.stub.DecodeInvoice(request), 20))
+
+
+def rpc_count(lit):
+    """Calls to the mocked Lighterer, futures wrap the blocking calls"""
+    return sum(
+        child.call_count for name, child in lit._mock_children.items()
+        if not name.endswith('_future'))
+
+
+def measure(lit, func):
+    """Cold call, RPCs and peak bytes, then best seconds of warm calls"""
+    lit.reset_mock()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    rpcs = rpc_count(lit)
+    number, _ = timeit.Timer(func).autorange()
+    return {
+        'seconds': timed(func, number),
+        'rpcs': rpcs,
+        'peak': peak,
+    }
+
+
+def regressions(result, base):
+    """Measures worse than the baseline"""
+    worse = []
+    if result['seconds'] > base['seconds'] * TIME_TOLERANCE:
+        worse.append('time')
+    if result['rpcs'] > base['rpcs']:
+        worse.append('rpcs')
+    if result['peak'] > base['peak'] * MEMORY_TOLERANCE:
+        worse.append('memory')
+    return worse
+
+
+def bench_commands(lit, sizes=SIZES):
+    pay_req = load()['pay_req']
+    fiat = Fiat(sources=[Local({'eur': 8000.})])
+
+    def decode():
+        bolt11._decode.cache_clear()
+        return commands.decode(pay_req)
+
+    results = {}
+    for size in sizes:
+        stub = get_lightning_stub(Mock(), size=size)
+        with patch('lighterer.Lighterer', Mock(return_value=stub)):
+            commands = Commands('fake', 0, None, None, fiat=fiat)
+        prefix = stub.listinvoices(1)[0].payment_hash[:8]
+        for name, func in (
+                ('channels', commands.channels),
+                ('chs', commands.chs),
+                ('info', commands.info),
+                ('balance', commands.balance),
+                ('decode', decode),
+                ('payment', lambda: commands.payment(prefix))):
+            key = 'commands.%s/%d' % (name, size)
+            results[key] = measure(stub, func)
+    return results
+
+
+def bench_fake(lit):
+    config = config_manager.load()
+    options = dict(config['fake_lighter']) \
+        if config.has_section('fake_lighter') else {}
+    options.setdefault('size', '1000')
+    options.setdefault('latency', 'lognormal 0.005 0.5')
+    with tempfile.TemporaryDirectory() as tmp:
+        # A new port and new credentials, the server of the config is free
+        options.update(
+            port='0', cert=os.path.join(tmp, 'cert'),
+            key=os.path.join(tmp, 'key'),
+            macaroon=os.path.join(tmp, 'macaroon'))
+        server, _, port = fakelighter.serve(options)
+        try:
+            commands = Commands(
+                '127.0.0.1', port, options['cert'], options['macaroon'],
+                fiat=Fiat(sources=[Local({'eur': 8000.})]))
+            mix = (commands.info, commands.balance, commands.chs,
+                   commands.payment)
+
+            def user(number):
+                for i in range(USER_COMMANDS):
+                    mix[(number + i) % len(mix)]()
+
+            start = timeit.default_timer()
+            with ThreadPoolExecutor(USERS) as executor:
+                list(executor.map(user, range(USERS)))
+            seconds = timeit.default_timer() - start
+            commands._lit.close_connection()
+        finally:
+            server.stop(None)
+    print('{} users, {} commands in {:.2f} s, {:.1f} commands/s'.format(
+        USERS, USERS * USER_COMMANDS, seconds,
+        USERS * USER_COMMANDS / seconds))
+    print(commands.stats())
+
+
+def compare(results, baseline):
+    """Print the results next to the baseline, return the regressions"""
+    def ratio(key, field):
+        base = baseline.get(key)
+        return '{:.0%}'.format(
+            results[key][field] / base[field]) if base else '-'
+
+    print('{:<26} {:>12} {:>6} {:>5} {:>10} {:>6}'.format(
+        'benchmark', 'time', 'base', 'rpcs', 'peak', 'base'))
+    flagged = 0
+    for key, result in results.items():
+        base = baseline.get(key)
+        worse = regressions(result, base) if base else []
+        flagged += bool(worse)
+        print('{:<26} {:>9.1f} us {:>6} {:>5} {:>7.0f} kB {:>6} {}'.format(
+            key, result['seconds'] * 1e6, ratio(key, 'seconds'),
+            result['rpcs'], result['peak'] / 1024, ratio(key, 'peak'),
+            ' '.join('!' + w for w in worse)))
+    return flagged
+
+
+def load_baseline(path=BASELINE):
+    try:
+        with open(path, 'rt') as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(results, path=BASELINE):
+    with open(path, 'wt') as fd:
+        json.dump(results, fd, indent=1, sort_keys=True)
+        fd.write('\n')
+
+
+BENCHMARKS = {
+    'bolt11': bench_bolt11,
+    'commands': bench_commands,
+    'fake': bench_fake,
+}
+
+
+def main(args):
+    save = '--save' in args
+    names = [arg for arg in args if arg != '--save']
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        print('Unknown benchmarks:', ', '.join(sorted(unknown)))
+        print('Available:', ', '.join(sorted(BENCHMARKS)))
+        return 1
+    lit = connect()
+    results = {}
+    for name in names or sorted(BENCHMARKS):
+        print('#', name)
+        results.update(BENCHMARKS[name](lit) or {})
+    if not results:
+        return 0
+    baseline = load_baseline()
+    if not baseline and not save:
+        print('No baseline, run with --save to store one')
+    flagged = compare(results, baseline)
+    if save:
+        baseline.update(results)
+        save_baseline(baseline)
+        print('Baseline saved to', BASELINE)
+        return 0
+    if flagged:
+        print(flagged, 'regressions over the baseline')
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+BOLT11 payment requests, without Lighter
+
+decode returns a DecodeInvoiceResponse, as Lighter DecodeInvoice does.
+The payee pubkey is recovered from the signature and checked against the
+n field when it is present.
+"""
+import hashlib
+import hmac
+import re
+import time
+from decimal import Decimal
+from functools import lru_cache
+import lighter_pb2 as pb
+
+CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+HRP = re.compile(r'^ln(bcrt|bc|tb|sb)(\d+)?([munp])?$')
+MULTIPLIERS = {
+    None: Decimal(1),
+    'm': Decimal('0.001'),
+    'u': Decimal('0.000001'),
+    'n': Decimal('0.000000001'),
+    'p': Decimal('0.000000000001'),
+}
+# Address version bytes of the base58 fallback addresses, by currency
+BASE58_VERSIONS = {
+    'bc': (0x00, 0x05),
+    'tb': (0x6f, 0xc4),
+    'bcrt': (0x6f, 0xc4),
+    'sb': (0x3f, 0x7d),
+}
+DEFAULT_EXPIRY = 3600
+DEFAULT_CLTV = 9
+SIGNATURE_WORDS = 104  # 65 bytes: r, s, recovery id
+
+TAGS = {
+    'p': 1, 'd': 13, 'h': 23, 'n': 19, 'x': 6, 'c': 24, 'f': 9, 'r': 3,
+}
+
+# secp256k1
+P = 2 ** 256 - 2 ** 32 - 977
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+     0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+
+
+class InvoiceError(ValueError):
+    pass
+
+
+# bech32
+
+
+def _polymod(values):
+    generator = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def _hrp_expand(hrp):
+    return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
+
+
+def bech32_decode(text):
+    """return hrp, 5 bit words without checksum, no length limit"""
+    if text.lower() != text and text.upper() != text:
+        raise InvoiceError('Mixed case')
+    text = text.lower()
+    pos = text.rfind('1')
+    if pos < 1 or pos + 7 > len(text):
+        raise InvoiceError('No separator')
+    hrp = text[:pos]
+    try:
+        data = [CHARSET.index(x) for x in text[pos + 1:]]
+    except ValueError:
+        raise InvoiceError('Not a bech32 character')
+    if _polymod(_hrp_expand(hrp) + data) != BECH32_CONST:
+        raise InvoiceError('Wrong checksum')
+    return hrp, data[:-6]
+
+
+def bech32_encode(hrp, data, const=BECH32_CONST):
+    values = _hrp_expand(hrp) + data
+    polymod = _polymod(values + [0] * 6) ^ const
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + '1' + ''.join(CHARSET[d] for d in data + checksum)
+
+
+def convertbits(data, frombits, tobits, pad=True):
+    acc = bits = 0
+    out = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            out.append((acc >> bits) & maxv)
+    if pad and bits:
+        out.append((acc << (tobits - bits)) & maxv)
+    return out
+
+
+def _words_int(words):
+    value = 0
+    for word in words:
+        value = value << 5 | word
+    return value
+
+
+def _int_words(value, length=None):
+    words = []
+    while value:
+        words.append(value & 31)
+        value >>= 5
+    words = words or [0]
+    if length:
+        words += [0] * (length - len(words))
+    return words[::-1]
+
+
+def _words_bytes(words):
+    """Bytes of the words, the trailing padding bits are dropped"""
+    return bytes(convertbits(words, 5, 8, False))
+
+
+# secp256k1, jacobian coordinates
+
+
+def _double(p):
+    x, y, z = p
+    if not y:
+        return 0, 0, 0
+    ysq = y * y % P
+    s = 4 * x * ysq % P
+    m = 3 * x * x % P
+    nx = (m * m - 2 * s) % P
+    ny = (m * (s - nx) - 8 * ysq * ysq) % P
+    return nx, ny, 2 * y * z % P
+
+
+def _add(p, q):
+    if not p[1]:
+        return q
+    if not q[1]:
+        return p
+    z1z1 = p[2] * p[2] % P
+    z2z2 = q[2] * q[2] % P
+    u1 = p[0] * z2z2 % P
+    u2 = q[0] * z1z1 % P
+    s1 = p[1] * q[2] * z2z2 % P
+    s2 = q[1] * p[2] * z1z1 % P
+    if u1 == u2:
+        return _double(p) if s1 == s2 else (0, 0, 1)
+    h = u2 - u1
+    r = s2 - s1
+    h2 = h * h % P
+    h3 = h * h2 % P
+    u1h2 = u1 * h2 % P
+    nx = (r * r - h3 - 2 * u1h2) % P
+    ny = (r * (u1h2 - nx) - s1 * h3) % P
+    return nx, ny, h * p[2] * q[2] % P
+
+
+def _multiply(point, scalar):
+    result = (0, 0, 1)
+    addend = (point[0], point[1], 1)
+    while scalar:
+        if scalar & 1:
+            result = _add(result, addend)
+        addend = _double(addend)
+        scalar >>= 1
+    return result
+
+
+def _affine(p):
+    if not p[1]:
+        raise InvoiceError('Point at infinity')
+    zinv = pow(p[2], -1, P)
+    return p[0] * zinv ** 2 % P, p[1] * zinv ** 3 % P
+
+
+def _compress(point):
+    x, y = point
+    return bytes([2 + (y & 1)]) + x.to_bytes(32, 'big')
+
+
+def pubkey_of(privkey):
+    """Compressed pubkey of a 32 bytes private key"""
+    return _compress(_affine(_multiply(G, int.from_bytes(privkey, 'big'))))
+
+
+def recover(digest, signature):
+    """Compressed pubkey of the 65 bytes signature r, s, recovery id"""
+    r = int.from_bytes(signature[:32], 'big')
+    s = int.from_bytes(signature[32:64], 'big')
+    recid = signature[64]
+    if not 0 < r < N or not 0 < s < N or recid > 3:
+        raise InvoiceError('Invalid signature')
+    x = r + N if recid & 2 else r
+    if x >= P:
+        raise InvoiceError('Invalid signature')
+    ysq = (pow(x, 3, P) + 7) % P
+    y = pow(ysq, (P + 1) // 4, P)
+    if y * y % P != ysq:
+        raise InvoiceError('Invalid signature')
+    if y & 1 != recid & 1:
+        y = P - y
+    e = int.from_bytes(digest, 'big')
+    rinv = pow(r, -1, N)
+    point = _add(
+        _multiply((x, y), s * rinv % N), _multiply(G, -e * rinv % N))
+    return _compress(_affine(point))
+
+
+def sign(digest, privkey):
+    """65 bytes signature r, s, recovery id, RFC6979 nonce, low s"""
+    d = int.from_bytes(privkey, 'big')
+    v, k = b'\x01' * 32, b'\x00' * 32
+    k = hmac.new(k, v + b'\x00' + privkey + digest, hashlib.sha256).digest()
+    v = hmac.new(k, v, hashlib.sha256).digest()
+    k = hmac.new(k, v + b'\x01' + privkey + digest, hashlib.sha256).digest()
+    v = hmac.new(k, v, hashlib.sha256).digest()
+    while True:
+        v = hmac.new(k, v, hashlib.sha256).digest()
+        nonce = int.from_bytes(v, 'big')
+        if 0 < nonce < N:
+            x, y = _affine(_multiply(G, nonce))
+            r = x % N
+            s = pow(nonce, -1, N) * (int.from_bytes(digest, 'big') + r * d) % N
+            if r and s:
+                break
+        k = hmac.new(k, v + b'\x00', hashlib.sha256).digest()
+        v = hmac.new(k, v, hashlib.sha256).digest()
+    recid = (y & 1) | (2 if x >= N else 0)
+    if s > N // 2:
+        s = N - s
+        recid ^= 1
+    return r.to_bytes(32, 'big') + s.to_bytes(32, 'big') + bytes([recid])
+
+
+# Fallback addresses
+
+
+def _base58check(version, payload):
+    alphabet = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+    data = bytes([version]) + payload
+    data += hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4]
+    value = int.from_bytes(data, 'big')
+    out = ''
+    while value:
+        value, mod = divmod(value, 58)
+        out = alphabet[mod] + out
+    return '1' * (len(data) - len(data.lstrip(b'\x00'))) + out
+
+
+def _fallback_address(currency, words):
+    version, program = words[0], _words_bytes(words[1:])
+    if version == 17:
+        return _base58check(BASE58_VERSIONS[currency][0], program)
+    if version == 18:
+        return _base58check(BASE58_VERSIONS[currency][1], program)
+    if version <= 16:
+        const = BECH32_CONST if version == 0 else BECH32M_CONST
+        return bech32_encode(
+            currency, [version] + convertbits(program, 8, 5), const)
+    return ''
+
+
+# Invoices
+
+
+def _route_hint(data):
+    route = pb.RouteHint()
+    for i in range(0, len(data) - 50, 51):
+        hop = data[i:i + 51]
+        scid = int.from_bytes(hop[33:41], 'big')
+        route.hop_hints.add(
+            pubkey=hop[:33].hex(),
+            short_channel_id='{}x{}x{}'.format(
+                scid >> 40, scid >> 16 & 0xffffff, scid & 0xffff),
+            fee_base_msat=int.from_bytes(hop[41:45], 'big'),
+            fee_proportional_millionths=int.from_bytes(hop[45:49], 'big'),
+            cltv_expiry_delta=int.from_bytes(hop[49:51], 'big'))
+    return route
+
+
+def decode(pay_req):
+    """DecodeInvoiceResponse of a payment request, InvoiceError if it is
+    not valid"""
+    if pay_req.lower().startswith('lightning:'):
+        pay_req = pay_req[10:]
+    response = pb.DecodeInvoiceResponse()
+    response.CopyFrom(_decode(pay_req))
+    return response
+
+
+@lru_cache(maxsize=256)
+def _decode(pay_req):
+    """Decoded once, a message is checked and then shown"""
+    hrp, data = bech32_decode(pay_req)
+    match = HRP.match(hrp)
+    if not match:
+        raise InvoiceError('Not a payment request')
+    if len(data) < 7 + SIGNATURE_WORDS:
+        raise InvoiceError('Too short')
+    currency, amount, multiplier = match.groups()
+    response = pb.DecodeInvoiceResponse(
+        expiry_time=DEFAULT_EXPIRY, min_final_cltv_expiry=DEFAULT_CLTV)
+    if amount:
+        btc = Decimal(amount) * MULTIPLIERS[multiplier]
+        response.amount_bits = float(btc * 1000000)
+
+    signature = _words_bytes(data[-SIGNATURE_WORDS:])
+    data = data[:-SIGNATURE_WORDS]
+    response.timestamp = _words_int(data[:7])
+    payee = None
+    i = 7
+    while i + 3 <= len(data):
+        tag = CHARSET[data[i]]
+        length = data[i + 1] * 32 + data[i + 2]
+        words = data[i + 3:i + 3 + length]
+        i += 3 + length
+        if len(words) != length:
+            raise InvoiceError('Truncated field')
+        if tag == 'p' and length == 52:
+            response.payment_hash = _words_bytes(words).hex()
+        elif tag == 'd':
+            try:
+                response.description = _words_bytes(words).decode('utf-8')
+            except UnicodeDecodeError:
+                raise InvoiceError('Description is not utf-8')
+        elif tag == 'h' and length == 52:
+            response.description_hash = _words_bytes(words).hex()
+        elif tag == 'n' and length == 53:
+            payee = _words_bytes(words)
+        elif tag == 'x':
+            response.expiry_time = _words_int(words)
+        elif tag == 'c':
+            response.min_final_cltv_expiry = _words_int(words)
+        elif tag == 'f' and words:
+            response.fallback_addr = _fallback_address(currency, words)
+        elif tag == 'r':
+            response.route_hints.append(_route_hint(_words_bytes(words)))
+    if not response.payment_hash:
+        raise InvoiceError('No payment hash')
+
+    digest = hashlib.sha256(
+        hrp.encode('ascii') + bytes(convertbits(data, 5, 8))).digest()
+    pubkey = recover(digest, signature)
+    if payee is not None and payee != pubkey:
+        raise InvoiceError('Wrong signature')
+    response.destination_pubkey = pubkey.hex()
+    return response
+
+
+def _tagged(tag, words):
+    return [TAGS[tag], len(words) >> 5, len(words) & 31] + words
+
+
+def encode(privkey, payment_hash, amount_bits=None, timestamp=None,
+           description=None, description_hash=None, expiry_time=None,
+           min_final_cltv_expiry=None, currency='bc'):
+    """Signed payment request, privkey and the hashes are bytes"""
+    hrp = 'ln' + currency
+    if amount_bits:
+        # Amount in picobitcoin, the shortest unit with no remainder
+        amount = int(Decimal(str(amount_bits)) * 1000000)
+        for multiplier in ('p', 'n', 'u', 'm'):
+            if amount % 1000:
+                break
+            amount //= 1000
+        else:
+            multiplier = ''
+        hrp += '{}{}'.format(amount, multiplier)
+    if timestamp is None:
+        timestamp = int(time.time())
+    data = _int_words(timestamp, 7)
+    data += _tagged('p', convertbits(payment_hash, 8, 5))
+    if description is not None:
+        data += _tagged('d', convertbits(description.encode('utf-8'), 8, 5))
+    if description_hash is not None:
+        data += _tagged('h', convertbits(description_hash, 8, 5))
+    if expiry_time is not None:
+        data += _tagged('x', _int_words(expiry_time))
+    if min_final_cltv_expiry is not None:
+        data += _tagged('c', _int_words(min_final_cltv_expiry))
+    data += _tagged('n', convertbits(pubkey_of(privkey), 8, 5))
+    digest = hashlib.sha256(
+        hrp.encode('ascii') + bytes(convertbits(data, 5, 8))).digest()
+    data += convertbits(sign(digest, privkey), 8, 5)
+    return bech32_encode(hrp, data)
+
+
+__all__ = [
+    'InvoiceError',
+    'decode',
+    'encode',
+]
@@ -16,32 +16,50 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import time
-import tempfile
-import os
-import os.path
+import io
 import re
 from random import randint
 import telepot
 from telepot.loop import MessageLoop
+from telepot.namedtuple import InlineKeyboardMarkup, InlineKeyboardButton
+from telepot.exception import TelegramError
 from lnd import NodeException
-from commands import Commands, RpcError
-from fiat_rate import RateError
-from qr import decode, encode
+from commands import Commands, RpcError, BULK_CAP
+from fiat_rate import Fiat, RateError, SOURCES
+from qr import decode_all, render, FileIds
+from lighterer import read_options
+from aliases import AliasStore
+from ledger import PaymentsLedger, TransactionsLedger
+from dispatcher import Dispatcher, chat_of
+from outbox import Outbox, pool_connections
 import config_manager
 
 OVERT_COMMANDS = (
     'pay', 'balance', '1ml', 'lightblock', 'payment',
     'info', 'channels', 'chs', 'add', 'uri',
-    'address', 'decode',
+    'address', 'decode', 'payments', 'txs',
 )
 COVERT_COMMANDS = (
-    'ping', 'echo', 'unicode', 'help',
+    'ping', 'echo', 'unicode', 'help', 'stats', 'queue',
 )
 ALLOWED_COMMANDS = set(OVERT_COMMANDS + COVERT_COMMANDS)
+# They can run in parallel with previous messages of the chat
+READ_ONLY_COMMANDS = {
+    'balance', 'payment', 'info', 'channels', 'chs', 'uri', 'decode',
+    'payments', 'txs', 'ping', 'echo', 'unicode', 'help', 'stats', 'queue',
+}
 _24H = 60 * 60 * 24
+PAY_REQ = re.compile(r'(?:lightning:)?ln(?:bcrt|bc|tb|sb)[\da-z]+', re.I)
+DOCUMENT_TYPES = {'text/plain', 'text/csv'}
+MAX_DOCUMENT = 1024 * 1024
+# Bytes of the filter in the callback data, up to 64 bytes with
+# 'channels <page> <active_only> '
+MAX_CALLBACK_FILTER = 64 - len('channels 99999 0 ')
 
 bot = None
 commands = None
+dispatcher = None
+qr_files = FileIds()  # payload: file_id of the qr codes sent
 
 authorized = None
 challenge = None, None  # chat_id, challenge
@@ -73,6 +91,13 @@ def text(msg):
 
     if hasattr(commands, escape_cmd(cmd)):
         try:
+            if cmd == 'channels':
+                send_channels(chat_id, *tokens[1:2])
+                return
+            if cmd == 'pay' and len(tokens) > 2 and \
+                    is_pay_req(tokens[2], True):
+                bulk_pay(chat_id, tokens[1:])
+                return
             out = getattr(commands, escape_cmd(cmd))(*tokens[1:])
             if cmd == 'add' and is_pay_req(out[0], True):
                 send_qr(chat_id, out[0])
@@ -82,9 +107,7 @@ def text(msg):
             else:
                 if not isinstance(out, list):
                     out = [out]
-                for ou in out:
-                    if ou:
-                        bot.sendMessage(chat_id, ou)
+                bot.sendMessages(chat_id, out)
         except RpcError as exception:
             bot.sendMessage(chat_id, '\u274c ' + str(exception))
         except RateError:
@@ -134,6 +157,13 @@ def text(msg):
         bot.sendMessage(chat_id, 'pong')
     elif cmd == 'echo':
         bot.sendMessage(chat_id, ' '.join(tokens[1:]))
+    elif cmd == 'queue':
+        p50, p95 = dispatcher.wait_percentiles(50, 95)
+        rows = ['Queue depth: {}'.format(dispatcher.depth())]
+        if p50 is not None:
+            rows.append('Wait p50 {:.0f} ms, p95 {:.0f} ms'.format(
+                p50 * 1e3, p95 * 1e3))
+        bot.sendMessage(chat_id, '\n'.join(rows))
     elif cmd == 'unicode':
         encoded = ' '.join(tokens[1:]).encode(
             'unicode-escape').decode('ascii')
@@ -143,12 +173,31 @@ def text(msg):
     # ln.update_aliases()
 
 
+def photo_sizes(sizes):
+    """Photo sizes from the smallest"""
+    return sorted(sizes, key=lambda x: x.get(
+        'file_size', x.get('width', 0) * x.get('height', 0)))
+
+
+def decode_photo(sizes):
+    """Decode the qr codes of the smallest readable size of a photo"""
+    for size in photo_sizes(sizes):
+        buffer = io.BytesIO()
+        bot.download_file(size['file_id'], buffer)
+        buffer.seek(0)
+        data = decode_all(buffer)
+        if data:
+            return data
+    return []
+
+
 def photo(msg):
     content_type, chat_type, chat_id = telepot.glance(msg)
-    _, file = tempfile.mkstemp(prefix='unsafepay')
-    bot.download_file(msg['photo'][-1]['file_id'], file)
-    data = decode(file)
-    if data:
+    data = decode_photo(msg['photo'])
+    if len(data) > 1:
+        bulk_pay(chat_id, data)
+    elif data:
+        data = data[0]
         if is_pay_req(data):
             try:
                 bot.sendMessage(chat_id, commands.pay(data))
@@ -158,21 +207,111 @@ def photo(msg):
             bot.sendMessage(chat_id, 'The payment request is not valid')
     else:
         bot.sendMessage(chat_id, 'The qr code is not readable')
-    os.remove(file)
+
+
+def document(msg):
+    """Pay the payment requests of a text or csv file"""
+    content_type, chat_type, chat_id = telepot.glance(msg)
+    doc = msg['document']
+    if doc.get('mime_type') not in DOCUMENT_TYPES or \
+            doc.get('file_size', 0) > MAX_DOCUMENT:
+        bot.sendMessage(chat_id, 'Send payment requests in a text file')
+        return
+    buffer = io.BytesIO()
+    bot.download_file(doc['file_id'], buffer)
+    bulk_pay(chat_id, PAY_REQ.findall(buffer.getvalue().decode(
+        'utf-8', 'replace')))
+
+
+def bulk_pay(chat_id, pay_reqs):
+    if not pay_reqs:
+        bot.sendMessage(chat_id, 'No payment requests found')
+        return
+    try:
+        bot.sendMessage(chat_id, commands.bulkpay(*pay_reqs))
+    except RateError:
+        bot.sendMessage(chat_id, '\u274c Exchange rate is not available')
+
+
+def callback_filter(filter_by_alias):
+    """The filter cut to fit the callback data, on a character boundary"""
+    data = (filter_by_alias or '').encode('utf-8')[:MAX_CALLBACK_FILTER]
+    return data.decode('utf-8', 'ignore') or None
+
+
+def channels_keyboard(page, pages, filter_by_alias=None, active_only=False):
+    """Buttons of a page of channels, callback data is
+    channels <page> <active_only> <filter>"""
+    def data(page, active_only):
+        return 'channels {} {} {}'.format(
+            page, int(active_only), callback_filter(filter_by_alias) or '')
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(
+            text='\u25c0\ufe0f', callback_data=data(page - 1, active_only)))
+    buttons.append(InlineKeyboardButton(
+        text='all' if active_only else 'active',
+        callback_data=data(0, not active_only)))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton(
+            text='\u25b6\ufe0f', callback_data=data(page + 1, active_only)))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
+def send_channels(chat_id, filter_by_alias=None):
+    """First page of channels, the others are shown by editing it
+
+    A filter too long for the callback data is cut for every page, the
+    first one included, so that the pages agree."""
+    filter_by_alias = callback_filter(filter_by_alias)
+    out, page, pages = commands.channels_page(
+        0, filter_by_alias, refresh=True)
+    try:
+        bot.sendMessage(
+            chat_id, out,
+            reply_markup=channels_keyboard(page, pages, filter_by_alias))
+    except TelegramError as e:
+        print('Channels keyboard not sent:', e)
+        bot.sendMessage(chat_id, out)
+
+
+def callback_query(msg):
+    query_id, from_id, data = telepot.glance(msg, flavor='callback_query')
+    tokens = data.split(' ', 3)
+    if tokens[0] == 'channels' and len(tokens) == 4 and 'message' in msg:
+        filter_by_alias = tokens[3] or None
+        active_only = tokens[2] == '1'
+        out, page, pages = commands.channels_page(
+            int(tokens[1]), filter_by_alias, active_only)
+        message = msg['message']
+        try:
+            bot.editMessageText(
+                (message['chat']['id'], message['message_id']), out,
+                reply_markup=channels_keyboard(
+                    page, pages, filter_by_alias, active_only))
+        except TelegramError:
+            pass  # Message is not modified
+    bot.answerCallbackQuery(query_id)
 
 
 def send_qr(chat_id, data):
-    _, file = tempfile.mkstemp(prefix='unsafepay')
-    with open(file, 'wb') as fd:
-        encode(data, fd)
-    with open(file, 'rb') as fd:
-        bot.sendPhoto(chat_id, fd, data)
-    os.remove(file)
+    """Send the qr code of data, a qr code already sent is not uploaded
+    again"""
+    file_id = qr_files.get(data)
+    if file_id:
+        try:
+            bot.sendPhoto(chat_id, file_id, data)
+            return
+        except telepot.exception.TelegramError:
+            qr_files.discard(data)  # Not valid anymore, upload it again
+    sent = bot.sendPhoto(chat_id, ('qr.png', io.BytesIO(render(data))), data)
+    if sent and sent.get('photo'):
+        qr_files.set(data, sent['photo'][-1]['file_id'])
 
 
 def is_authorized(msg):
-    chat_id = msg['chat']['id']
-    return authorized == chat_id
+    return authorized == chat_of(msg)
 
 
 def is_paired():
@@ -188,7 +327,7 @@ def send_challenge(msg):
 
 def on_chat_message(msg):
     """ handle chat """
-    bot.sendMessage(msg['chat']['id'], '\U0001f916')
+    bot.typing(msg['chat']['id'])
     if not is_authorized(msg):
         if not is_paired():
             send_challenge(msg)
@@ -198,6 +337,27 @@ def on_chat_message(msg):
         text(msg)
     elif 'photo' in msg:
         photo(msg)
+    elif 'document' in msg:
+        document(msg)
+
+
+def on_message(msg):
+    """handle chat messages and callback queries"""
+    if telepot.flavor(msg) == 'callback_query':
+        if is_authorized(msg):
+            callback_query(msg)
+        else:
+            bot.answerCallbackQuery(msg['id'])
+    else:
+        on_chat_message(msg)
+
+
+def is_read_only(msg):
+    """Authorized text messages of read-only commands"""
+    if 'text' not in msg or not is_authorized(msg):
+        return False
+    tokens = msg['text'].lstrip('/').split()
+    return bool(tokens) and tokens[0].lower() in READ_ONLY_COMMANDS
 
 
 def is_pay_req(pay_req, weak=False):
@@ -207,22 +367,56 @@ def is_pay_req(pay_req, weak=False):
     return False
 
 
+def build_fiat(config):
+    currencies = config.get('fiat', 'currencies', fallback='eur')
+    sources = config.get('fiat', 'sources', fallback='kraken')
+    return Fiat(
+        config.get('fiat', 'cache', fallback='fiat_cache.json'),
+        [currency.strip() for currency in currencies.split(',')],
+        [SOURCES[source.strip()]() for source in sources.split(',')])
+
+
+def build_commands(config, fiat, lit=None):
+    """lit replaces the Lighterer connection made by Commands"""
+    host = config.get('lighter', 'host', fallback=None)
+    port = config.get('lighter', 'port', fallback=None)
+    cert_path = config.get('lighter', 'cert', fallback=None)
+    macaroon_path = config.get('lighter', 'macaroon', fallback=None)
+
+    options = read_options(config['lighter'])
+
+    aliases = AliasStore(
+        config.get('aliases', 'cache', fallback='aliases.json'))
+
+    payments = PaymentsLedger(
+        config.get('payments', 'cache', fallback='payments.jsonl'))
+    txs = TransactionsLedger(
+        config.get('txs', 'cache', fallback='txs.jsonl'))
+
+    bulk_cap = config.getint('pay', 'bulk_cap', fallback=BULK_CAP)
+
+    return Commands(
+        host, port, cert_path, macaroon_path, options, fiat, aliases, lit,
+        payments, txs, bulk_cap)
+
+
 def start():
     global bot
     global commands
+    global dispatcher
     global authorized
+    global qr_files
 
     config = config_manager.load()
 
     token = config.get('telegram', 'token', fallback=None)
     authorized = config.getint('telegram', 'user', fallback=None)
 
-    host = config.get('lighter', 'host', fallback=None)
-    port = config.get('lighter', 'port', fallback=None)
-    cert_path = config.get('lighter', 'cert', fallback=None)
-    macaroon_path = config.get('lighter', 'macaroon', fallback=None)
+    fiat = build_fiat(config)
+    fiat.start()
 
-    commands = Commands(host, port, cert_path, macaroon_path)
+    commands = build_commands(config, fiat)
+    qr_files = FileIds(config.get('qr', 'cache', fallback='qr_cache.json'))
 
     while not token:
         print('Talk with the BotFather on Telegram '
@@ -232,10 +426,15 @@ def start():
         config['telegram']['token'] = token
         config_manager.save(config)
 
-    bot = telepot.Bot(token)
+    workers = config.getint('telegram', 'workers', fallback=4)
+    pool_connections(workers + 1)  # + getUpdates
+    telegram = telepot.Bot(token)
+    bot = Outbox(telegram)
     # answerer = telepot.helper.Answerer(bot)
 
-    MessageLoop(bot, {'chat': on_chat_message}).run_as_thread()
+    dispatcher = Dispatcher(on_message, workers, is_read_only)
+    MessageLoop(telegram, {
+        'chat': dispatcher, 'callback_query': dispatcher}).run_as_thread()
     print('Listening ...')
 
     while not authorized:
@@ -257,9 +456,13 @@ def start():
             config_manager.save(config)
             bot.sendMessage(authorized, '\n'.join(msg))
 
+    commands.watch_invoices(
+        lambda message: bot.sendMessage(authorized, message))
+
     # Keep the program running.
     while 1:
         time.sleep(10)
 
 
-start()
+if __name__ == '__main__':
+    start()
@@ -1,4 +1,7 @@
 import os
+import hashlib
+import binascii
+from functools import lru_cache
 
 __location__ = os.path.realpath(
     os.path.join(os.getcwd(), os.path.dirname(__file__)))
@@ -7,3 +10,16 @@ __location__ = os.path.realpath(
 def read_cities():
     with open(os.path.join(__location__, 'cities.txt'), 'rt') as fd:
         return [x.strip() for x in fd.readlines()]
+
+
+@lru_cache(maxsize=1)
+def _cities():
+    return read_cities()
+
+
+@lru_cache(maxsize=4096)
+def city_of(pubkey):
+    """A city chosen by the hash of the pubkey"""
+    digest = hashlib.sha256(binascii.unhexlify(pubkey)).digest()
+    index = int.from_bytes(digest, byteorder='big', signed=False)
+    return _cities()[index % len(_cities())]
@@ -22,15 +22,28 @@ import re
 from decimal import Decimal
 import time
 import git
-import hashlib
 import threading
-import binascii
+from concurrent.futures import ThreadPoolExecutor
 from fiat_rate import Fiat, RateError
-from cities import read_cities
+from cities import city_of
+from aliases import AliasStore
+from snapshot import NodeSnapshot, ChannelView
+import bolt11
+from bolt11 import InvoiceError
+from invoices import InvoiceIndex, InvoiceWatcher, PAID as INVOICE_PAID, \
+    PENDING as INVOICE_PENDING
+from ledger import PaymentsLedger, TransactionsLedger, Syncer
 import lighterer  # module import is required by Lighterer mock
 from lighterer import RpcError
 
 _24H = 60 * 60 * 24
+ALIASES_MAX_AGE = 60 * 10
+CHANNELS_MAX_AGE = 60 * 5  # Of the view behind the pages of channels
+CHANNELS_PAGE = 5
+LEDGER_MAX_AGE = 60  # Between the syncs of the ledgers
+LEDGER_PAGE = 10
+BULK_WORKERS = 4  # Payments of a bulk pay in flight
+BULK_CAP = 1000000  # Max total of a bulk pay, in satoshis
 TX_LINK = 'https://www.smartbit.com.au/tx/%s'
 CH_LINK = 'https://1ml.com/channel/%s'
 CH_LINK_ALT = 'https://lightblock.me/lightning-channel/%s'
@@ -48,10 +61,10 @@ def to_sat_str(msats):
 
 def amt_to_sat(amt, fiat):
     """Get sat"""
-    symbol = fiat.SYMBOLS & set(amt)
-    if symbol:
-        eur = float(amt.replace(symbol.pop(), ''))
-        return fiat.to_satoshis(eur)
+    fiat_amt = fiat.parse(amt)
+    if fiat_amt:
+        value, currency = fiat_amt
+        return fiat.to_satoshis(value, currency=currency)
     if '.' in amt:
         return int(Decimal(amt) * Decimal(1e8))
     return int(amt)
@@ -59,10 +72,10 @@ def amt_to_sat(amt, fiat):
 
 def amt_to_bits(amt, fiat):
     """Get bits amount from btc, satoshis or fiat"""
-    symbol = set('€Ee') & set(amt)
-    if symbol:
-        eur = float(amt.replace(symbol.pop(), ''))
-        return fiat.to_bits(eur)
+    fiat_amt = fiat.parse(amt)
+    if fiat_amt:
+        value, currency = fiat_amt
+        return fiat.to_bits(value, currency=currency)
     if '.' in amt:
         return float(Decimal(amt) * Decimal(1e6))
     return int(amt) / 100
@@ -73,6 +86,35 @@ def bits_to_sats(bits):
     return int(bits * 100)
 
 
+def date_range(text):
+    """return start, end timestamps of a day like 2019-06-25 or of a month
+    like 2019-06, local time"""
+    try:
+        day = time.strptime(text, '%Y-%m-%d')
+        next_day = day.tm_year, day.tm_mon, day.tm_mday + 1
+    except ValueError:
+        day = time.strptime(text, '%Y-%m')
+        next_day = day.tm_year, day.tm_mon + 1, 1
+    return (
+        int(time.mktime(day)),
+        int(time.mktime(next_day + (0, 0, 0, 0, 0, -1))))
+
+
+def ledger_query(args):
+    """return start, end, page of [from [to]] [page] arguments"""
+    start = end = None
+    page = 1
+    dates = []
+    for arg in args:
+        if re.match(r'^\d+$', arg):
+            page = max(int(arg), 1)
+        else:
+            dates.append(date_range(arg))
+    if dates:
+        start, end = dates[0][0], dates[-1][1]
+    return start, end, page
+
+
 class Commands:
     """Execute commands"""
 
@@ -82,21 +124,38 @@ class Commands:
     ACTIVE = '\u26a1\ufe0f'
     NACTIVE = '\U0001f64a'
 
-    def __init__(self, host, port, cert_path, macaroon_path):
-        self._fiat = Fiat()
-        try:
-            cert = lighterer.Lighterer.read_cert(cert_path)
-            macaroon = lighterer.Lighterer.read_macaroon(macaroon_path)
-        except FileNotFoundError:
-            print('No cert and macaroon: use insecure connection')
-            cert = macaroon = None
-        self._lit = lighterer.Lighterer(host, port, cert, macaroon)
+    def __init__(self, host, port, cert_path, macaroon_path, options=None,
+                 fiat=None, aliases=None, lit=None, payments=None,
+                 txs=None, bulk_cap=BULK_CAP):
+        self._fiat = fiat or Fiat()
+        if lit is None:
+            try:
+                cert = lighterer.Lighterer.read_cert(cert_path)
+                macaroon = lighterer.Lighterer.read_macaroon(macaroon_path)
+            except FileNotFoundError:
+                print('No cert and macaroon: use insecure connection')
+                cert = macaroon = None
+            lit = lighterer.Lighterer(host, port, cert, macaroon, options)
+        self._lit = lit
         self._1ml = True
         self._lightblock = True
-        self.aliases = {}
-        self._cities = None
-        self._update_lock = threading.Lock()
+        self.aliases = aliases or AliasStore()
+        self._alias_worker = None
+        self._alias_wakeup = threading.Event()
+        self._worker_lock = threading.Lock()  # Of the start of the worker
+        self._update_lock = threading.Lock()  # Held during listpeers
         self._updated = 0
+        self._version = git.get_git_revision_short_hash()
+        self._active_flag = False  # Lighter provides Channel.active
+        self._channels_cache = None  # updated, view, aliases
+        self.invoices = InvoiceIndex()
+        self.bulk_cap = bulk_cap
+        self.payments_ledger = payments or PaymentsLedger()
+        self._payments_sync = Syncer(
+            lambda: self.payments_ledger.sync(self._lit), LEDGER_MAX_AGE)
+        self.txs_ledger = txs or TransactionsLedger()
+        self._txs_sync = Syncer(
+            lambda: self.txs_ledger.sync(self._lit), LEDGER_MAX_AGE)
         self.update_aliases()  # Lighter misses this
 
     def _command(self, *cmd):
@@ -111,31 +170,46 @@ class Commands:
         # raise NodeException(str(err, 'utf-8'))
 
     def update_aliases(self):
-        return
-
-        # with self._update_lock:
-        #     if time.time() - self._updated < _24H:
-        #         return
-        #     try:
-        #         graph = self._command('describegraph')
-        #     except NodeException as e:
-        #         print(e)
-        #         return
-        #     aliases = {}
-        #     for node in graph['nodes']:
-        #         aliases[node['pub_key']] = node['alias']
-        #     self.aliases = aliases
-        #     self._updated = time.time()
+        """Merge the aliases of the peers, Lighter has not the graph"""
+        with self._update_lock:
+            if time.time() - self._updated < ALIASES_MAX_AGE:
+                return
+            try:
+                peers = self._lit.listpeers()
+            except RpcError as e:
+                print(e)
+                return
+            self.aliases.merge_peers(peers)
+            self._updated = time.time()
+
+    def _alias_refresher(self):
+        while True:
+            self._alias_wakeup.wait()
+            self._alias_wakeup.clear()
+            self.update_aliases()
 
     def bg_update_aliases(self):
-        th = threading.Thread(target=lambda: self.update_aliases())
-        th.start()
+        """Wake up the refresh worker, it is started only once
+
+        Renders never wait for the listpeers of the worker."""
+        if time.time() - self._updated < ALIASES_MAX_AGE:
+            return
+        with self._worker_lock:
+            if self._alias_worker is None:
+                self._alias_worker = threading.Thread(
+                    target=self._alias_refresher, daemon=True)
+                self._alias_worker.start()
+        self._alias_wakeup.set()
 
     def info(self):
         """Get information about the node"""
-        info = self._lit.getinfo()
-        n_chs = len(self._lit.listchannels())
-        n_active_chs = len(self._lit.listchannels(True))
+        snapshot = NodeSnapshot(
+            self._lit, 'info', 'walletbalance', 'channelbalance',
+            *ChannelView.fields(self._active_flag))
+        info = snapshot.info
+        view = self._channel_view(snapshot)
+        n_chs = len(view)
+        n_active_chs = view.n_active
         rows = [info.alias]
         self._1ml and rows.append(ND_LINK % info.identity_pubkey)
         self._lightblock and rows.append(ND_LINK_ALT % info.identity_pubkey)
@@ -147,12 +221,11 @@ class Commands:
         #     rows.append('Pending channels: %s' % obj['num_pending_channels'])
         # FIXME: lighter error: unable to find node
         # FIXME: rows.append('Num peers: %s' % len(self._lit.listpeers()))
-        rows.append(self.uri())
+        rows.append(info.node_uri)
         rows.append('Block height: {}'.format(info.blockheight))
-        rows.append(self.balance())
-        commit = git.get_git_revision_short_hash()
-        if commit:
-            rows.append('Version: %s' % commit)
+        rows.append(self._balance(snapshot))
+        if self._version:
+            rows.append('Version: %s' % self._version)
         return '\n'.join(rows)
 
     def uri(self):
@@ -166,13 +239,15 @@ class Commands:
         """Pay an invoice
         tg> pay <payment request> [amt]
         If amt is a float it is considered a bitcoin amount, if amt is
-        an integer it is considered a satoshi amount"""
+        an integer it is considered a satoshi amount, amounts like 5€ or
+        $5 are fiat amounts"""
         if pay_req.lower().startswith('lightning:'):
             pay_req = pay_req[10:]
         amt_bits = None
         if amt:
             amt_bits = amt_to_bits(amt, self._fiat)
         preimage = self._lit.payinvoice(pay_req, amt and amt_bits)
+        self._payments_sync.wake(force=True)
         rows = ['Done: {}'.format(preimage)]
         # # TODO: error checking
         # if out['payment_error']:
@@ -196,24 +271,126 @@ class Commands:
 
         return '\n'.join(rows)
 
+    def _bulk_check(self, pay_reqs):
+        """return decoded invoices, problems"""
+        decoded, problems = [], []
+        hashes = set()
+        now = time.time()
+        for pay_req in pay_reqs:
+            short = pay_req[:24] + '...'
+            try:
+                invoice = bolt11.decode(pay_req)
+            except InvoiceError as error:
+                problems.append('{}: {}'.format(short, error))
+                continue
+            if not invoice.amount_bits:
+                problems.append('{}: no amount'.format(short))
+            elif invoice.timestamp + invoice.expiry_time < now:
+                problems.append('{}: expired'.format(short))
+            elif invoice.payment_hash in hashes:
+                problems.append('{}: duplicated'.format(short))
+            else:
+                hashes.add(invoice.payment_hash)
+                decoded.append((pay_req, invoice))
+        return decoded, problems
+
+    def bulkpay(self, *pay_reqs):
+        """Pay several invoices
+        tg> pay <payment request> <payment request> ...
+        They are all decoded first: nothing is paid if one of them is not
+        valid or if their total exceeds the bulk cap"""
+        pay_reqs = [
+            pay_req[10:] if pay_req.lower().startswith('lightning:')
+            else pay_req for pay_req in pay_reqs]
+        decoded, problems = self._bulk_check(pay_reqs)
+        total = sum(
+            bits_to_sats(invoice.amount_bits) for _, invoice in decoded)
+        if not problems and total > self.bulk_cap:
+            problems.append('Total {} btc exceeds the cap of {} btc'.format(
+                to_btc_str(total), to_btc_str(self.bulk_cap)))
+        if problems:
+            return '\n'.join(['\u274c Nothing paid'] + problems)
+
+        def pay(pay_req):
+            try:
+                self._lit.payinvoice(pay_req)
+            except RpcError as error:
+                return error.details() if hasattr(error, 'details') \
+                    else str(error)
+
+        with ThreadPoolExecutor(BULK_WORKERS) as executor:
+            errors = list(executor.map(pay, (pr for pr, _ in decoded)))
+
+        paid = [
+            invoice for (_, invoice), error in zip(decoded, errors)
+            if error is None]
+        try:
+            self.payments_ledger.sync(self._lit)
+        except RpcError:
+            pass
+        fees = [
+            self.payments_ledger.get(invoice.payment_hash)
+            for invoice in paid]
+        paid_sats = sum(bits_to_sats(invoice.amount_bits) for invoice in paid)
+        rows = ['Paid {}/{}, {} btc'.format(
+            len(paid), len(decoded), to_btc_str(paid_sats))]
+        if paid and all(fees):
+            rows.append('fees {} sat'.format(to_sat_str(
+                sum(payment['fee_base_msat'] for payment in fees))))
+        for (_, invoice), error in zip(decoded, errors):
+            if error is not None:
+                rows.append('\u274c {} {}'.format(
+                    invoice.payment_hash[:16], error))
+        return '\n'.join(rows)
+
     def add(self, amt=None):
         """Add invoice
         tg> add [amt]
         If amt is a float it is considered a bitcoin amount, if amt is
-        an integer it is considered a satoshi amount"""
+        an integer it is considered a satoshi amount, amounts like 5€ or
+        $5 are fiat amounts"""
         amt_bits = None
         if amt:
             amt_bits = amt_to_bits(amt, self._fiat)
         invoice = self._lit.createinvoice(amt and amt_bits, expiry_time=43200)
         return invoice.payment_request, invoice.payment_hash
 
+    def paid_message(self, invoice):
+        """Notification of a paid invoice"""
+        PAID = '\U0001f44d'
+        sats = bits_to_sats(invoice.amount_bits)
+        rows = ['%s %s' % (PAID, to_btc_str(sats) if sats else 'paid')]
+        fiat, _ = self._to_eur_str(sats)
+        fiat and rows.append(fiat)
+        invoice.description and rows.append(invoice.description)
+        rows.append(invoice.payment_hash)
+        return '\n'.join(rows)
+
+    def watch_invoices(self, notify):
+        """Call notify(message) when an invoice is paid"""
+        watcher = InvoiceWatcher(
+            self._lit, lambda invoice: notify(self.paid_message(invoice)),
+            index=self.invoices)
+        watcher.start()
+        return watcher
+
+    def _settled(self, invoice):
+        """Paid and expired invoices are final, Lighter is asked about
+        the pending ones"""
+        if invoice.state != INVOICE_PENDING:
+            return invoice.state == INVOICE_PAID
+        try:
+            return self._lit.checkinvoice(invoice.payment_hash)
+        except RpcError:
+            return False
+
     @staticmethod
     def __is_expired(expiration: int):
         return time.time() > expiration
 
-    def payment(self, payment_hash=None):
+    def payment(self, payment_hash=None, *words):
         """Check a payment status
-        tg> payment [payment_hash]
+        tg> payment [payment_hash|hash prefix|description words]
         If payment_hash is not provided the last payment will be checked
         """
         PAID = '\U0001f44d'
@@ -221,13 +398,32 @@ class Commands:
         NOT_FOUND = 'Invoice not found'
         if payment_hash and len(payment_hash) == 64 and \
                 re.match(r'^[\da-f]{64}$', payment_hash):
-            try:
-                settled = self._lit.checkinvoice(payment_hash)
-            except RpcError:
-                # FIXME: check the type of the error and manage only
-                # "Invoice not found"
+            invoice = self.invoices.get(payment_hash)
+            if invoice and invoice.state == INVOICE_PAID:
+                settled = True  # Final, Lighter is not asked
+            else:
+                try:
+                    settled = self._lit.checkinvoice(payment_hash)
+                except RpcError:
+                    # FIXME: check the type of the error and manage only
+                    # "Invoice not found"
+                    return NOT_FOUND
+        elif payment_hash:
+            if not self.invoices.synced:
+                self.invoices.sync(self._lit)
+            found = []
+            if re.match(r'^[\da-fA-F]+$', payment_hash):
+                found = self.invoices.by_prefix(payment_hash)
+            found = found or self.invoices.search(
+                ' '.join((payment_hash, ) + words))
+            if not found:
                 return NOT_FOUND
+            return '\n\n'.join('\n'.join(filter(None, [
+                PAID if self._settled(invoice) else NOT_PAID,
+                invoice.payment_hash,
+                invoice.description])) for invoice in found)
         else:
+            # The index lags behind the invoices just added
             # self, max_items=200, search_timestamp=None,
             # search_order='ASCENDING', list_order='ASCENDING', paid=False,
             # pending=False, expired=False):
@@ -235,7 +431,7 @@ class Commands:
             if not invoices:
                 return NOT_FOUND
             invoice = invoices[0]
-            settled = invoice.state == 0  # InvoiceState.PAID
+            settled = invoice.state == INVOICE_PAID
             payment_hash = invoice.payment_hash
 
         rows = [PAID if settled else NOT_PAID, payment_hash]
@@ -266,10 +462,88 @@ class Commands:
         #
         # return '\n'.join(rows)
 
+    def _ledger_page(self, ledger, syncer, args, name, summary, rows_of):
+        """A page of the records of a ledger, newest first, with the
+        summary(count, totals) rows"""
+        try:
+            start, end, page = ledger_query(args)
+        except ValueError:
+            return 'Dates are like 2019-06-25 or 2019-06'
+        syncer.wake()
+        if not ledger.synced:
+            syncer.wait(10)
+        count, totals = ledger.totals(start, end)
+        if not count:
+            return 'No ' + name
+        pages = (count + LEDGER_PAGE - 1) // LEDGER_PAGE
+        page = min(page, pages)
+        rows = summary(count, totals)
+        rows.append('page {}/{}'.format(page, pages))
+        for record in ledger.between(
+                start, end, (page - 1) * LEDGER_PAGE, LEDGER_PAGE):
+            rows.append('')
+            rows.append(time.strftime(
+                '%Y-%m-%d %H:%M', time.localtime(record['timestamp'])))
+            rows.extend(rows_of(record))
+        return '\n'.join(rows)
+
+    def payments(self, *args):
+        """List payments, newest first
+        tg> payments [from [to]] [page]
+        Dates are like 2019-06-25 or 2019-06, totals are of the dates"""
+        def summary(count, totals):
+            sats = bits_to_sats(totals['amount_bits'])
+            fiat, _ = self._to_eur_str(sats, template=' [%s]')
+            return [
+                '{} payments, {} btc{}'.format(
+                    count, to_btc_str(sats), fiat),
+                'fees {} sat'.format(to_sat_str(totals['fee_base_msat']))]
+
+        def rows_of(payment):
+            return [
+                '{} btc'.format(
+                    to_btc_str(bits_to_sats(payment['amount_bits']))),
+                payment['payment_hash']]
+
+        return self._ledger_page(
+            self.payments_ledger, self._payments_sync, args, 'payments',
+            summary, rows_of)
+
+    def txs(self, *args):
+        """List on-chain transactions, newest first
+        tg> txs [from [to]] [page]
+        Dates are like 2019-06-25 or 2019-06, totals are of the dates"""
+        def summary(count, totals):
+            sats = bits_to_sats(totals['amount_bits'])
+            fiat, _ = self._to_eur_str(abs(sats), template=' [%s]')
+            return [
+                '{} transactions, {} btc{}'.format(
+                    count, to_btc_str(sats), fiat),
+                'fees {} sat'.format(totals['fee_sat'])]
+
+        def rows_of(tx):
+            confirmations = tx['num_confirmations']
+            return [
+                '{} btc, fee {} sat'.format(
+                    to_btc_str(bits_to_sats(tx['amount_bits'])),
+                    tx['fee_sat']),
+                '{} confirmations'.format(
+                    confirmations if confirmations < TransactionsLedger.
+                    CONFIRMED else '%d+' % TransactionsLedger.CONFIRMED),
+                TX_LINK % tx['txid']]
+
+        return self._ledger_page(
+            self.txs_ledger, self._txs_sync, args, 'transactions',
+            summary, rows_of)
+
     def balance(self):
         """Walletbalance and channelbalance
         tg> balance"""
-        wallet = bits_to_sats(self._lit.walletbalance())
+        return self._balance(
+            NodeSnapshot(self._lit, 'walletbalance', 'channelbalance'))
+
+    def _balance(self, snapshot):
+        wallet = bits_to_sats(snapshot.walletbalance)
         rows = []
         show_fiat = True
         if float(wallet):
@@ -277,7 +551,7 @@ class Commands:
             eur_str, show_fiat = self._to_eur_str(wallet, show_fiat, ' [%s]')
             rows[-1] += eur_str
 
-        channel = bits_to_sats(self._lit.channelbalance())
+        channel = bits_to_sats(snapshot.channelbalance)
         if float(channel):
             rows.append('Channel balance: %s' % to_btc_str(channel))
             eur_str, show_fiat = self._to_eur_str(channel, show_fiat, ' [%s]')
@@ -289,24 +563,34 @@ class Commands:
         tg> address"""
         return self._lit.newaddress('P2WKH')
 
+    def resolve_aliases(self, pubkeys, default=None):
+        """Return {pubkey: alias}, with a not null alias or the default
+        or a city"""
+        self.bg_update_aliases()
+        return {
+            pubkey: self.aliases.get(pubkey) or default or
+            self._city_alias(pubkey)
+            for pubkey in pubkeys}
+
     def _alias(self, pubkey, default=None):
         """Return a not null alias or the pubkey"""
-        self.bg_update_aliases()
-        return self.aliases.get(pubkey) or default or self._city_alias(pubkey)
+        return self.resolve_aliases([pubkey], default)[pubkey]
 
     def _city_alias(self, pubkey):
         CITYSCAPE = '\U0001f3d9'
         CITY_DUSK = '\U0001f306'
-        if self._cities is None:
-            self._cities = read_cities()
-        city = self._cities[self._int_hash_pubkey(pubkey) % len(self._cities)]
         emoji = CITY_DUSK if self.aliases else CITYSCAPE
-        return emoji + ' ' + city
-
-    @staticmethod
-    def _int_hash_pubkey(pubkey):
-        hash = hashlib.sha256(binascii.unhexlify(pubkey)).digest()
-        return int.from_bytes(hash, byteorder='big', signed=False)
+        return emoji + ' ' + city_of(pubkey)
+
+    def _channel_view(self, snapshot=None):
+        """Channels from one fetch, or from two concurrent ones until
+        Lighter is known to provide the active flag"""
+        if snapshot is None:
+            snapshot = NodeSnapshot(
+                self._lit, *ChannelView.fields(self._active_flag))
+        view = ChannelView.from_snapshot(snapshot, self._active_flag)
+        self._active_flag = self._active_flag or view.has_active_flag
+        return view
 
     def _to_eur_str(self, sats, show_fiat=True, template='%s'):
         """return eur_str, show_fiat"""
@@ -320,60 +604,98 @@ class Commands:
                     show_fiat = False
         return eur, show_fiat
 
+    def _channel_card(self, ch, view, alias, show_fiat=True):
+        """return the message of a channel, show_fiat"""
+        rows = []
+        rows.append('%s %s%s' % (
+            alias,
+            self.ACTIVE if view.is_active(ch) else self.NACTIVE,
+            self.PRIVATE if ch.private else ''
+        ))
+        # FIXME: I don't know the undefined value of ch.chan_id
+        if not ch.private and ch.channel_id:
+            self._1ml and rows.append(CH_LINK % ch.channel_id)
+            self._lightblock and rows.append(
+                CH_LINK_ALT % ch.channel_id)
+        rows.append(to_btc_str(bits_to_sats(ch.capacity)))
+        local = bits_to_sats(ch.local_balance)
+        remote = bits_to_sats(ch.remote_balance)
+        local_str = to_btc_str(local)
+        remote_str = to_btc_str(remote)
+        local_eur, show_fiat = self._to_eur_str(
+            local, show_fiat, self.LOCAL + ' %s')
+        remote_eur, show_fiat = self._to_eur_str(
+            remote, show_fiat, self.REMOTE + ' %s')
+        rows.append('%s %s %s %s' % (
+            self.LOCAL, local_str, self.REMOTE, remote_str))
+        rows.append(local_eur + remote_eur)
+        rows.append(TX_LINK % ch.funding_txid[:64])
+        # [:64] -> Workaround: lighter bug
+        return '\n'.join(rows), show_fiat
+
+    @staticmethod
+    def _select(view, aliases, filter_by_alias=None, active_only=False):
+        return [
+            ch for ch in view
+            if (not filter_by_alias or filter_by_alias in (
+                aliases[ch.remote_pubkey] + ch.remote_pubkey))
+            and (not active_only or view.is_active(ch))]
+
     def channels(self, filter_by_alias=None, pending=False):
         """List channels
         tg> channles [filter]
         Specify a filter to select channels by aliases and pubkeys"""
         assert not pending, 'Not implemented'
-        chs = sorted(self._lit.listchannels(), key=lambda x: x.private)
-        active_channels = {ch.channel_id for ch in self._lit.listchannels(True)}
+        view = self._channel_view()
+        aliases = self.resolve_aliases(ch.remote_pubkey for ch in view)
         messages = []
         show_fiat = True
-        for ch in chs:
-            rows = []
-            pubkey = ch.remote_pubkey
-            alias = self._alias(pubkey)
-            if not filter_by_alias or filter_by_alias in alias + pubkey:
-                active = ch.channel_id in active_channels
-                rows.append('%s %s%s' % (
-                    alias,
-                    self.ACTIVE if active else self.NACTIVE,
-                    self.PRIVATE if ch.private else ''
-                ))
-                # FIXME: I don't know the undefined value of ch.chan_id
-                if not ch.private and ch.channel_id:
-                    self._1ml and rows.append(CH_LINK % ch.channel_id)
-                    self._lightblock and rows.append(
-                        CH_LINK_ALT % ch.channel_id)
-                rows.append(to_btc_str(bits_to_sats(ch.capacity)))
-                local = bits_to_sats(ch.local_balance)
-                remote = bits_to_sats(ch.remote_balance)
-                local_str = to_btc_str(local)
-                remote_str = to_btc_str(remote)
-                local_eur, show_fiat = self._to_eur_str(
-                    local, show_fiat, self.LOCAL + ' %s')
-                remote_eur, show_fiat = self._to_eur_str(
-                    remote, show_fiat, self.REMOTE + ' %s')
-                rows.append('%s %s %s %s' % (
-                    self.LOCAL, local_str, self.REMOTE, remote_str))
-                rows.append(local_eur + remote_eur)
-                rows.append(TX_LINK % ch.funding_txid[:64])
-                # [:64] -> Workaround: lighter bug
-                messages.append('\n'.join(rows))
+        for ch in self._select(view, aliases, filter_by_alias):
+            message, show_fiat = self._channel_card(
+                ch, view, aliases[ch.remote_pubkey], show_fiat)
+            messages.append(message)
         return messages
 
+    def channels_page(self, page=0, filter_by_alias=None, active_only=False,
+                      refresh=False):
+        """return message, page, pages: a page of the channels
+
+        Only the cards of the page are rendered, the channels and their
+        aliases are fetched again if refresh or older than
+        CHANNELS_MAX_AGE."""
+        cache = self._channels_cache
+        if refresh or not cache or \
+                time.time() - cache[0] > CHANNELS_MAX_AGE:
+            view = self._channel_view()
+            aliases = self.resolve_aliases(ch.remote_pubkey for ch in view)
+            cache = self._channels_cache = time.time(), view, aliases
+        _, view, aliases = cache
+        selected = self._select(view, aliases, filter_by_alias, active_only)
+        if not selected:
+            return 'No channels', 0, 1
+        pages = (len(selected) + CHANNELS_PAGE - 1) // CHANNELS_PAGE
+        page = min(max(page, 0), pages - 1)
+        messages = []
+        show_fiat = True
+        for ch in selected[page * CHANNELS_PAGE:(page + 1) * CHANNELS_PAGE]:
+            message, show_fiat = self._channel_card(
+                ch, view, aliases[ch.remote_pubkey], show_fiat)
+            messages.append(message)
+        messages.append('%d/%d' % (page + 1, pages))
+        return '\n\n'.join(messages), page, pages
+
     def chs(self):
         """Short version of channels
         tg> chs"""
-        chs = sorted(self._lit.listchannels(), key=lambda x: x.private)
-        active_channels = {ch.channel_id for ch in self._lit.listchannels(True)}
+        view = self._channel_view()
+        aliases = self.resolve_aliases(ch.remote_pubkey for ch in view)
         rows = []
         show_fiat = True
-        for ch in chs:
+        for ch in view:
             pubkey = ch.remote_pubkey
             local = bits_to_sats(ch.local_balance)
             remote = bits_to_sats(ch.remote_balance)
-            active = ch.channel_id in active_channels
+            active = view.is_active(ch)
             local_str = '%s %s' % (self.LOCAL, to_btc_str(
                 local).rstrip('0').rstrip('.') if local else '')
             remote_str = '%s %s' % (self.REMOTE, to_btc_str(
@@ -383,7 +705,7 @@ class Commands:
             rows.append('%s%s %s' % (
                 self.ACTIVE if active else self.NACTIVE,
                 self.PRIVATE if ch.private else '',
-                self._alias(pubkey)
+                aliases[pubkey]
             ))
             local and rows.append('%s%s' % (local_str, local_eur))
             remote and rows.append('%s%s' % (remote_str, remote_eur))
@@ -396,16 +718,37 @@ class Commands:
         Specify a filter to select pending channels by aliases and pubkeys"""
         return []
 
-    def is_pay_req(self, pay_req):
-        if pay_req.lower().startswith('lightning:'):
-            pay_req = pay_req[10:]
+    @staticmethod
+    def is_pay_req(pay_req):
+        """Checked locally, Lighter is not called"""
         try:
-            self._lit.decodeinvoice(pay_req)
-        except RpcError:
+            bolt11.decode(pay_req)
+        except InvoiceError:
             return False
         else:
             return True
 
+    def stats(self):
+        """Latency of Lighter calls since startup
+        tg> stats"""
+        rows = []
+        for method in self._lit.stats.methods():
+            calls, errors, avg_size = self._lit.stats.summary(method)
+            p50, p95, p99 = self._lit.stats.percentiles(method, 50, 95, 99)
+            rows.append('{} {} calls'.format(method, calls))
+            rows.append('p50 {:.0f} ms, p95 {:.0f} ms, p99 {:.0f} ms'.format(
+                p50 * 1e3, p95 * 1e3, p99 * 1e3))
+            if avg_size:
+                rows.append('avg response {:.0f} bytes'.format(avg_size))
+            for code, count in sorted(errors.items()):
+                rows.append('{} {}'.format(code, count))
+        cache = getattr(self._lit, 'cache', None)
+        if isinstance(cache, lighterer.ResponseCache):
+            for method in sorted(set(cache.hits) | set(cache.misses)):
+                rows.append('cache {} {} hits, {} misses'.format(
+                    method, cache.hits[method], cache.misses[method]))
+        return '\n'.join(rows) or 'No calls, yet'
+
     def n_1ml(self):
         """Toggle https://1ml.com block explorer links
         tg> 1ml"""
@@ -421,9 +764,10 @@ class Commands:
     def decode(self, pay_req):
         """Decode a payment request
         tg> decode <payment request>"""
-        if not self.is_pay_req(pay_req):
+        try:
+            decoded = bolt11.decode(pay_req)
+        except InvoiceError:
             return 'This is not a payment request'
-        decoded = self._lit.decodeinvoice(pay_req)
         pubkey = decoded.destination_pubkey
         rows = []
         alias = self._alias(pubkey, '-')
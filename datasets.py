@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Synthetic node data of any size, for tests and benchmarks
+
+The same size and seed give the same dataset. Amounts are in bits as in
+Lighter, timestamps end at UNTIL and blocks at TIP.
+Datasets and parsed fixtures are pickled in CACHE_DIR, they are built
+again when the data or the modules they are built with change."""
+import hashlib
+import math
+import os
+import pickle
+import random
+from functools import lru_cache
+import lighter_pb2 as pb
+import bolt11
+
+__all__ = ['generate', 'cached', 'list_invoices', 'Dataset']
+
+CACHE_DIR = '.fixtures_cache'
+
+UNTIL = 1560000000
+TIP = 579000
+BLOCK_TIME = 600
+SPAN = 365 * 24 * 3600
+# Channels limited by the wumbo cap, in bits
+MIN_CAPACITY = 200
+MAX_CAPACITY = 167772.15
+SYLLABLES = (
+    'ba', 'co', 'di', 'fa', 'ga', 'li', 'lu', 'mo', 'na', 'pi', 'ra', 're',
+    'sa', 'to', 'vi', 'ze')
+WORDS = (
+    'coffee', 'beer', 'pizza', 'donation', 'tip', 'book', 'sticker',
+    'ticket', 'hosting', 'vpn', 'shirt', 'order', 'refill', 'gift')
+# Key of the synthetic node, it signs the payment requests
+NODE_KEY = bytes(range(1, 33))
+
+
+class Dataset:
+    """Lists of Lighter messages of a synthetic node
+
+    It is pickled as List*Response messages, protobuf parses them much
+    faster than the messages one by one."""
+    LISTS = {
+        'channels': pb.ListChannelsResponse,
+        'peers': pb.ListPeersResponse,
+        'invoices': pb.ListInvoicesResponse,
+        'payments': pb.ListPaymentsResponse,
+        'transactions': pb.ListTransactionsResponse,
+    }
+
+    def __init__(self, channels, peers, invoices, payments, transactions):
+        self.channels = channels
+        self.peers = peers
+        self.invoices = invoices
+        self.payments = payments
+        self.transactions = transactions
+
+    def __getstate__(self):
+        return {
+            name: response(**{name: getattr(self, name)}).SerializeToString()
+            for name, response in self.LISTS.items()}
+
+    def __setstate__(self, state):
+        for name, response in self.LISTS.items():
+            setattr(self, name,
+                    list(getattr(response.FromString(state[name]), name)))
+
+    @property
+    def channelbalance(self):
+        return round(sum(ch.local_balance for ch in self.channels
+                         if ch.state == pb.OPEN), 2)
+
+    @property
+    def walletbalance(self):
+        return round(sum(tx.amount_bits for tx in self.transactions
+                         if tx.num_confirmations), 2)
+
+
+def _hex(rnd, size=32):
+    return bytes(rnd.getrandbits(8) for _ in range(size)).hex()
+
+
+def _bits(rnd, low, high):
+    """Log-uniform amount, few large ones and many small ones"""
+    return round(math.exp(rnd.uniform(math.log(low), math.log(high))), 2)
+
+
+def _alias(rnd):
+    name = ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+    return name.capitalize() + rnd.choice(('', ' node', '.com', ' LN'))
+
+
+def _address(rnd):
+    program = bytes(rnd.getrandbits(8) for _ in range(20))
+    return bolt11.bech32_encode(
+        'bc', [0] + bolt11.convertbits(program, 8, 5))
+
+
+def _timestamps(rnd, count):
+    """Sorted moments of the last year"""
+    return sorted(rnd.randint(UNTIL - SPAN, UNTIL) for _ in range(count))
+
+
+def _channels(rnd, size, pubkeys):
+    channels = []
+    for number, pubkey in enumerate(rnd.choice(pubkeys) for _ in range(size)):
+        txid = _hex(rnd)
+        capacity = _bits(rnd, MIN_CAPACITY, MAX_CAPACITY)
+        # The funder pays the commitment fee, 2 bits on average
+        local = round(capacity * rnd.betavariate(0.5, 0.5), 2)
+        remote = round(max(capacity - local - 2, 0), 2)
+        state = rnd.choices(
+            (pb.OPEN, pb.PENDING_OPEN, pb.PENDING_MUTUAL_CLOSE,
+             pb.PENDING_FORCE_CLOSE), (94, 3, 2, 1))[0]
+        height = TIP - rnd.randint(6, 50000)
+        scid = '%dx%dx%d' % (height, rnd.randint(1, 2500), number % 2)
+        channels.append(pb.Channel(
+            remote_pubkey=pubkey,
+            short_channel_id='' if state == pb.PENDING_OPEN else scid,
+            channel_id='%s:%d' % (txid, number % 2),
+            funding_txid=txid,
+            capacity=capacity,
+            local_balance=local,
+            remote_balance=remote,
+            to_self_delay=rnd.choice((144, 144, 720, 2016)),
+            private=rnd.random() < 0.15,
+            state=state,
+            active=state == pb.OPEN and rnd.random() < 0.9))
+    return channels
+
+
+def _peers(rnd, pubkeys, channels):
+    """Connected peers, with a channel or not, some without alias"""
+    connected = {ch.remote_pubkey for ch in channels if ch.active}
+    connected.update(pk for pk in pubkeys if rnd.random() < 0.1)
+    return [
+        pb.Peer(
+            pubkey=pubkey,
+            alias=_alias(rnd) if rnd.random() < 0.85 else '',
+            address='%d.%d.%d.%d:9735' % tuple(
+                rnd.randint(1, 254) for _ in range(4)),
+            color='#' + _hex(rnd, 3))
+        for pubkey in sorted(connected)]
+
+
+def _invoices(rnd, size, pay_reqs):
+    invoices = []
+    for timestamp in _timestamps(rnd, size):
+        preimage = bytes(rnd.getrandbits(8) for _ in range(32))
+        payment_hash = hashlib.sha256(preimage).hexdigest()
+        amount = 0 if rnd.random() < 0.1 else _bits(rnd, 0.01, 50000)
+        expiry = rnd.choice((600, 3600, 3600, 86400))
+        description = ' '.join(rnd.sample(WORDS, rnd.randint(1, 3)))
+        if rnd.random() < 0.6:
+            state = pb.PAID
+        elif timestamp + expiry < UNTIL:
+            state = pb.EXPIRED
+        else:
+            state = pb.PENDING
+        invoice = pb.Invoice(
+            amount_bits=amount,
+            timestamp=timestamp,
+            payment_hash=payment_hash,
+            description=description,
+            expiry_time=expiry,
+            state=state)
+        if pay_reqs:
+            invoice.payment_request = bolt11.encode(
+                NODE_KEY, bytes.fromhex(payment_hash), amount or None,
+                timestamp, description, expiry_time=expiry)
+        invoices.append(invoice)
+    return invoices
+
+
+def _payments(rnd, size):
+    payments = []
+    for timestamp in _timestamps(rnd, size):
+        preimage = bytes(rnd.getrandbits(8) for _ in range(32))
+        amount = _bits(rnd, 0.01, 20000)
+        payments.append(pb.Payment(
+            payment_hash=hashlib.sha256(preimage).hexdigest(),
+            amount_bits=amount,
+            timestamp=timestamp,
+            # 1 sat base fee plus 1000 ppm on most routes
+            fee_base_msat=int(1000 + amount * 100 * rnd.random()),
+            payment_preimage=preimage.hex()))
+    return payments
+
+
+def _transactions(rnd, size):
+    transactions = []
+    for timestamp in _timestamps(rnd, size):
+        height = TIP - (UNTIL - timestamp) // BLOCK_TIME
+        confirmed = height <= TIP - 1 or rnd.random() < 0.5
+        spend = rnd.random() < 0.4
+        amount = _bits(rnd, 1, 100000)
+        transactions.append(pb.Transaction(
+            txid=_hex(rnd),
+            amount_bits=-amount if spend else amount,
+            num_confirmations=TIP - height + 1 if confirmed else 0,
+            block_hash=('0' * 18 + _hex(rnd, 23)) if confirmed else '',
+            blockheight=height if confirmed else 0,
+            timestamp=timestamp,
+            fee_sat=rnd.randint(200, 20000) if spend else 0,
+            dest_addresses=[_address(rnd)
+                            for _ in range(rnd.randint(1, 2))]))
+    return transactions
+
+
+def list_invoices(invoices, max_items=200, search_timestamp=None,
+                  search_order='ASCENDING', list_order='ASCENDING',
+                  paid=False, pending=False, expired=False):
+    """ListInvoices of Lighter over invoices sorted by timestamp
+
+    Without a state every invoice is selected, without search_timestamp
+    the newest max_items are returned."""
+    states = {state for state, wanted in (
+        (pb.PAID, paid), (pb.PENDING, pending), (pb.EXPIRED, expired))
+        if wanted} or {pb.PAID, pb.PENDING, pb.EXPIRED}
+    selected = [invoice for invoice in invoices if invoice.state in states]
+    if not search_timestamp:
+        page = selected[-max_items:] if max_items else []
+    elif search_order == 'DESCENDING':
+        older = [i for i in selected if i.timestamp <= search_timestamp]
+        page = older[-max_items:] if max_items else []
+    else:
+        newer = [i for i in selected if i.timestamp >= search_timestamp]
+        page = newer[:max_items]
+    return page[::-1] if list_order == 'DESCENDING' else page
+
+
+def cached(name, sources, build):
+    """Pickled result of build, stored in CACHE_DIR under name
+
+    sources are the bytes the result is built from, the cache is valid
+    while their digest is the same."""
+    digest = hashlib.sha1(sources).hexdigest().encode()
+    path = os.path.join(CACHE_DIR, name + '.pickle')
+    try:
+        with open(path, 'rb') as fd:
+            if fd.readline().rstrip() == digest:
+                return fd.read()
+    except OSError:
+        pass
+    blob = pickle.dumps(build(), pickle.HIGHEST_PROTOCOL)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + '.tmp', 'wb') as fd:
+            fd.write(digest + b'\n' + blob)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print('Fixtures cache not saved:', e)
+    return blob
+
+
+def _source():
+    """The modules the datasets are built with"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = []
+    for path in (__file__, bolt11.__file__, os.path.join(here, 'mocker.py')):
+        with open(path, 'rb') as fd:
+            sources.append(fd.read())
+    return b''.join(sources)
+
+
+@lru_cache(16)
+def _generate(size, seed, pay_reqs):
+    name = 'dataset-%d-%d%s' % (size, seed, '-pr' if pay_reqs else '')
+    return cached(name, _source(), lambda: _build(size, seed, pay_reqs))
+
+
+def _build(size, seed, pay_reqs):
+    rnd = random.Random(seed)
+    # Some peers have more than one channel
+    pubkeys = ['0%d%s' % (rnd.choice((2, 3)), _hex(rnd))
+               for _ in range(max(1, size * 4 // 5))]
+    channels = _channels(rnd, size, pubkeys)
+    dataset = Dataset(
+        channels, _peers(rnd, pubkeys, channels),
+        _invoices(rnd, size, pay_reqs), _payments(rnd, size),
+        _transactions(rnd, size))
+    return dataset
+
+
+def generate(size, seed=0, pay_reqs=False):
+    """Dataset with size channels, invoices, payments and transactions
+
+    Payment requests are signed only with pay_reqs, signing is slow.
+    Every call returns new messages, the callers may change them."""
+    return pickle.loads(_generate(size, seed, pay_reqs))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Handle telegram messages on a pool of workers
+"""
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from samples import Samples
+
+
+def chat_of(msg):
+    """Chat id of a chat message or of a callback query"""
+    if 'chat' in msg:
+        return msg['chat']['id']
+    return msg['message']['chat']['id']
+
+
+class Dispatcher:
+    """Run the handler of the messages on a bounded pool of workers
+
+    Messages of a chat are handled in order, one at a time, while
+    different chats run in parallel. Messages selected by concurrent(msg)
+    (read-only commands) do not wait for the previous messages of their
+    chat. Use the object as a telepot handler of chat messages and
+    callback queries."""
+
+    def __init__(self, handler, workers=4, concurrent=None):
+        self._handler = handler
+        self._concurrent = concurrent or (lambda msg: False)
+        self._executor = ThreadPoolExecutor(workers)
+        self._lock = threading.Lock()
+        self._chats = {}  # chat_id: deque of (msg, enqueued) to handle
+        self._pending = 0
+        self._waits = Samples()
+
+    def __call__(self, msg):
+        chat_id = chat_of(msg)
+        item = msg, time.monotonic()
+        with self._lock:
+            self._pending += 1
+            if self._concurrent(msg):
+                self._executor.submit(self._run, *item)
+                return
+            queue = self._chats.get(chat_id)
+            if queue is not None:
+                # A worker is handling the chat, it will get this too
+                queue.append(item)
+                return
+            self._chats[chat_id] = deque()
+        self._executor.submit(self._drain, chat_id, *item)
+
+    def _run(self, msg, enqueued):
+        with self._lock:
+            self._pending -= 1
+            self._waits.append(time.monotonic() - enqueued)
+        try:
+            self._handler(msg)
+        except Exception:
+            traceback.print_exc()
+
+    def _drain(self, chat_id, msg, enqueued):
+        while True:
+            self._run(msg, enqueued)
+            with self._lock:
+                queue = self._chats[chat_id]
+                if not queue:
+                    del self._chats[chat_id]
+                    return
+                msg, enqueued = queue.popleft()
+
+    def depth(self):
+        """Messages waiting for a worker"""
+        with self._lock:
+            return self._pending
+
+    def wait_percentiles(self, *ps):
+        """Seconds waited by the last messages before their handling"""
+        return self._waits.percentiles(*ps)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait)
+
+
+__all__ = [
+    'Dispatcher',
+    'chat_of',
+]
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Fake Lighter, ./fakelighter.py
+
+The Lightning and Unlocker services of lighter.proto on a synthetic node
+of datasets, over TLS with a macaroon like Lighter. It is configured by
+the fake_lighter section of the config, see config.sample; point the
+lighter section to the same host, port, cert and macaroon to run the bot
+on it.
+
+Latencies, errors and throughput are set for every method and can be
+overridden for a single one, like the timeouts of lighterer:
+    latency = lognormal 0.02 0.5
+    latency_payinvoice = uniform 1 5
+    error_rate_listchannels = 0.1
+    throughput_listinvoices = 100000
+"""
+import functools
+import hashlib
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent import futures
+import grpc
+import lighter_pb2 as pb
+import lighter_pb2_grpc as pb_grpc
+import bolt11
+import config_manager
+import datasets
+
+DEFAULT_OPTIONS = {
+    'host': '127.0.0.1',
+    'port': '1708',
+    'workers': '10',
+    # The synthetic node, see datasets.generate
+    'size': '100',
+    'seed': '0',
+    'tls': 'yes',
+    'cert': 'fake_lighter.crt',
+    'key': 'fake_lighter.key',
+    'macaroon': 'fake_lighter.macaroon',
+    # Lighter starts locked if a password is set
+    'password': '',
+    'latency': 'fixed 0',
+    'error_rate': '0',
+    'error_code': 'UNAVAILABLE',
+    # Response bytes per second, 0 is unlimited
+    'throughput': '0',
+    # Seconds before the invoices created are paid, 0 is never
+    'settle_after': '0',
+}
+
+# Seconds of a latency distribution, from its parameters
+DISTRIBUTIONS = {
+    'fixed': lambda rnd, seconds: seconds,
+    'uniform': lambda rnd, low, high: rnd.uniform(low, high),
+    'exponential': lambda rnd, mean: rnd.expovariate(1 / mean),
+    'lognormal': lambda rnd, median, sigma: rnd.lognormvariate(
+        math.log(median), sigma),
+}
+
+
+class Behavior:
+    """Latency, errors and throughput of the methods
+
+    Options are read as option_<method> first, then as option. Methods
+    are lowercase, like listchannels."""
+
+    def __init__(self, options, seed=None):
+        self._options = options
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _option(self, option, method):
+        return self._options.get(
+            option + '_' + method, self._options.get(
+                option, DEFAULT_OPTIONS[option]))
+
+    def latency(self, method):
+        name, *params = self._option('latency', method).split()
+        with self._lock:
+            return max(0., DISTRIBUTIONS[name](
+                self._rnd, *(float(p) for p in params)))
+
+    def fault(self, method):
+        """StatusCode of an injected error, None for no error"""
+        with self._lock:
+            failed = self._rnd.random() < float(
+                self._option('error_rate', method))
+        if failed:
+            return grpc.StatusCode[self._option('error_code', method)]
+        return None
+
+    def transfer(self, method, size):
+        """Seconds to send size bytes"""
+        throughput = float(self._option('throughput', method))
+        return size / throughput if throughput else 0.
+
+
+def rpc(handler):
+    """Check the lock and the macaroon, then delay and fail as configured"""
+    method = handler.__name__.lower()
+
+    @functools.wraps(handler)
+    def wrapper(self, request, context):
+        start = time.monotonic()
+        self.check(context)
+        code = self.behavior.fault(method)
+        delay = self.behavior.latency(method)
+        if code is not None:
+            self.sleep(context, delay)
+            context.abort(code, 'Injected fault')
+        response = handler(self, request, context)
+        delay += self.behavior.transfer(method, response.ByteSize())
+        self.sleep(context, delay - (time.monotonic() - start))
+        return response
+    return wrapper
+
+
+class FakeLighter(pb_grpc.LightningServicer):
+    """Lightning service on a datasets.Dataset
+
+    Payments and on-chain spends are taken from the channels and the
+    wallet, the invoices created are signed with datasets.NODE_KEY."""
+
+    def __init__(self, dataset, behavior, macaroon=None, password=None,
+                 settle_after=0, seed=None):
+        self.behavior = behavior
+        self.password = password
+        self.locked = bool(password)
+        self._data = dataset
+        self._macaroon = macaroon
+        self._settle_after = settle_after
+        self._rnd = random.Random(seed)
+        self._lock = threading.RLock()
+        self._pubkey = bolt11.pubkey_of(datasets.NODE_KEY).hex()
+
+    def check(self, context):
+        if self.locked:
+            context.abort(
+                grpc.StatusCode.UNIMPLEMENTED,
+                'Lighter is locked, unlock it with UnlockLighter')
+        if self._macaroon:
+            metadata = dict(context.invocation_metadata())
+            if metadata.get('macaroon', '').encode() != self._macaroon:
+                context.abort(
+                    grpc.StatusCode.UNAUTHENTICATED, 'Invalid macaroon')
+
+    @staticmethod
+    def sleep(context, seconds):
+        """Sleep, not beyond the deadline of the call"""
+        remaining = context.time_remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _hex(self, size=32):
+        return bytes(self._rnd.getrandbits(8) for _ in range(size)).hex()
+
+    def _settle(self, invoice):
+        with self._lock:
+            if invoice.state == pb.PENDING:
+                invoice.state = pb.PAID
+
+    @rpc
+    def ChannelBalance(self, request, context):
+        with self._lock:
+            return pb.ChannelBalanceResponse(
+                balance=self._data.channelbalance)
+
+    @rpc
+    def CheckInvoice(self, request, context):
+        with self._lock:
+            for invoice in self._data.invoices:
+                if invoice.payment_hash == request.payment_hash:
+                    return pb.CheckInvoiceResponse(
+                        settled=invoice.state == pb.PAID)
+        context.abort(grpc.StatusCode.NOT_FOUND, 'Invoice not found')
+
+    @rpc
+    def CreateInvoice(self, request, context):
+        preimage = bytes.fromhex(self._hex())
+        payment_hash = hashlib.sha256(preimage).digest()
+        timestamp = int(time.time())
+        expiry = request.expiry_time or bolt11.DEFAULT_EXPIRY
+        pay_req = bolt11.encode(
+            datasets.NODE_KEY, payment_hash, request.amount_bits or None,
+            timestamp, request.description, expiry_time=expiry,
+            min_final_cltv_expiry=request.min_final_cltv_expiry or None)
+        invoice = pb.Invoice(
+            amount_bits=request.amount_bits,
+            timestamp=timestamp,
+            payment_hash=payment_hash.hex(),
+            description=request.description,
+            expiry_time=expiry,
+            fallback_addr=request.fallback_addr,
+            state=pb.PENDING,
+            payment_request=pay_req)
+        with self._lock:
+            self._data.invoices.append(invoice)
+        if self._settle_after:
+            timer = threading.Timer(
+                self._settle_after, self._settle, (invoice, ))
+            timer.daemon = True
+            timer.start()
+        return pb.CreateInvoiceResponse(
+            payment_request=pay_req,
+            payment_hash=invoice.payment_hash,
+            expires_at=timestamp + expiry)
+
+    @rpc
+    def DecodeInvoice(self, request, context):
+        try:
+            return bolt11.decode(request.payment_request)
+        except bolt11.InvoiceError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+    @rpc
+    def GetInfo(self, request, context):
+        with self._lock:
+            channels = self._data.channels
+        return pb.GetInfoResponse(
+            identity_pubkey=self._pubkey,
+            alias='fake lighter',
+            color='#ffd500',
+            version='fake %d channels' % len(channels),
+            blockheight=datasets.TIP,
+            network='mainnet',
+            node_uri='%s@127.0.0.1:9735' % self._pubkey)
+
+    @rpc
+    def ListChannels(self, request, context):
+        with self._lock:
+            return pb.ListChannelsResponse(channels=[
+                ch for ch in self._data.channels
+                if ch.active or not request.active_only])
+
+    @rpc
+    def ListInvoices(self, request, context):
+        with self._lock:
+            invoices = datasets.list_invoices(
+                self._data.invoices, request.max_items or 200,
+                request.search_timestamp,
+                pb.Order.Name(request.search_order),
+                pb.Order.Name(request.list_order),
+                request.paid, request.pending, request.expired)
+            return pb.ListInvoicesResponse(invoices=invoices)
+
+    @rpc
+    def ListPayments(self, request, context):
+        with self._lock:
+            return pb.ListPaymentsResponse(payments=self._data.payments)
+
+    @rpc
+    def ListPeers(self, request, context):
+        with self._lock:
+            return pb.ListPeersResponse(peers=self._data.peers)
+
+    @rpc
+    def ListTransactions(self, request, context):
+        with self._lock:
+            return pb.ListTransactionsResponse(
+                transactions=self._data.transactions)
+
+    @rpc
+    def NewAddress(self, request, context):
+        program = bytes.fromhex(self._hex(20))
+        if request.type == pb.NP2WKH:
+            address = bolt11._base58check(5, program)
+        else:
+            address = bolt11.bech32_encode(
+                'bc', [0] + bolt11.convertbits(program, 8, 5))
+        return pb.NewAddressResponse(address=address)
+
+    @rpc
+    def OpenChannel(self, request, context):
+        pubkey = request.node_uri.split('@')[0]
+        if request.funding_bits <= request.push_bits:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                          'Funding must be greater than push')
+        txid = self._hex()
+        with self._lock:
+            if request.funding_bits > self._data.walletbalance:
+                context.abort(grpc.StatusCode.CANCELLED,
+                              'Insufficient funds')
+            self._data.transactions.append(self._spend(
+                txid, request.funding_bits))
+            self._data.channels.append(pb.Channel(
+                remote_pubkey=pubkey,
+                channel_id='%s:0' % txid,
+                funding_txid=txid,
+                capacity=request.funding_bits,
+                local_balance=request.funding_bits - request.push_bits,
+                remote_balance=request.push_bits,
+                to_self_delay=144,
+                private=request.private,
+                state=pb.PENDING_OPEN))
+        return pb.OpenChannelResponse(funding_txid=txid)
+
+    @rpc
+    def PayInvoice(self, request, context):
+        try:
+            decoded = bolt11.decode(request.payment_request)
+        except bolt11.InvoiceError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        amount = decoded.amount_bits or request.amount_bits
+        if not amount:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                          'Amount must be specified')
+        with self._lock:
+            if any(payment.payment_hash == decoded.payment_hash
+                   for payment in self._data.payments):
+                context.abort(grpc.StatusCode.ALREADY_EXISTS,
+                              'Invoice is already paid')
+            # Through the first channel able to send it, with no fees
+            for channel in self._data.channels:
+                if channel.active and channel.local_balance >= amount:
+                    channel.local_balance -= amount
+                    channel.remote_balance += amount
+                    break
+            else:
+                context.abort(grpc.StatusCode.CANCELLED,
+                              'No route found')
+            preimage = self._hex()
+            self._data.payments.append(pb.Payment(
+                payment_hash=decoded.payment_hash,
+                amount_bits=amount,
+                timestamp=int(time.time()),
+                fee_base_msat=0,
+                payment_preimage=preimage))
+        return pb.PayInvoiceResponse(payment_preimage=preimage)
+
+    def _spend(self, txid, amount_bits, fee_sat=0):
+        return pb.Transaction(
+            txid=txid,
+            amount_bits=-amount_bits,
+            num_confirmations=1,
+            block_hash='0' * 18 + self._hex(23),
+            blockheight=datasets.TIP,
+            timestamp=int(time.time()),
+            fee_sat=fee_sat)
+
+    @rpc
+    def PayOnChain(self, request, context):
+        if request.amount_bits <= 0:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                          'Amount must be positive')
+        fee_sat = 141 * (request.fee_sat_byte or 10)
+        txid = self._hex()
+        with self._lock:
+            if request.amount_bits + fee_sat / 100 > \
+                    self._data.walletbalance:
+                context.abort(grpc.StatusCode.CANCELLED,
+                              'Insufficient funds')
+            transaction = self._spend(txid, request.amount_bits, fee_sat)
+            transaction.dest_addresses.append(request.address)
+            self._data.transactions.append(transaction)
+        return pb.PayOnChainResponse(txid=txid)
+
+    @rpc
+    def WalletBalance(self, request, context):
+        with self._lock:
+            return pb.WalletBalanceResponse(balance=self._data.walletbalance)
+
+
+class FakeUnlocker(pb_grpc.UnlockerServicer):
+    """Unlocker service, it activates the Lightning service"""
+
+    def __init__(self, lightning):
+        self._lightning = lightning
+
+    def UnlockLighter(self, request, context):
+        if request.password != (self._lightning.password or ''):
+            context.abort(
+                grpc.StatusCode.UNAUTHENTICATED, 'Wrong password')
+        self._lightning.locked = False
+        return pb.UnlockLighterResponse()
+
+
+def make_cert(cert, key, host):
+    """Self-signed ECDSA certificate for host, with openssl"""
+    if not shutil.which('openssl'):
+        raise RuntimeError('openssl is needed to create ' + cert)
+    subprocess.run([
+        'openssl', 'req', '-x509', '-nodes', '-days', '3650',
+        '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
+        '-keyout', key, '-out', cert, '-subj', '/CN=fake lighter',
+        '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1,IP:%s' % (
+            host if host[0].isdigit() else '127.0.0.1')],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def credentials(options):
+    """Server credentials and macaroon in hex, created if missing
+
+    None and None without tls."""
+    if options['tls'].lower() not in ('yes', 'true', 'on', '1'):
+        return None, None
+    if not (os.path.isfile(options['cert']) and
+            os.path.isfile(options['key'])):
+        make_cert(options['cert'], options['key'], options['host'])
+    if not os.path.isfile(options['macaroon']):
+        with open(options['macaroon'], 'wb') as fd:
+            fd.write(os.urandom(32))
+    with open(options['cert'], 'rb') as fd:
+        cert = fd.read()
+    with open(options['key'], 'rb') as fd:
+        key = fd.read()
+    with open(options['macaroon'], 'rb') as fd:
+        macaroon = fd.read().hex().encode()
+    return grpc.ssl_server_credentials([(key, cert)]), macaroon
+
+
+def serve(options=None):
+    """Start the server, return it with the Lightning service and the port
+
+    Port 0 binds a free port."""
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    seed = int(options['seed'])
+    server_credentials, macaroon = credentials(options)
+    lightning = FakeLighter(
+        datasets.generate(int(options['size']), seed),
+        Behavior(options, seed), macaroon, options['password'],
+        float(options['settle_after']), seed)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(int(options['workers'])), options=[
+            ('grpc.max_send_message_length', 32 * 1024 * 1024),
+            ('grpc.max_receive_message_length', 32 * 1024 * 1024)])
+    pb_grpc.add_LightningServicer_to_server(lightning, server)
+    pb_grpc.add_UnlockerServicer_to_server(FakeUnlocker(lightning), server)
+    address = '{}:{}'.format(options['host'], options['port'])
+    if server_credentials:
+        port = server.add_secure_port(address, server_credentials)
+    else:
+        port = server.add_insecure_port(address)
+    server.start()
+    return server, lightning, port
+
+
+def main():
+    config = config_manager.load()
+    options = dict(config['fake_lighter']) \
+        if config.has_section('fake_lighter') else {}
+    server, lightning, port = serve(options)
+    print('Fake Lighter on port {}, {}'.format(
+        port, 'locked' if lightning.locked else 'unlocked'))
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(1)
+    return 0
+
+
+__all__ = [
+    'Behavior',
+    'FakeLighter',
+    'FakeUnlocker',
+    'serve',
+]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
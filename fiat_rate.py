@@ -1,9 +1,38 @@
+import json
+import os
+import re
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
 from time import time
 import requests
 
 MAX_AGE = 5 * 60
-KURL = 'https://api.kraken.com/0/public/Ticker?pair=BTCEUR'
+REFRESH = 4 * 60  # The refresher keeps the rate younger than MAX_AGE
+RETRY = 30
+MAX_STALE = 24 * 60 * 60  # Older rates are not served
+TIMEOUT = (3.05, 5)  # connect, read
+OUTLIER = .05  # Max distance of a source price from the median
+KURL = 'https://api.kraken.com/0/public/Ticker?pair=%s'
+CURL = 'https://api.coinbase.com/v2/exchange-rates?currency=BTC'
+BURL = 'https://api-pub.bitfinex.com/v2/tickers?symbols=%s'
+
+# Amount symbols (lower case), codes are accepted too
+SYMBOLS = {
+    '€': 'eur',
+    'e': 'eur',
+    '$': 'usd',
+    '£': 'gbp',
+    'fr': 'chf',
+}
+FORMATS = {
+    'eur': '{:.2f} €',
+    'usd': '${:.2f}',
+    'gbp': '£{:.2f}',
+    'chf': '{:.2f} CHF',
+}
+AMOUNT = re.compile(r'^\s*([^\d\s.]*)\s*(\d*\.?\d+)\s*([^\d\s.]*)\s*$')
 
 
 class RateError(Exception):
@@ -11,37 +40,234 @@ class RateError(Exception):
         super(RateError, self).__init__('No fiat rate available')
 
 
+class Kraken:
+    """All the pairs in one Ticker request"""
+
+    def fetch(self, session, currencies):
+        pairs = ','.join('BTC' + currency.upper() for currency in currencies)
+        data = session.get(KURL % pairs, timeout=TIMEOUT).json()
+        if data['error']:
+            raise RateError
+        # Result keys are like XXBTZEUR or XBTCHF
+        return {
+            key[-3:].lower(): float(ticker['c'][0])
+            for key, ticker in data['result'].items()}
+
+
+class Coinbase:
+    """Every BTC exchange rate in one request"""
+
+    def fetch(self, session, currencies):
+        data = session.get(CURL, timeout=TIMEOUT).json()
+        rates = data['data']['rates']
+        return {
+            currency: float(rates[currency.upper()])
+            for currency in currencies if currency.upper() in rates}
+
+
+class Bitfinex:
+    """All the pairs in one tickers request"""
+
+    def fetch(self, session, currencies):
+        symbols = ','.join('tBTC' + currency.upper() for currency in currencies)
+        data = session.get(BURL % symbols, timeout=TIMEOUT).json()
+        # [symbol, bid, ..., last price, ...]
+        return {ticker[0][-3:].lower(): float(ticker[7]) for ticker in data}
+
+
+class Local:
+    """Fixed rates, a stand-in for tests"""
+
+    def __init__(self, rates):
+        self.rates = rates
+
+    def fetch(self, session, currencies):
+        return {
+            currency: rate for currency, rate in self.rates.items()
+            if currency in currencies}
+
+
+SOURCES = {
+    'kraken': Kraken,
+    'coinbase': Coinbase,
+    'bitfinex': Bitfinex,
+}
+
+
+def aggregate(prices, tolerance=OUTLIER):
+    """Median of the prices, prices too far from it are rejected
+
+    If every price is too far, as with two disagreeing sources, the median
+    of all of them is returned."""
+    middle = median(prices)
+    close = [price for price in prices
+             if abs(price - middle) <= tolerance * middle]
+    return median(close) if close else middle
+
+
 class Fiat:
-    """Conversions satoshis/euros at the Kraken exchange rate"""
+    """Conversions satoshis/fiat at the exchange rates of the sources
 
-    SYMBOLS = set('€Ee')
+    The first currency is the one shown in outputs. Every source gets all
+    the currencies with a single request, the rate of a currency is the
+    median of the sources.
+    Rates older than max_age are served while a refresh runs in background.
+    If path is provided the last known rates are kept across restarts."""
 
-    def __init__(self):
+    def __init__(self, path=None, currencies=('eur', ), sources=None):
+        self.currencies = tuple(currency.lower() for currency in currencies)
+        self._sources = sources or [Kraken()]
         self._cache = defaultdict(lambda: (0., 0.))
+        self._session = requests.Session()
+        self._path = path
+        self._fetch_lock = threading.Lock()
+        self._refresher = None
+        self._wakeup = threading.Event()
+        self._tried = 0.  # Last background refresh
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self._path, 'rt') as fd:
+                for currency, (rate, updated) in json.load(fd).items():
+                    self._cache[currency] = (rate, updated)
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        if not self._path:
+            return
+        tmp = self._path + '.tmp'
+        with open(tmp, 'wt') as fd:
+            json.dump(dict(self._cache), fd)
+        os.replace(tmp, self._path)
+
+    def _fetch_source(self, source):
+        try:
+            return source.fetch(self._session, self.currencies)
+        except:
+            return {}
+
+    def fetch(self):
+        """Get the rates from the sources and update the cache"""
+        if len(self._sources) == 1:
+            results = [self._fetch_source(self._sources[0])]
+        else:
+            with ThreadPoolExecutor(len(self._sources)) as executor:
+                results = list(executor.map(self._fetch_source, self._sources))
+        prices = defaultdict(list)
+        for result in results:
+            for currency, price in result.items():
+                if currency in self.currencies and price > 0:
+                    prices[currency].append(price)
+        if not prices:
+            raise RateError
+        now = time()
+        for currency, currency_prices in prices.items():
+            self._cache[currency] = (aggregate(currency_prices), now)
+        self.save()
+
+    def update(self):
+        """Fetch the rates, one update at a time, errors are ignored"""
+        if not self._fetch_lock.acquire(blocking=False):
+            return  # Already running
+        try:
+            self.fetch()
+        except RateError:
+            pass
+        except Exception as e:
+            # The refresher must survive any failure
+            print('Fiat rate update failed:', repr(e))
+        finally:
+            self._fetch_lock.release()
+
+    def refresh(self):
+        """Fetch the rates in background, at most once every RETRY seconds
+
+        The refresher is woken up if started, else a thread is started."""
+        now = time()
+        if now - self._tried < RETRY or self._fetch_lock.locked():
+            return
+        self._tried = now
+        if self._refresher is not None:
+            self._wakeup.set()
+        else:
+            threading.Thread(target=self.update, daemon=True).start()
 
-    def get_rate(self, max_age=MAX_AGE):
-        if time() - self._cache['eur'][1] > max_age:
-            try:
-                data = requests.get(KURL).json()
-            except:
+    def start(self):
+        """Keep the rates warm ahead of expiry"""
+        def loop():
+            while True:
+                self.update()
+                self._wakeup.wait(REFRESH if self.age() < REFRESH else RETRY)
+                self._wakeup.clear()
+
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=loop, daemon=True)
+            self._refresher.start()
+
+    def _currency(self, currency):
+        if currency is None:
+            return self.currencies[0]
+        if currency not in self.currencies:
+            raise RateError
+        return currency
+
+    def age(self, currency=None):
+        """Seconds since the last update of the rate"""
+        return time() - self._cache[self._currency(currency)][1]
+
+    def get_rate_age(self, max_age=MAX_AGE, currency=None):
+        """return rate, age
+
+        A rate older than max_age is returned immediately and refreshed
+        in background. Without a rate the call waits for the sources, a
+        single caller fetches while the others wait for its rate."""
+        currency = self._currency(currency)
+        rate, updated = self._cache[currency]
+        age = time() - updated
+        if age > MAX_STALE:
+            with self._fetch_lock:
+                rate, updated = self._cache[currency]
+                if time() - updated > MAX_STALE:
+                    self.fetch()
+                    rate, updated = self._cache[currency]
+            if not rate:
                 raise RateError
-            else:
-                if data['error']:
-                    raise RateError
-                price = float(data['result']['XXBTZEUR']['c'][0])
-                self._cache['eur'] = (price, time())
-        return self._cache['eur'][0]
-
-    def to_fiat(self, satoshis, max_age=MAX_AGE):
-        rate = self.get_rate(max_age)
+            return rate, max(time() - updated, 0.)
+        if age > max_age:
+            self.refresh()
+        return rate, age
+
+    def get_rate(self, max_age=MAX_AGE, currency=None):
+        return self.get_rate_age(max_age, currency)[0]
+
+    @staticmethod
+    def parse(amt):
+        """return value, currency of a fiat amount like 6.7€ or CHF 5,
+        None if amt is not a fiat amount"""
+        match = AMOUNT.match(amt)
+        if not match or bool(match.group(1)) == bool(match.group(3)):
+            return None
+        symbol = (match.group(1) or match.group(3)).lower()
+        currency = SYMBOLS.get(symbol, symbol)
+        if currency not in FORMATS:
+            return None
+        return float(match.group(2)), currency
+
+    def to_fiat(self, satoshis, max_age=MAX_AGE, currency=None):
+        rate = self.get_rate(max_age, currency)
         return round(satoshis * rate / 1e8, 2)
 
-    def to_satoshis(self, euro, max_age=MAX_AGE):
-        rate = self.get_rate(max_age)
-        return int(euro / rate * 1e8)
+    def to_satoshis(self, amount, max_age=MAX_AGE, currency=None):
+        rate = self.get_rate(max_age, currency)
+        return int(amount / rate * 1e8)
 
-    def to_bits(self, euro, max_age=MAX_AGE):
-        return self.to_satoshis(euro, max_age) / 100
+    def to_bits(self, amount, max_age=MAX_AGE, currency=None):
+        return self.to_satoshis(amount, max_age, currency) / 100
 
-    def to_fiat_str(self, satoshis, max_age=MAX_AGE):
-        return '{:.2f} €'.format(self.to_fiat(satoshis, max_age))
+    def to_fiat_str(self, satoshis, max_age=MAX_AGE, currency=None):
+        currency = self._currency(currency)
+        return FORMATS[currency].format(
+            self.to_fiat(satoshis, max_age, currency))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Invoices of the node
+"""
+import re
+import threading
+import time
+import traceback
+from bisect import bisect_left, insort
+from lighterer import RpcError
+
+POLL = 10  # Seconds between the checks of the invoices
+MAX_ITEMS = 200  # Of a ListInvoices page
+PAID = 0  # InvoiceState.PAID
+PENDING = 1  # InvoiceState.PENDING
+WORD = re.compile(r'\w+')
+
+
+def list_since(lit, since, max_items=MAX_ITEMS, **states):
+    """Pages of the invoices created since the timestamp, with states
+
+    A page starts at the timestamp of the last invoice of the previous
+    one, the invoices already listed there are skipped. A page filled by
+    invoices of a single timestamp is asked again twice as large."""
+    seen = set()  # payment_hash of the invoices listed at since
+    size = max_items
+    while True:
+        page = lit.listinvoices(size, since, **states)
+        new = [i for i in page if i.payment_hash not in seen]
+        if new:
+            yield new
+        if len(page) < size:
+            return
+        last = page[-1].timestamp
+        if last == since:
+            size *= 2
+        else:
+            since, seen, size = last, set(), max_items
+        seen.update(i.payment_hash for i in page if i.timestamp == last)
+
+
+class InvoiceIndex:
+    """Invoices by payment_hash prefix and by the words of their
+    description
+
+    Hashes and words are kept sorted: a prefix is a bisection away.
+    Invoices added again replace the known ones, with their new state."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._invoices = {}  # payment_hash: invoice
+        self._hashes = []
+        self._words = {}  # word: set of payment_hash
+        self._vocabulary = []
+        self.newest = 0  # Creation timestamp of the last invoice
+        self.synced = False
+
+    def __len__(self):
+        return len(self._invoices)
+
+    def _index_words(self, invoice, new_words):
+        for word in set(WORD.findall(invoice.description.lower())):
+            hashes = self._words.get(word)
+            if hashes is None:
+                hashes = self._words[word] = set()
+                new_words.append(word)
+            hashes.add(invoice.payment_hash)
+
+    def add(self, invoices):
+        with self._lock:
+            new_hashes, new_words = [], []
+            for invoice in invoices:
+                payment_hash = invoice.payment_hash
+                if payment_hash not in self._invoices:
+                    new_hashes.append(payment_hash)
+                    self._index_words(invoice, new_words)
+                self._invoices[payment_hash] = invoice
+                if invoice.timestamp >= self.newest:
+                    self.newest = invoice.timestamp
+            for keys, new in (
+                    (self._hashes, new_hashes),
+                    (self._vocabulary, new_words)):
+                if len(new) > 16:
+                    keys.extend(new)
+                    keys.sort()
+                else:
+                    for key in new:
+                        insort(keys, key)
+
+    def get(self, payment_hash):
+        return self._invoices.get(payment_hash)
+
+    @staticmethod
+    def _prefixed(keys, prefix):
+        index = bisect_left(keys, prefix)
+        while index < len(keys) and keys[index].startswith(prefix):
+            yield keys[index]
+            index += 1
+
+    def _newest(self, hashes, limit):
+        return sorted(
+            (self._invoices[payment_hash] for payment_hash in hashes),
+            key=lambda invoice: invoice.timestamp, reverse=True)[:limit]
+
+    def by_prefix(self, prefix, limit=10):
+        """Newest invoices with a payment_hash starting with prefix"""
+        with self._lock:
+            return self._newest(
+                self._prefixed(self._hashes, prefix.lower()), limit)
+
+    def search(self, text, limit=10):
+        """Newest invoices with a description word starting with each
+        word of text"""
+        with self._lock:
+            found = None
+            for prefix in set(WORD.findall(text.lower())):
+                hashes = set()
+                for word in self._prefixed(self._vocabulary, prefix):
+                    hashes |= self._words[word]
+                found = hashes if found is None else found & hashes
+            return self._newest(found or (), limit)
+
+    def sync(self, lit, max_items=MAX_ITEMS):
+        """Add the invoices created since the last one known"""
+        with self._sync_lock:
+            # Without a search timestamp Lighter lists the newest invoices
+            since = self.newest or 1
+            for page in list_since(lit, since, max_items, paid=True,
+                                   pending=True, expired=True):
+                self.add(page)
+            self.synced = True
+
+
+class InvoiceWatcher:
+    """Call notify(invoice) when an invoice is paid
+
+    Every poll lists the paid and pending invoices created since the last
+    one seen (a search_timestamp cursor), or since the oldest invoice
+    still pending: the cost follows the new activity, not the history.
+    The pending invoices of the first poll are watched, the paid ones are
+    not notified. The invoices seen are added to index."""
+
+    def __init__(self, lit, notify, interval=POLL, max_items=MAX_ITEMS,
+                 index=None):
+        self._lit = lit
+        self._notify = notify
+        self._index = index
+        self._interval = interval
+        self._max_items = max_items
+        self._cursor = None  # Creation timestamp of the last invoice seen
+        self._seen = set()  # payment_hash of the invoices at the cursor
+        self._pending = {}  # payment_hash: timestamp, expiration
+        self._worker = None
+        self._stop = threading.Event()
+
+    def _list(self, since):
+        """{payment_hash: invoice} created since the timestamp"""
+        return {
+            invoice.payment_hash: invoice
+            for page in list_since(self._lit, since, self._max_items,
+                                   paid=True, pending=True)
+            for invoice in page}
+
+    def _track(self, invoice):
+        self._pending[invoice.payment_hash] = (
+            invoice.timestamp, invoice.timestamp + invoice.expiry_time)
+
+    def poll(self):
+        now = time.time()
+        if self._cursor is None:
+            self._cursor = int(now)
+            if self._index is not None:
+                self._index.sync(self._lit, self._max_items)
+            for invoice in self._lit.listinvoices(
+                    self._max_items, pending=True):
+                if invoice.state == PENDING:
+                    self._track(invoice)
+            return
+
+        since = min(
+            [self._cursor] +
+            [timestamp for timestamp, _ in self._pending.values()])
+        cursor, seen = self._cursor, set(self._seen)
+        invoices = self._list(since)
+        if self._index is not None:
+            self._index.add(invoices.values())
+        for payment_hash, invoice in invoices.items():
+            new = invoice.timestamp >= self._cursor and \
+                payment_hash not in self._seen
+            if invoice.state == PAID and (
+                    new or payment_hash in self._pending):
+                self._pending.pop(payment_hash, None)
+                self._notify(invoice)
+            elif invoice.state == PENDING and new:
+                self._track(invoice)
+            if invoice.timestamp > cursor:
+                cursor, seen = invoice.timestamp, set()
+            if invoice.timestamp == cursor:
+                seen.add(payment_hash)
+        self._cursor, self._seen = cursor, seen
+
+        for payment_hash, (_, expiration) in list(self._pending.items()):
+            if expiration < now:
+                del self._pending[payment_hash]
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except RpcError:
+                pass  # Lighter is not reachable, retry at the next poll
+            except Exception:
+                traceback.print_exc()
+            if self._stop.wait(self._interval):
+                return
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+__all__ = [
+    'InvoiceIndex',
+    'InvoiceWatcher',
+    'list_since',
+]
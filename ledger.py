@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Local history of the node, kept across restarts
+"""
+import json
+import threading
+import time
+import traceback
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from lighterer import RpcError
+
+
+class Ledger:
+    """Append-only records of Lighter messages, by KEY, sorted by timestamp
+
+    Records are dicts of FIELDS. The MUTABLE fields of the records that
+    are not final yet are updated by the next merges. If path is provided
+    every new or updated record is appended to it, a JSON line each, and
+    the file is loaded at creation: the last line of a key wins.
+    Totals of a time range are answered from prefix sums."""
+
+    KEY = None
+    FIELDS = ()
+    MUTABLE = ()
+    TOTALS = ()
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._keys = {}  # key: record
+        self._open = set()  # keys of the records not final
+        self._records = []
+        self._timestamps = []
+        self._sums = None  # field: prefix sums, None if stale
+        self.synced = 0
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self._path, 'rt') as fd:
+                records = [json.loads(line) for line in fd if line.strip()]
+        except (OSError, ValueError):
+            return
+        self._insert(records)
+
+    @staticmethod
+    def is_final(record):
+        return True
+
+    def _record(self, message):
+        return {field: getattr(message, field) for field in self.FIELDS}
+
+    def _insert(self, records):
+        for record in records:
+            key = record[self.KEY]
+            if key in self._keys:
+                self._keys[key].update(
+                    (field, record[field]) for field in self.MUTABLE)
+                self.is_final(record) and self._open.discard(key)
+                continue
+            self._keys[key] = record
+            self.is_final(record) or self._open.add(key)
+            timestamp = record['timestamp']
+            if not self._timestamps or timestamp >= self._timestamps[-1]:
+                index = len(self._records)
+            else:
+                index = bisect_right(self._timestamps, timestamp)
+            self._timestamps.insert(index, timestamp)
+            self._records.insert(index, record)
+        self._sums = None
+
+    def _changed(self, message):
+        key = getattr(message, self.KEY)
+        if key not in self._keys:
+            return True
+        if key not in self._open:
+            return False
+        record = self._keys[key]
+        return any(
+            getattr(message, field) != record[field]
+            for field in self.MUTABLE)
+
+    def merge(self, messages):
+        """Add the new messages and update the records not final,
+        return the number of new records"""
+        with self._lock:
+            changed = [
+                self._record(message) for message in messages
+                if self._changed(message)]
+            if not changed:
+                return 0
+            new = sum(record[self.KEY] not in self._keys
+                      for record in changed)
+            if self._path:
+                with open(self._path, 'at') as fd:
+                    fd.writelines(
+                        json.dumps(record) + '\n' for record in changed)
+            self._insert(changed)
+            return new
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def get(self, key):
+        return self._keys.get(key)
+
+    def _range(self, start=None, end=None):
+        """Indexes of the records with start <= timestamp < end"""
+        first = 0 if start is None else bisect_left(self._timestamps, start)
+        last = len(self._timestamps) if end is None else \
+            bisect_left(self._timestamps, end)
+        return first, max(first, last)
+
+    def between(self, start=None, end=None, offset=0, limit=None):
+        """Records of the time range, newest first"""
+        with self._lock:
+            first, last = self._range(start, end)
+            last -= offset
+            first = first if limit is None else max(first, last - limit)
+            return self._records[first:last][::-1] if last > first else []
+
+    def totals(self, start=None, end=None):
+        """return count, {field: sum} of the TOTALS of the time range"""
+        with self._lock:
+            if self._sums is None:
+                self._sums = {
+                    field: [0] + list(accumulate(
+                        record[field] for record in self._records))
+                    for field in self.TOTALS}
+            first, last = self._range(start, end)
+            return last - first, {
+                field: sums[last] - sums[first]
+                for field, sums in self._sums.items()}
+
+
+class PaymentsLedger(Ledger):
+    """Payments sent by the node"""
+
+    KEY = 'payment_hash'
+    FIELDS = (
+        'payment_hash', 'amount_bits', 'timestamp', 'fee_base_msat',
+        'payment_preimage')
+    TOTALS = ('amount_bits', 'fee_base_msat')
+
+    def sync(self, lit):
+        """Add the new payments of Lighter, return their number
+
+        ListPayments has no filters: the whole history is received, only
+        the new payments are stored."""
+        new = self.merge(lit.listpayments().payments)
+        self.synced = time.time()
+        return new
+
+
+class TransactionsLedger(Ledger):
+    """On-chain transactions of the wallet, confirmations are updated
+    until CONFIRMED"""
+
+    CONFIRMED = 6
+    KEY = 'txid'
+    FIELDS = (
+        'txid', 'amount_bits', 'num_confirmations', 'block_hash',
+        'blockheight', 'timestamp', 'fee_sat', 'dest_addresses')
+    MUTABLE = ('num_confirmations', 'block_hash', 'blockheight')
+    TOTALS = ('amount_bits', 'fee_sat')
+
+    @classmethod
+    def is_final(cls, record):
+        return record['num_confirmations'] >= cls.CONFIRMED
+
+    def _record(self, message):
+        record = super()._record(message)
+        record['dest_addresses'] = list(record['dest_addresses'])
+        return record
+
+    def sync(self, lit):
+        """Add the new transactions of Lighter, return their number
+
+        ListTransactions has no filters: the whole history is received,
+        only new and unconfirmed transactions are looked at."""
+        new = self.merge(lit.listtransactions())
+        self.synced = time.time()
+        return new
+
+
+class Syncer:
+    """Run sync() in a worker thread, when woken up and its last run is
+    older than max_age"""
+
+    def __init__(self, sync, max_age):
+        self._sync = sync
+        self._max_age = max_age
+        self._last = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._done = threading.Event()  # At least a sync has been tried
+        self._worker = None
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self._last = time.time()
+            try:
+                self._sync()
+            except RpcError:
+                pass  # Lighter is not reachable, retry at the next wake up
+            except Exception:
+                traceback.print_exc()
+            self._done.set()
+
+    def wake(self, force=False):
+        if not force and time.time() - self._last < self._max_age:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self._wakeup.set()
+
+    def wait(self, timeout=None):
+        """Wait for the first sync, return True if it ran"""
+        return self._done.wait(timeout)
+
+
+__all__ = [
+    'Ledger',
+    'PaymentsLedger',
+    'TransactionsLedger',
+    'Syncer',
+]
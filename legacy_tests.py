@@ -103,7 +103,7 @@ class TestLnd(unittest.TestCase):
         # Private channels do not have links to the explorer
         self.assertNotIn('1ml.com', ''.join(self.ln.channels('037163149da6fbddd6e8')))
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_commands(self, mock_get):
         mock_get.return_value = FakeRequests()
 
@@ -132,7 +132,7 @@ class TestLnd(unittest.TestCase):
         self.ln.info()
 
     @unittest.skipUnless(LNCLI_MOCK, "Differences between ./lncli and lncli")
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_mock_commands(self, mock_get):
         mock_get.return_value = FakeRequests()
 
@@ -288,7 +288,7 @@ class FiatRate(unittest.TestCase):
         self.assertRegex(fiat.to_fiat_str(7), '^\d*\.\d{2} €')
         self.assertRegex(fiat.to_fiat_str(1000), '^\d*\.\d{2} €')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_kraken_mock(self, mock_get):
 
         mock_get.return_value = FakeRequests()
@@ -297,7 +297,7 @@ class FiatRate(unittest.TestCase):
         fiat = Fiat()
         self.assertAlmostEqual(fiat.get_rate(), expected_price)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_kraken_mock_error(self, mock_get):
         mock_get.return_value = FakeRateError()
 
@@ -305,7 +305,7 @@ class FiatRate(unittest.TestCase):
         with self.assertRaises(RateError):
             fiat.get_rate()
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_commands_with_rate(self, mock_get):
         mock_get.return_value = FakeRequests()
 
@@ -327,7 +327,7 @@ class FiatRate(unittest.TestCase):
         self.ln.is_pay_req(PAY_REQ)
         self.ln.address().startswith('bc1')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_commands_without_rate(self, mock_get):
         mock_get.return_value = FakeRateError()
 
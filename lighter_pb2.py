@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: lighter.proto
+# Protobuf Python Version: 7.35.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    7,
+    35,
+    1,
+    '',
+    'lighter.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rlighter.proto\x12\x07lighter\"(\n\x14UnlockLighterRequest\x12\x10\n\x08password\x18\x01 \x01(\t\"\x17\n\x15UnlockLighterResponse\"\x17\n\x15\x43hannelBalanceRequest\")\n\x16\x43hannelBalanceResponse\x12\x0f\n\x07\x62\x61lance\x18\x01 \x01(\x01\"+\n\x13\x43heckInvoiceRequest\x12\x14\n\x0cpayment_hash\x18\x01 \x01(\t\"\'\n\x14\x43heckInvoiceResponse\x12\x0f\n\x07settled\x18\x01 \x01(\x08\"\x8b\x01\n\x14\x43reateInvoiceRequest\x12\x13\n\x0b\x61mount_bits\x18\x01 \x01(\x01\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\x13\n\x0b\x65xpiry_time\x18\x03 \x01(\x04\x12\x1d\n\x15min_final_cltv_expiry\x18\x04 \x01(\x04\x12\x15\n\rfallback_addr\x18\x05 \x01(\t\"Z\n\x15\x43reateInvoiceResponse\x12\x17\n\x0fpayment_request\x18\x01 \x01(\t\x12\x14\n\x0cpayment_hash\x18\x02 \x01(\t\x12\x12\n\nexpires_at\x18\x03 \x01(\x04\"\x10\n\x0eGetInfoRequest\"D\n\x14\x44\x65\x63odeInvoiceRequest\x12\x17\n\x0fpayment_request\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\"\x94\x02\n\x15\x44\x65\x63odeInvoiceResponse\x12\x13\n\x0b\x61mount_bits\x18\x01 \x01(\x01\x12\x11\n\ttimestamp\x18\x02 \x01(\x04\x12\x14\n\x0cpayment_hash\x18\x03 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x1a\n\x12\x64\x65stination_pubkey\x18\x05 \x01(\t\x12\x18\n\x10\x64\x65scription_hash\x18\x06 \x01(\t\x12\x13\n\x0b\x65xpiry_time\x18\x07 \x01(\x04\x12\x1d\n\x15min_final_cltv_expiry\x18\x08 \x01(\x04\x12\x15\n\rfallback_addr\x18\t \x01(\t\x12\'\n\x0broute_hints\x18\n \x03(\x0b\x32\x12.lighter.RouteHint\"0\n\tRouteHint\x12#\n\thop_hints\x18\x01 \x03(\x0b\x32\x10.lighter.HopHint\"\x8a\x01\n\x07HopHint\x12\x0e\n\x06pubkey\x18\x01 \x01(\t\x12\x18\n\x10short_channel_id\x18\x02 \x01(\t\x12\x15\n\rfee_base_msat\x18\x03 \x01(\x01\x12#\n\x1b\x66\x65\x65_proportional_millionths\x18\x04 \x01(\r\x12\x19\n\x11\x63ltv_expiry_delta\x18\x05 \x01(\r\"\x91\x01\n\x0fGetInfoResponse\x12\x17\n\x0fidentity_pubkey\x18\x01 \x01(\t\x12\r\n\x05\x61lias\x18\x02 \x01(\t\x12\r\n\x05\x63olor\x18\x03 \x01(\t\x12\x0f\n\x07version\x18\x04 \x01(\t\x12\x13\n\x0b\x62lockheight\x18\x05 \x01(\r\x12\x0f\n\x07network\x18\x06 \x01(\t\x12\x10\n\x08node_uri\x18\x07 \x01(\t\"*\n\x13ListChannelsRequest\x12\x13\n\x0b\x61\x63tive_only\x18\x01 \x01(\x08\":\n\x14ListChannelsResponse\x12\"\n\x08\x63hannels\x18\x01 \x03(\x0b\x32\x10.lighter.Channel\"\x83\x02\n\x07\x43hannel\x12\x15\n\rremote_pubkey\x18\x01 \x01(\t\x12\x18\n\x10short_channel_id\x18\x02 \x01(\t\x12\x12\n\nchannel_id\x18\x03 \x01(\t\x12\x14\n\x0c\x66unding_txid\x18\x04 \x01(\t\x12\x10\n\x08\x63\x61pacity\x18\x05 \x01(\x01\x12\x15\n\rlocal_balance\x18\x06 \x01(\x01\x12\x16\n\x0eremote_balance\x18\x07 \x01(\x01\x12\x15\n\rto_self_delay\x18\x08 \x01(\r\x12\x0f\n\x07private\x18\t \x01(\x08\x12$\n\x05state\x18\n \x01(\x0e\x32\x15.lighter.ChannelState\x12\x0e\n\x06\x61\x63tive\x18\x0b \x01(\x08\"\xbc\x01\n\x13ListInvoicesRequest\x12\x11\n\tmax_items\x18\x01 \x01(\x04\x12\x18\n\x10search_timestamp\x18\x02 \x01(\x04\x12$\n\x0csearch_order\x18\x03 \x01(\x0e\x32\x0e.lighter.Order\x12\"\n\nlist_order\x18\x04 \x01(\x0e\x32\x0e.lighter.Order\x12\x0c\n\x04paid\x18\x05 \x01(\x08\x12\x0f\n\x07pending\x18\x06 \x01(\x08\x12\x0f\n\x07\x65xpired\x18\x07 \x01(\x08\":\n\x14ListInvoicesResponse\x12\"\n\x08invoices\x18\x01 \x03(\x0b\x32\x10.lighter.Invoice\"\x8a\x02\n\x07Invoice\x12\x13\n\x0b\x61mount_bits\x18\x01 \x01(\x01\x12\x11\n\ttimestamp\x18\x02 \x01(\x04\x12\x14\n\x0cpayment_hash\x18\x03 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x18\n\x10\x64\x65scription_hash\x18\x05 \x01(\t\x12\x13\n\x0b\x65xpiry_time\x18\x06 \x01(\x04\x12\x15\n\rfallback_addr\x18\x07 \x01(\t\x12\'\n\x0broute_hints\x18\x08 \x03(\x0b\x32\x12.lighter.RouteHint\x12$\n\x05state\x18\t \x01(\x0e\x32\x15.lighter.InvoiceState\x12\x17\n\x0fpayment_request\x18\n \x01(\t\"\x15\n\x13ListPaymentsRequest\":\n\x14ListPaymentsResponse\x12\"\n\x08payments\x18\x01 \x03(\x0b\x32\x10.lighter.Payment\"x\n\x07Payment\x12\x14\n\x0cpayment_hash\x18\x01 \x01(\t\x12\x13\n\x0b\x61mount_bits\x18\x02 \x01(\x01\x12\x11\n\ttimestamp\x18\x03 \x01(\x03\x12\x15\n\rfee_base_msat\x18\x04 \x01(\x03\x12\x18\n\x10payment_preimage\x18\x05 \x01(\t\"\x12\n\x10ListPeersRequest\"1\n\x11ListPeersResponse\x12\x1c\n\x05peers\x18\x01 \x03(\x0b\x32\r.lighter.Peer\"E\n\x04Peer\x12\x0e\n\x06pubkey\x18\x01 \x01(\t\x12\r\n\x05\x61lias\x18\x02 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x03 \x01(\t\x12\r\n\x05\x63olor\x18\x04 \x01(\t\"\x19\n\x17ListTransactionsRequest\"F\n\x18ListTransactionsResponse\x12*\n\x0ctransactions\x18\x01 \x03(\x0b\x32\x14.lighter.Transaction\"\xb0\x01\n\x0bTransaction\x12\x0c\n\x04txid\x18\x01 \x01(\t\x12\x13\n\x0b\x61mount_bits\x18\x02 \x01(\x01\x12\x19\n\x11num_confirmations\x18\x03 \x01(\x05\x12\x12\n\nblock_hash\x18\x04 \x01(\t\x12\x13\n\x0b\x62lockheight\x18\x05 \x01(\x05\x12\x11\n\ttimestamp\x18\x06 \x01(\x03\x12\x0f\n\x07\x66\x65\x65_sat\x18\x07 \x01(\x03\x12\x16\n\x0e\x64\x65st_addresses\x18\x08 \x03(\t\"7\n\x11NewAddressRequest\x12\"\n\x04type\x18\x01 \x01(\x0e\x32\x14.lighter.AddressType\"%\n\x12NewAddressResponse\x12\x0f\n\x07\x61\x64\x64ress\x18\x01 \x01(\t\"`\n\x12OpenChannelRequest\x12\x10\n\x08node_uri\x18\x01 \x01(\t\x12\x14\n\x0c\x66unding_bits\x18\x02 \x01(\x01\x12\x11\n\tpush_bits\x18\x03 \x01(\x01\x12\x0f\n\x07private\x18\x04 \x01(\x08\"+\n\x13OpenChannelResponse\x12\x14\n\x0c\x66unding_txid\x18\x01 \x01(\t\"q\n\x11PayInvoiceRequest\x12\x17\n\x0fpayment_request\x18\x01 \x01(\t\x12\x13\n\x0b\x61mount_bits\x18\x02 \x01(\x01\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\x19\n\x11\x63ltv_expiry_delta\x18\x04 \x01(\x04\".\n\x12PayInvoiceResponse\x12\x18\n\x10payment_preimage\x18\x01 \x01(\t\"O\n\x11PayOnChainRequest\x12\x0f\n\x07\x61\x64\x64ress\x18\x01 \x01(\t\x12\x13\n\x0b\x61mount_bits\x18\x02 \x01(\x01\x12\x14\n\x0c\x66\x65\x65_sat_byte\x18\x03 \x01(\x03\"\"\n\x12PayOnChainResponse\x12\x0c\n\x04txid\x18\x01 \x01(\t\"\x16\n\x14WalletBalanceRequest\"(\n\x15WalletBalanceResponse\x12\x0f\n\x07\x62\x61lance\x18\x01 \x01(\x01*j\n\x0c\x43hannelState\x12\x10\n\x0cPENDING_OPEN\x10\x00\x12\x08\n\x04OPEN\x10\x01\x12\x18\n\x14PENDING_MUTUAL_CLOSE\x10\x02\x12\x17\n\x13PENDING_FORCE_CLOSE\x10\x03\x12\x0b\n\x07UNKNOWN\x10\x04*&\n\x05Order\x12\r\n\tASCENDING\x10\x00\x12\x0e\n\nDESCENDING\x10\x01*2\n\x0cInvoiceState\x12\x08\n\x04PAID\x10\x00\x12\x0b\n\x07PENDING\x10\x01\x12\x0b\n\x07\x45XPIRED\x10\x02*E\n\x0b\x41\x64\x64ressType\x12\n\n\x06NP2WKH\x10\x00\x12\x0f\n\x0bP2SH_SEGWIT\x10\x00\x12\t\n\x05P2WKH\x10\x01\x12\n\n\x06\x42\x45\x43H32\x10\x01\x1a\x02\x10\x01\x32Z\n\x08Unlocker\x12N\n\rUnlockLighter\x12\x1d.lighter.UnlockLighterRequest\x1a\x1e.lighter.UnlockLighterResponse2\xfc\x08\n\tLightning\x12Q\n\x0e\x43hannelBalance\x12\x1e.lighter.ChannelBalanceRequest\x1a\x1f.lighter.ChannelBalanceResponse\x12K\n\x0c\x43heckInvoice\x12\x1c.lighter.CheckInvoiceRequest\x1a\x1d.lighter.CheckInvoiceResponse\x12N\n\rCreateInvoice\x12\x1d.lighter.CreateInvoiceRequest\x1a\x1e.lighter.CreateInvoiceResponse\x12N\n\rDecodeInvoice\x12\x1d.lighter.DecodeInvoiceRequest\x1a\x1e.lighter.DecodeInvoiceResponse\x12<\n\x07GetInfo\x12\x17.lighter.GetInfoRequest\x1a\x18.lighter.GetInfoResponse\x12K\n\x0cListChannels\x12\x1c.lighter.ListChannelsRequest\x1a\x1d.lighter.ListChannelsResponse\x12K\n\x0cListInvoices\x12\x1c.lighter.ListInvoicesRequest\x1a\x1d.lighter.ListInvoicesResponse\x12K\n\x0cListPayments\x12\x1c.lighter.ListPaymentsRequest\x1a\x1d.lighter.ListPaymentsResponse\x12\x42\n\tListPeers\x12\x19.lighter.ListPeersRequest\x1a\x1a.lighter.ListPeersResponse\x12W\n\x10ListTransactions\x12 .lighter.ListTransactionsRequest\x1a!.lighter.ListTransactionsResponse\x12\x45\n\nNewAddress\x12\x1a.lighter.NewAddressRequest\x1a\x1b.lighter.NewAddressResponse\x12H\n\x0bOpenChannel\x12\x1b.lighter.OpenChannelRequest\x1a\x1c.lighter.OpenChannelResponse\x12\x45\n\nPayInvoice\x12\x1a.lighter.PayInvoiceRequest\x1a\x1b.lighter.PayInvoiceResponse\x12\x45\n\nPayOnChain\x12\x1a.lighter.PayOnChainRequest\x1a\x1b.lighter.PayOnChainResponse\x12N\n\rWalletBalance\x12\x1d.lighter.WalletBalanceRequest\x1a\x1e.lighter.WalletBalanceResponseb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'lighter_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_ADDRESSTYPE']._loaded_options = None
+  _globals['_ADDRESSTYPE']._serialized_options = b'\020\001'
+  _globals['_CHANNELSTATE']._serialized_start=3283
+  _globals['_CHANNELSTATE']._serialized_end=3389
+  _globals['_ORDER']._serialized_start=3391
+  _globals['_ORDER']._serialized_end=3429
+  _globals['_INVOICESTATE']._serialized_start=3431
+  _globals['_INVOICESTATE']._serialized_end=3481
+  _globals['_ADDRESSTYPE']._serialized_start=3483
+  _globals['_ADDRESSTYPE']._serialized_end=3552
+  _globals['_UNLOCKLIGHTERREQUEST']._serialized_start=26
+  _globals['_UNLOCKLIGHTERREQUEST']._serialized_end=66
+  _globals['_UNLOCKLIGHTERRESPONSE']._serialized_start=68
+  _globals['_UNLOCKLIGHTERRESPONSE']._serialized_end=91
+  _globals['_CHANNELBALANCEREQUEST']._serialized_start=93
+  _globals['_CHANNELBALANCEREQUEST']._serialized_end=116
+  _globals['_CHANNELBALANCERESPONSE']._serialized_start=118
+  _globals['_CHANNELBALANCERESPONSE']._serialized_end=159
+  _globals['_CHECKINVOICEREQUEST']._serialized_start=161
+  _globals['_CHECKINVOICEREQUEST']._serialized_end=204
+  _globals['_CHECKINVOICERESPONSE']._serialized_start=206
+  _globals['_CHECKINVOICERESPONSE']._serialized_end=245
+  _globals['_CREATEINVOICEREQUEST']._serialized_start=248
+  _globals['_CREATEINVOICEREQUEST']._serialized_end=387
+  _globals['_CREATEINVOICERESPONSE']._serialized_start=389
+  _globals['_CREATEINVOICERESPONSE']._serialized_end=479
+  _globals['_GETINFOREQUEST']._serialized_start=481
+  _globals['_GETINFOREQUEST']._serialized_end=497
+  _globals['_DECODEINVOICEREQUEST']._serialized_start=499
+  _globals['_DECODEINVOICEREQUEST']._serialized_end=567
+  _globals['_DECODEINVOICERESPONSE']._serialized_start=570
+  _globals['_DECODEINVOICERESPONSE']._serialized_end=846
+  _globals['_ROUTEHINT']._serialized_start=848
+  _globals['_ROUTEHINT']._serialized_end=896
+  _globals['_HOPHINT']._serialized_start=899
+  _globals['_HOPHINT']._serialized_end=1037
+  _globals['_GETINFORESPONSE']._serialized_start=1040
+  _globals['_GETINFORESPONSE']._serialized_end=1185
+  _globals['_LISTCHANNELSREQUEST']._serialized_start=1187
+  _globals['_LISTCHANNELSREQUEST']._serialized_end=1229
+  _globals['_LISTCHANNELSRESPONSE']._serialized_start=1231
+  _globals['_LISTCHANNELSRESPONSE']._serialized_end=1289
+  _globals['_CHANNEL']._serialized_start=1292
+  _globals['_CHANNEL']._serialized_end=1551
+  _globals['_LISTINVOICESREQUEST']._serialized_start=1554
+  _globals['_LISTINVOICESREQUEST']._serialized_end=1742
+  _globals['_LISTINVOICESRESPONSE']._serialized_start=1744
+  _globals['_LISTINVOICESRESPONSE']._serialized_end=1802
+  _globals['_INVOICE']._serialized_start=1805
+  _globals['_INVOICE']._serialized_end=2071
+  _globals['_LISTPAYMENTSREQUEST']._serialized_start=2073
+  _globals['_LISTPAYMENTSREQUEST']._serialized_end=2094
+  _globals['_LISTPAYMENTSRESPONSE']._serialized_start=2096
+  _globals['_LISTPAYMENTSRESPONSE']._serialized_end=2154
+  _globals['_PAYMENT']._serialized_start=2156
+  _globals['_PAYMENT']._serialized_end=2276
+  _globals['_LISTPEERSREQUEST']._serialized_start=2278
+  _globals['_LISTPEERSREQUEST']._serialized_end=2296
+  _globals['_LISTPEERSRESPONSE']._serialized_start=2298
+  _globals['_LISTPEERSRESPONSE']._serialized_end=2347
+  _globals['_PEER']._serialized_start=2349
+  _globals['_PEER']._serialized_end=2418
+  _globals['_LISTTRANSACTIONSREQUEST']._serialized_start=2420
+  _globals['_LISTTRANSACTIONSREQUEST']._serialized_end=2445
+  _globals['_LISTTRANSACTIONSRESPONSE']._serialized_start=2447
+  _globals['_LISTTRANSACTIONSRESPONSE']._serialized_end=2517
+  _globals['_TRANSACTION']._serialized_start=2520
+  _globals['_TRANSACTION']._serialized_end=2696
+  _globals['_NEWADDRESSREQUEST']._serialized_start=2698
+  _globals['_NEWADDRESSREQUEST']._serialized_end=2753
+  _globals['_NEWADDRESSRESPONSE']._serialized_start=2755
+  _globals['_NEWADDRESSRESPONSE']._serialized_end=2792
+  _globals['_OPENCHANNELREQUEST']._serialized_start=2794
+  _globals['_OPENCHANNELREQUEST']._serialized_end=2890
+  _globals['_OPENCHANNELRESPONSE']._serialized_start=2892
+  _globals['_OPENCHANNELRESPONSE']._serialized_end=2935
+  _globals['_PAYINVOICEREQUEST']._serialized_start=2937
+  _globals['_PAYINVOICEREQUEST']._serialized_end=3050
+  _globals['_PAYINVOICERESPONSE']._serialized_start=3052
+  _globals['_PAYINVOICERESPONSE']._serialized_end=3098
+  _globals['_PAYONCHAINREQUEST']._serialized_start=3100
+  _globals['_PAYONCHAINREQUEST']._serialized_end=3179
+  _globals['_PAYONCHAINRESPONSE']._serialized_start=3181
+  _globals['_PAYONCHAINRESPONSE']._serialized_end=3215
+  _globals['_WALLETBALANCEREQUEST']._serialized_start=3217
+  _globals['_WALLETBALANCEREQUEST']._serialized_end=3239
+  _globals['_WALLETBALANCERESPONSE']._serialized_start=3241
+  _globals['_WALLETBALANCERESPONSE']._serialized_end=3281
+  _globals['_UNLOCKER']._serialized_start=3554
+  _globals['_UNLOCKER']._serialized_end=3644
+  _globals['_LIGHTNING']._serialized_start=3647
+  _globals['_LIGHTNING']._serialized_end=4795
+# @@protoc_insertion_point(module_scope)
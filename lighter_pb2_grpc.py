@@ -0,0 +1,826 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+import warnings
+
+import lighter_pb2 as lighter__pb2
+
+GRPC_GENERATED_VERSION = '1.84.0'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + ' but the generated code in lighter_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
+
+class UnlockerStub:
+    """Unlocker service exposes a single operation used to unlock the Lightning
+    service.
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.UnlockLighter = channel.unary_unary(
+                '/lighter.Unlocker/UnlockLighter',
+                request_serializer=lighter__pb2.UnlockLighterRequest.SerializeToString,
+                response_deserializer=lighter__pb2.UnlockLighterResponse.FromString,
+                _registered_method=True)
+
+
+class UnlockerServicer:
+    """Unlocker service exposes a single operation used to unlock the Lightning
+    service.
+    """
+
+    def UnlockLighter(self, request, context):
+        """*
+        UnlockLighter unlocks Lighter's secrets using the password choosen in
+        initialization phase. This call does not require macaroons authentication.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_UnlockerServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'UnlockLighter': grpc.unary_unary_rpc_method_handler(
+                    servicer.UnlockLighter,
+                    request_deserializer=lighter__pb2.UnlockLighterRequest.FromString,
+                    response_serializer=lighter__pb2.UnlockLighterResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'lighter.Unlocker', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('lighter.Unlocker', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Unlocker:
+    """Unlocker service exposes a single operation used to unlock the Lightning
+    service.
+    """
+
+    @staticmethod
+    def UnlockLighter(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Unlocker/UnlockLighter',
+            lighter__pb2.UnlockLighterRequest.SerializeToString,
+            lighter__pb2.UnlockLighterResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+
+class LightningStub:
+    """Lightning service exposes all LN node related operations. It activates
+    after unlocking Lighter and it requires valid macaroons, if they are
+    enabled, for each call.
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.ChannelBalance = channel.unary_unary(
+                '/lighter.Lightning/ChannelBalance',
+                request_serializer=lighter__pb2.ChannelBalanceRequest.SerializeToString,
+                response_deserializer=lighter__pb2.ChannelBalanceResponse.FromString,
+                _registered_method=True)
+        self.CheckInvoice = channel.unary_unary(
+                '/lighter.Lightning/CheckInvoice',
+                request_serializer=lighter__pb2.CheckInvoiceRequest.SerializeToString,
+                response_deserializer=lighter__pb2.CheckInvoiceResponse.FromString,
+                _registered_method=True)
+        self.CreateInvoice = channel.unary_unary(
+                '/lighter.Lightning/CreateInvoice',
+                request_serializer=lighter__pb2.CreateInvoiceRequest.SerializeToString,
+                response_deserializer=lighter__pb2.CreateInvoiceResponse.FromString,
+                _registered_method=True)
+        self.DecodeInvoice = channel.unary_unary(
+                '/lighter.Lightning/DecodeInvoice',
+                request_serializer=lighter__pb2.DecodeInvoiceRequest.SerializeToString,
+                response_deserializer=lighter__pb2.DecodeInvoiceResponse.FromString,
+                _registered_method=True)
+        self.GetInfo = channel.unary_unary(
+                '/lighter.Lightning/GetInfo',
+                request_serializer=lighter__pb2.GetInfoRequest.SerializeToString,
+                response_deserializer=lighter__pb2.GetInfoResponse.FromString,
+                _registered_method=True)
+        self.ListChannels = channel.unary_unary(
+                '/lighter.Lightning/ListChannels',
+                request_serializer=lighter__pb2.ListChannelsRequest.SerializeToString,
+                response_deserializer=lighter__pb2.ListChannelsResponse.FromString,
+                _registered_method=True)
+        self.ListInvoices = channel.unary_unary(
+                '/lighter.Lightning/ListInvoices',
+                request_serializer=lighter__pb2.ListInvoicesRequest.SerializeToString,
+                response_deserializer=lighter__pb2.ListInvoicesResponse.FromString,
+                _registered_method=True)
+        self.ListPayments = channel.unary_unary(
+                '/lighter.Lightning/ListPayments',
+                request_serializer=lighter__pb2.ListPaymentsRequest.SerializeToString,
+                response_deserializer=lighter__pb2.ListPaymentsResponse.FromString,
+                _registered_method=True)
+        self.ListPeers = channel.unary_unary(
+                '/lighter.Lightning/ListPeers',
+                request_serializer=lighter__pb2.ListPeersRequest.SerializeToString,
+                response_deserializer=lighter__pb2.ListPeersResponse.FromString,
+                _registered_method=True)
+        self.ListTransactions = channel.unary_unary(
+                '/lighter.Lightning/ListTransactions',
+                request_serializer=lighter__pb2.ListTransactionsRequest.SerializeToString,
+                response_deserializer=lighter__pb2.ListTransactionsResponse.FromString,
+                _registered_method=True)
+        self.NewAddress = channel.unary_unary(
+                '/lighter.Lightning/NewAddress',
+                request_serializer=lighter__pb2.NewAddressRequest.SerializeToString,
+                response_deserializer=lighter__pb2.NewAddressResponse.FromString,
+                _registered_method=True)
+        self.OpenChannel = channel.unary_unary(
+                '/lighter.Lightning/OpenChannel',
+                request_serializer=lighter__pb2.OpenChannelRequest.SerializeToString,
+                response_deserializer=lighter__pb2.OpenChannelResponse.FromString,
+                _registered_method=True)
+        self.PayInvoice = channel.unary_unary(
+                '/lighter.Lightning/PayInvoice',
+                request_serializer=lighter__pb2.PayInvoiceRequest.SerializeToString,
+                response_deserializer=lighter__pb2.PayInvoiceResponse.FromString,
+                _registered_method=True)
+        self.PayOnChain = channel.unary_unary(
+                '/lighter.Lightning/PayOnChain',
+                request_serializer=lighter__pb2.PayOnChainRequest.SerializeToString,
+                response_deserializer=lighter__pb2.PayOnChainResponse.FromString,
+                _registered_method=True)
+        self.WalletBalance = channel.unary_unary(
+                '/lighter.Lightning/WalletBalance',
+                request_serializer=lighter__pb2.WalletBalanceRequest.SerializeToString,
+                response_deserializer=lighter__pb2.WalletBalanceResponse.FromString,
+                _registered_method=True)
+
+
+class LightningServicer:
+    """Lightning service exposes all LN node related operations. It activates
+    after unlocking Lighter and it requires valid macaroons, if they are
+    enabled, for each call.
+    """
+
+    def ChannelBalance(self, request, context):
+        """*
+        ChannelBalance returns the off-chain balance, in bits, available across all
+        channels.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CheckInvoice(self, request, context):
+        """*
+        CheckInvoice checks if a LN invoice has been paid.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CreateInvoice(self, request, context):
+        """*
+        CreateInvoice creates a LN invoice (BOLT 11).
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DecodeInvoice(self, request, context):
+        """*
+        DecodeInvoice returns information of a LN invoice from its payment
+        request (BOLT 11).
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetInfo(self, request, context):
+        """*
+        GetInfo returns info about the connected LN node.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListChannels(self, request, context):
+        """*
+        ListChannels returns a list of channels of the connected LN node.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListInvoices(self, request, context):
+        """*
+        ListInvoices returns a list of invoices created by the connected LN node.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListPayments(self, request, context):
+        """*
+        ListPayments returns a list of invoices the connected LN node has paid.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListPeers(self, request, context):
+        """*
+        ListPeers returns a list of peers connected to the connected LN node.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListTransactions(self, request, context):
+        """*
+        ListTransactions returns a list of on-chain transactions of the connected
+        LN node.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def NewAddress(self, request, context):
+        """*
+        NewAddress creates a new bitcoin address under control of the connected LN
+        node.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def OpenChannel(self, request, context):
+        """*
+        OpenChannel tries to connect and open a channel with a peer.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PayInvoice(self, request, context):
+        """*
+        PayInvoice tries to pay a LN invoice from its payment request (BOLT 11).
+        An amount can be specified if the invoice doesn't already have it
+        included. If a description hash is included in the invoice, its preimage
+        must be included in the request.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PayOnChain(self, request, context):
+        """*
+        PayOnChain tries to pay a bitcoin payment request.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WalletBalance(self, request, context):
+        """*
+        WalletBalance returns the on-chain balance, in bits.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_LightningServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'ChannelBalance': grpc.unary_unary_rpc_method_handler(
+                    servicer.ChannelBalance,
+                    request_deserializer=lighter__pb2.ChannelBalanceRequest.FromString,
+                    response_serializer=lighter__pb2.ChannelBalanceResponse.SerializeToString,
+            ),
+            'CheckInvoice': grpc.unary_unary_rpc_method_handler(
+                    servicer.CheckInvoice,
+                    request_deserializer=lighter__pb2.CheckInvoiceRequest.FromString,
+                    response_serializer=lighter__pb2.CheckInvoiceResponse.SerializeToString,
+            ),
+            'CreateInvoice': grpc.unary_unary_rpc_method_handler(
+                    servicer.CreateInvoice,
+                    request_deserializer=lighter__pb2.CreateInvoiceRequest.FromString,
+                    response_serializer=lighter__pb2.CreateInvoiceResponse.SerializeToString,
+            ),
+            'DecodeInvoice': grpc.unary_unary_rpc_method_handler(
+                    servicer.DecodeInvoice,
+                    request_deserializer=lighter__pb2.DecodeInvoiceRequest.FromString,
+                    response_serializer=lighter__pb2.DecodeInvoiceResponse.SerializeToString,
+            ),
+            'GetInfo': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetInfo,
+                    request_deserializer=lighter__pb2.GetInfoRequest.FromString,
+                    response_serializer=lighter__pb2.GetInfoResponse.SerializeToString,
+            ),
+            'ListChannels': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListChannels,
+                    request_deserializer=lighter__pb2.ListChannelsRequest.FromString,
+                    response_serializer=lighter__pb2.ListChannelsResponse.SerializeToString,
+            ),
+            'ListInvoices': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListInvoices,
+                    request_deserializer=lighter__pb2.ListInvoicesRequest.FromString,
+                    response_serializer=lighter__pb2.ListInvoicesResponse.SerializeToString,
+            ),
+            'ListPayments': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListPayments,
+                    request_deserializer=lighter__pb2.ListPaymentsRequest.FromString,
+                    response_serializer=lighter__pb2.ListPaymentsResponse.SerializeToString,
+            ),
+            'ListPeers': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListPeers,
+                    request_deserializer=lighter__pb2.ListPeersRequest.FromString,
+                    response_serializer=lighter__pb2.ListPeersResponse.SerializeToString,
+            ),
+            'ListTransactions': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListTransactions,
+                    request_deserializer=lighter__pb2.ListTransactionsRequest.FromString,
+                    response_serializer=lighter__pb2.ListTransactionsResponse.SerializeToString,
+            ),
+            'NewAddress': grpc.unary_unary_rpc_method_handler(
+                    servicer.NewAddress,
+                    request_deserializer=lighter__pb2.NewAddressRequest.FromString,
+                    response_serializer=lighter__pb2.NewAddressResponse.SerializeToString,
+            ),
+            'OpenChannel': grpc.unary_unary_rpc_method_handler(
+                    servicer.OpenChannel,
+                    request_deserializer=lighter__pb2.OpenChannelRequest.FromString,
+                    response_serializer=lighter__pb2.OpenChannelResponse.SerializeToString,
+            ),
+            'PayInvoice': grpc.unary_unary_rpc_method_handler(
+                    servicer.PayInvoice,
+                    request_deserializer=lighter__pb2.PayInvoiceRequest.FromString,
+                    response_serializer=lighter__pb2.PayInvoiceResponse.SerializeToString,
+            ),
+            'PayOnChain': grpc.unary_unary_rpc_method_handler(
+                    servicer.PayOnChain,
+                    request_deserializer=lighter__pb2.PayOnChainRequest.FromString,
+                    response_serializer=lighter__pb2.PayOnChainResponse.SerializeToString,
+            ),
+            'WalletBalance': grpc.unary_unary_rpc_method_handler(
+                    servicer.WalletBalance,
+                    request_deserializer=lighter__pb2.WalletBalanceRequest.FromString,
+                    response_serializer=lighter__pb2.WalletBalanceResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'lighter.Lightning', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('lighter.Lightning', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Lightning:
+    """Lightning service exposes all LN node related operations. It activates
+    after unlocking Lighter and it requires valid macaroons, if they are
+    enabled, for each call.
+    """
+
+    @staticmethod
+    def ChannelBalance(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/ChannelBalance',
+            lighter__pb2.ChannelBalanceRequest.SerializeToString,
+            lighter__pb2.ChannelBalanceResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CheckInvoice(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/CheckInvoice',
+            lighter__pb2.CheckInvoiceRequest.SerializeToString,
+            lighter__pb2.CheckInvoiceResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CreateInvoice(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/CreateInvoice',
+            lighter__pb2.CreateInvoiceRequest.SerializeToString,
+            lighter__pb2.CreateInvoiceResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def DecodeInvoice(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/DecodeInvoice',
+            lighter__pb2.DecodeInvoiceRequest.SerializeToString,
+            lighter__pb2.DecodeInvoiceResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetInfo(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/GetInfo',
+            lighter__pb2.GetInfoRequest.SerializeToString,
+            lighter__pb2.GetInfoResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListChannels(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/ListChannels',
+            lighter__pb2.ListChannelsRequest.SerializeToString,
+            lighter__pb2.ListChannelsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListInvoices(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/ListInvoices',
+            lighter__pb2.ListInvoicesRequest.SerializeToString,
+            lighter__pb2.ListInvoicesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListPayments(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/ListPayments',
+            lighter__pb2.ListPaymentsRequest.SerializeToString,
+            lighter__pb2.ListPaymentsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListPeers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/ListPeers',
+            lighter__pb2.ListPeersRequest.SerializeToString,
+            lighter__pb2.ListPeersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListTransactions(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/ListTransactions',
+            lighter__pb2.ListTransactionsRequest.SerializeToString,
+            lighter__pb2.ListTransactionsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def NewAddress(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/NewAddress',
+            lighter__pb2.NewAddressRequest.SerializeToString,
+            lighter__pb2.NewAddressResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def OpenChannel(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/OpenChannel',
+            lighter__pb2.OpenChannelRequest.SerializeToString,
+            lighter__pb2.OpenChannelResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PayInvoice(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/PayInvoice',
+            lighter__pb2.PayInvoiceRequest.SerializeToString,
+            lighter__pb2.PayInvoiceResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PayOnChain(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/PayOnChain',
+            lighter__pb2.PayOnChainRequest.SerializeToString,
+            lighter__pb2.PayOnChainResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WalletBalance(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/lighter.Lightning/WalletBalance',
+            lighter__pb2.WalletBalanceRequest.SerializeToString,
+            lighter__pb2.WalletBalanceResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -1,29 +1,273 @@
 import codecs
 import os
 import re
+import time
+import threading
+from collections import namedtuple, defaultdict, Counter, OrderedDict
 import grpc
 from grpc import RpcError
 # TODO: write a Makefile to compile lighter_pb2.*.py files
 import lighter_pb2 as pb
 import lighter_pb2_grpc as pb_grpc
+from samples import Samples
 
 os.environ['GRPC_SSL_CIPHER_SUITES'] = (
     'HIGH+ECDSA:'
     'ECDHE-RSA-AES128-GCM-SHA256:ECDHE-RSA-AES256-GCM-SHA384')
 
+# Connection options, they can be set in the lighter section of the config.
+# Times are in seconds, timeout_<method> overrides timeout for a single RPC
+DEFAULT_OPTIONS = {
+    # Servers refuse pings without calls closer than 5 minutes by default
+    'keepalive': 300,
+    'keepalive_timeout': 10,
+    'max_message_size': 32 * 1024 * 1024,
+    'connect_timeout': 5,
+    'min_backoff': 1,
+    'max_backoff': 30,
+    'timeout': 15,
+    'timeout_payinvoice': 120,
+    'timeout_openchannel': 60,
+    'timeout_payonchain': 60,
+    'cache_ttl': 5,  # Of getinfo, balances and channels, 0 disables it
+}
+
+# Cached calls whose responses are changed by a call
+INVALIDATES = {
+    'payinvoice': ('channelbalance', 'listchannels'),
+    'openchannel': (
+        'getinfo', 'walletbalance', 'channelbalance', 'listchannels'),
+    'payonchain': ('walletbalance', ),
+    # No cached call depends on them
+    'createinvoice': (),
+    'newaddress': (),
+}
+
+
+def read_options(section):
+    """Connection options from a config section"""
+    options = {}
+    for key, value in section.items():
+        if key in DEFAULT_OPTIONS or key.startswith('timeout_'):
+            options[key] = float(value)
+    return options
+
+
+def channel_options(options):
+    """grpc channel arguments from connection options"""
+    return [
+        ('grpc.keepalive_time_ms', int(options['keepalive'] * 1000)),
+        ('grpc.keepalive_timeout_ms',
+         int(options['keepalive_timeout'] * 1000)),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.max_pings_without_data', 0),
+        ('grpc.max_receive_message_length',
+         int(options['max_message_size'])),
+        ('grpc.max_send_message_length', int(options['max_message_size'])),
+        ('grpc.initial_reconnect_backoff_ms',
+         int(options['min_backoff'] * 1000)),
+        ('grpc.min_reconnect_backoff_ms', int(options['min_backoff'] * 1000)),
+        ('grpc.max_reconnect_backoff_ms', int(options['max_backoff'] * 1000)),
+    ]
+
+
+def method_timeout(options, method):
+    """Default deadline of a RPC, method is the full grpc method name"""
+    if isinstance(method, bytes):  # grpc.aio
+        method = method.decode('ascii')
+    name = method.rsplit('/', 1)[-1].lower()
+    return options.get('timeout_' + name, options['timeout'])
+
+
+class _CallDetails(
+        namedtuple('_CallDetails', (
+            'method', 'timeout', 'metadata', 'credentials',
+            'wait_for_ready', 'compression')),
+        grpc.ClientCallDetails):
+    pass
+
+
+class DeadlineInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Set the default deadline to calls without one"""
+
+    def __init__(self, options):
+        self._options = options
+
+    def intercept_unary_unary(self, continuation, client_call_details,
+                              request):
+        if client_call_details.timeout is None:
+            client_call_details = _CallDetails(
+                client_call_details.method,
+                method_timeout(self._options, client_call_details.method),
+                client_call_details.metadata,
+                client_call_details.credentials,
+                client_call_details.wait_for_ready,
+                client_call_details.compression)
+        return continuation(client_call_details, request)
+
+
+class LighterFuture:
+    """Future of a Lighter call, result() extracts the relevant field"""
+
+    def __init__(self, future, extract=None):
+        self._future = future
+        self._extract = extract
+
+    def result(self, timeout=None):
+        response = self._future.result(timeout)
+        if self._extract is None:
+            return response
+        return self._extract(response)
+
+
+class ResponseCache:
+    """Futures of the recent calls, by method and arguments
+
+    Entries with a ttl expire, the others are dropped when least recently
+    used beyond max_size. Concurrent calls share the pending future, a
+    failed call is not served again. call() runs with the lock held, it
+    must only start the RPC and return its future, as stub.X.future does.
+    """
+
+    def __init__(self, max_size=256):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (method, args): expiration, future
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @staticmethod
+    def _failed(future):
+        return future.done() and (
+            future.cancelled() or future.exception() is not None)
+
+    def get(self, method, args, call, ttl=None):
+        """Return the cached future or the new one of call()"""
+        key = method, args
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and not self._failed(entry[1]):
+                self._entries.move_to_end(key)
+                self.hits[method] += 1
+                return entry[1]
+            self.misses[method] += 1
+            # Stored before the lock is released: concurrent misses share it
+            future = call()
+            self._entries[key] = (
+                now + ttl if ttl is not None else float('inf'), future)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return future
+
+    def invalidate(self, *methods):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in methods]:
+                del self._entries[key]
+
+
+class RpcStats:
+    """Latency, error codes and response sizes of every RPC since startup
+
+    Percentiles are computed on the last samples.SAMPLES calls of each
+    method"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(Samples)
+        self._calls = Counter()
+        self._errors = defaultdict(Counter)
+        self._bytes = Counter()
+
+    def record(self, method, latency, code=None, size=0):
+        with self._lock:
+            self._latencies[method].append(latency)
+            self._calls[method] += 1
+            if code is not None:
+                self._errors[method][code] += 1
+            self._bytes[method] += size
+
+    def percentiles(self, method, *ps):
+        """Latencies in seconds, None if the method was never called"""
+        with self._lock:
+            samples = self._latencies.get(method)
+        if samples is None:
+            return tuple(None for _ in ps)
+        return samples.percentiles(*ps)
+
+    def methods(self):
+        with self._lock:
+            return sorted(self._calls)
+
+    def summary(self, method):
+        """calls, {error code: count}, average response size in bytes"""
+        with self._lock:
+            calls = self._calls[method]
+            errors = dict(self._errors[method])
+            ok = calls - sum(errors.values())
+            avg_size = self._bytes[method] / ok if ok else 0
+        return calls, errors, avg_size
+
+
+class StatsInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Record every call in a RpcStats object"""
+
+    def __init__(self, stats):
+        self._stats = stats
+
+    def intercept_unary_unary(self, continuation, client_call_details,
+                              request):
+        method = client_call_details.method.rsplit('/', 1)[-1]
+        start = time.monotonic()
+
+        def done(call):
+            latency = time.monotonic() - start
+            code = call.code()
+            if code == grpc.StatusCode.OK:
+                size = call.result().ByteSize()
+                self._stats.record(method, latency, size=size)
+            else:
+                self._stats.record(method, latency, code.name)
+
+        call = continuation(client_call_details, request)
+        call.add_done_callback(done)
+        return call
+
 
 class LightererGrpc:
-    def __init__(self, host, port, cert=None, macaroon=None):
+    def __init__(self, host, port, cert=None, macaroon=None, options=None):
         assert isinstance(host, str)
         assert isinstance(port, int) or re.match(r'^\d+$', port)
+        self._options = dict(DEFAULT_OPTIONS, **(options or {}))
         if cert and macaroon:
             self._channel = grpc.secure_channel(
                 '{}:{}'.format(host, port),
-                self.credentials_init(cert, macaroon))
+                self.credentials_init(cert, macaroon),
+                channel_options(self._options))
         else:
             self._channel = grpc.insecure_channel(
-                '{}:{}'.format(host, port))
+                '{}:{}'.format(host, port), channel_options(self._options))
+        self.stats = RpcStats()
+        self.cache = ResponseCache()
+        self._channel = grpc.intercept_channel(
+            self._channel, DeadlineInterceptor(self._options),
+            StatsInterceptor(self.stats))
         self.stub = pb_grpc.LightningStub(self._channel)
+        self.wait_ready()
+
+    def wait_ready(self, timeout=None):
+        """Connect to lighter, return True if the channel is ready"""
+        if timeout is None:
+            timeout = self._options['connect_timeout']
+        ready = grpc.channel_ready_future(self._channel)
+        try:
+            ready.result(timeout=timeout)
+        except grpc.FutureTimeoutError:
+            ready.cancel()
+            print('Lighter is not reachable, it will be retried on demand')
+            return False
+        return True
 
     @staticmethod
     def credentials_init(cert, macaroon):
@@ -68,11 +312,31 @@ class LightererGrpc:
 
 
 class Lighterer(LightererGrpc):
-    """Interface to lighter"""
+    """Interface to lighter
+
+    getinfo, balances and channels are cached for cache_ttl seconds,
+    decoded invoices until they are least recently used. The calls in
+    INVALIDATES drop the responses they change."""
+
+    def _cached(self, method, args, call):
+        ttl = self._options['cache_ttl']
+        if not ttl:
+            return call()
+        return self.cache.get(method, args, call, ttl)
+
+    def _invalidate(self, method):
+        self.cache.invalidate(*INVALIDATES[method])
 
     def channelbalance(self):
+        return self.channelbalance_future().result()
+
+    def channelbalance_future(self):
         request = pb.ChannelBalanceRequest()
-        return self.stub.ChannelBalance(request).balance
+        return LighterFuture(
+            self._cached(
+                'channelbalance', (),
+                lambda: self.stub.ChannelBalance.future(request)),
+            lambda r: r.balance)
 
     def checkinvoice(self, payment_hash):
         request = pb.CheckInvoiceRequest()
@@ -88,16 +352,26 @@ class Lighterer(LightererGrpc):
             expiry_time=expiry_time,
             min_final_cltv_expiry=min_final_cltv_expiry,
             fallback_addr=fallback_addr)
-        return self.stub.CreateInvoice(request)
+        try:
+            return self.stub.CreateInvoice(request)
+        finally:
+            self._invalidate('createinvoice')
 
     def decodeinvoice(self, payment_request):
         assert isinstance(payment_request, str)
         request = pb.DecodeInvoiceRequest(payment_request=payment_request)
-        return self.stub.DecodeInvoice(request)
+        # A pure function of the payment request
+        return self.cache.get(
+            'decodeinvoice', (payment_request, ),
+            lambda: self.stub.DecodeInvoice.future(request)).result()
 
     def getinfo(self):
+        return self.getinfo_future().result()
+
+    def getinfo_future(self):
         request = pb.GetInfoRequest()
-        return self.stub.GetInfo(request)
+        return LighterFuture(self._cached(
+            'getinfo', (), lambda: self.stub.GetInfo.future(request)))
         # try:
         #     response = stub.GetInfo(request)
         #     return response
@@ -105,9 +379,16 @@ class Lighterer(LightererGrpc):
         #     print('Error raised: {}'.format(err))
 
     def listchannels(self, active_only=False):
+        return self.listchannels_future(active_only).result()
+
+    def listchannels_future(self, active_only=False):
         assert isinstance(active_only, bool)
         request = pb.ListChannelsRequest(active_only=active_only)
-        return self.stub.ListChannels(request).channels
+        return LighterFuture(
+            self._cached(
+                'listchannels', (active_only, ),
+                lambda: self.stub.ListChannels.future(request)),
+            lambda r: r.channels)
 
     def listinvoices(
             self, max_items=200, search_timestamp=None,
@@ -130,7 +411,7 @@ class Lighterer(LightererGrpc):
         return self.stub.ListPayments(request)
 
     def listpeers(self):
-        request = pb.ListChannelsRequest()
+        request = pb.ListPeersRequest()
         return self.stub.ListPeers(request).peers
 
     def listtransactions(self):
@@ -140,7 +421,10 @@ class Lighterer(LightererGrpc):
     def newaddress(self, address_type='P2WKH'):
         assert address_type in ('P2WKH', 'NP2WKH')
         request = pb.NewAddressRequest(type=address_type)
-        return self.stub.NewAddress(request).address
+        try:
+            return self.stub.NewAddress(request).address
+        finally:
+            self._invalidate('newaddress')
 
     def openchannel(self, node_uri, funding_bits, push_bits=0, private=False):
         assert re.match(r'[a-fA-F\d]{66}@[\da-zA-Z.-]+:\d+', node_uri)
@@ -149,7 +433,10 @@ class Lighterer(LightererGrpc):
             funding_bits=funding_bits,
             push_bits=push_bits,
             private=private)
-        return self.stub.OpenChannel(request)
+        try:
+            return self.stub.OpenChannel(request)
+        finally:
+            self._invalidate('openchannel')
 
     def payinvoice(
             self, payment_request, amount_bits=None, description=None,
@@ -159,14 +446,20 @@ class Lighterer(LightererGrpc):
             amount_bits=amount_bits,
             description=description,
             cltv_expiry_delta=cltv_expiry_delta)
-        return self.stub.PayInvoice(request).payment_preimage
+        try:
+            return self.stub.PayInvoice(request).payment_preimage
+        finally:
+            self._invalidate('payinvoice')
 
     def payonchain(self, address, amount_bits, fee_sat_byte=None):
-        request = pb.OpenChannelRequest(
+        request = pb.PayOnChainRequest(
             address=address,
             amount_bits=amount_bits,
             fee_sat_byte=fee_sat_byte)
-        return self.stub.PayOnChain(request)
+        try:
+            return self.stub.PayOnChain(request)
+        finally:
+            self._invalidate('payonchain')
 
     def unlocklighter(self, password):
         # request = pb.UnlockLighterRequest(
@@ -175,8 +468,15 @@ class Lighterer(LightererGrpc):
         raise NotImplementedError
 
     def walletbalance(self):
+        return self.walletbalance_future().result()
+
+    def walletbalance_future(self):
         request = pb.WalletBalanceRequest()
-        return self.stub.WalletBalance(request).balance
+        return LighterFuture(
+            self._cached(
+                'walletbalance', (),
+                lambda: self.stub.WalletBalance.future(request)),
+            lambda r: r.balance)
 
 
 if __name__ == "__main__":
@@ -220,6 +520,10 @@ if __name__ == "__main__":
     # lit.close_connection()
 
 __all__ = [
+    'DEFAULT_OPTIONS',
     'Lighterer',
+    'ResponseCache',
+    'RpcStats',
+    'LighterFuture',
     'RpcError',
 ]
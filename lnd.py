@@ -31,6 +31,7 @@ import binascii
 from os import environ
 from fiat_rate import Fiat, RateError
 from cities import read_cities
+from aliases import AliasStore
 
 _24H = 60 * 60 * 24
 TX_LINK = 'https://www.smartbit.com.au/tx/%s'
@@ -75,10 +76,9 @@ class Lncli:
             self._cmd.append(environ['LNDDIR'])
         self._1ml = True
         self._lightblock = True
-        self.aliases = {}
+        self.aliases = AliasStore(environ.get('UNSAFEPAY_ALIASES'))
         self._cities = None
         self._update_lock = threading.Lock()
-        self._updated = 0
         self.update_aliases()
 
     def _command(self, *cmd):
@@ -94,18 +94,14 @@ class Lncli:
     def update_aliases(self):
 
         with self._update_lock:
-            if time.time() - self._updated < _24H:
+            if time.time() - self.aliases.graph_updated < _24H:
                 return
             try:
                 graph = self._command('describegraph')
             except NodeException as e:
                 print(e)
                 return
-            aliases = {}
-            for node in graph['nodes']:
-                aliases[node['pub_key']] = node['alias']
-            self.aliases = aliases
-            self._updated = time.time()
+            self.aliases.merge_graph(graph)
 
     def bg_update_aliases(self):
         th = threading.Thread(target=lambda: self.update_aliases())
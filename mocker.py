@@ -10,20 +10,41 @@ lightning_stub:
   return: ChannelBalanceResponse
   tag:
   - ok
+
+The parsed fixtures are cached by datasets.cached, with a size the lists
+of the stub are a synthetic node of datasets.generate.
 """
+import pickle
 from unittest.mock import Mock
 from collections import defaultdict
+from concurrent.futures import Future
+from functools import lru_cache, partial
 import lighter_pb2 as pb
 import yaml_lighter as yaml
+import datasets
 
 FIXTURES_FILE = 'fixtures.yaml'
 
 
-def load():
+def _parse():
     with open(FIXTURES_FILE, 'rt') as fd:
         return yaml.load(fd, Loader=yaml.Loader)
 
 
+@lru_cache(4)
+def _fixtures(sources):
+    return datasets.cached('fixtures', sources, _parse)
+
+
+def load():
+    """Parsed fixtures, new objects on every call"""
+    sources = b''
+    for path in (FIXTURES_FILE, yaml.__file__, __file__):
+        with open(path, 'rb') as fd:
+            sources += fd.read()
+    return pickle.loads(_fixtures(sources))
+
+
 def fixture_init(raw):
     """Init python object from raw data"""
 
@@ -37,9 +58,24 @@ def fixture_init(raw):
         return raw['return']
 
 
-def get_lightning_stub(mock, *tags):
+def future_of(call):
+    """Wrap a mocked call, the future is resolved immediately"""
+    def future(*args, **kwargs):
+        fut = Future()
+        try:
+            fut.set_result(call(*args, **kwargs))
+        except Exception as exception:
+            fut.set_exception(exception)
+        return fut
+    return future
+
+
+def get_lightning_stub(mock, *tags, size=None, seed=0):
     """
     Setup the mock as a LightningStub object with fixtures in FIXTURES_FILE
+
+    With a size the lists and the balances are of a synthetic node with
+    size channels, invoices, payments and transactions.
     """
     if not tags:
         tags = (None, )
@@ -78,14 +114,38 @@ def get_lightning_stub(mock, *tags):
         getattr(mock, call).return_value = value
     for call, value in side_effects.items():
         getattr(mock, call).side_effect = value
+    if size is not None:
+        scale(mock, datasets.generate(size, seed))
+    # 3. Futures share the responses of the blocking calls
+    for call in {fix['call'] for fix in data['lightning_stub']}:
+        getattr(mock, call + '_future').side_effect = future_of(
+            getattr(mock, call))
     return mock
 
 
+def scale(mock, dataset):
+    """Answer the list calls and the balances from dataset"""
+    responses = {
+        'listchannels': dataset.channels,
+        'listpeers': dataset.peers,
+        'listpayments': pb.ListPaymentsResponse(payments=dataset.payments),
+        'listtransactions': dataset.transactions,
+        'walletbalance': dataset.walletbalance,
+        'channelbalance': dataset.channelbalance,
+    }
+    for call, value in responses.items():
+        getattr(mock, call).side_effect = None
+        getattr(mock, call).return_value = value
+    mock.listinvoices.side_effect = partial(
+        datasets.list_invoices, dataset.invoices)
+
+
 if __name__ == "__main__":
     stub = Mock()
     get_lightning_stub(stub)
     assert stub.walletbalance().balance == 82.8
     assert stub.getinfo().alias == 'mock'
+    assert stub.getinfo_future().result().alias == 'mock'
     assert isinstance(stub.listchannels().channels[0], pb.Channel)
     assert len(stub.listinvoices().invoices) > 0
     assert len(stub.listpayments().payments) > 0
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Telegram sends within the flood limits
+"""
+import threading
+import time
+import telepot
+import telepot.api
+import urllib3
+from telepot.exception import TelegramError, TooManyRequestsError
+
+MAX_LENGTH = 4096  # Of a telegram message
+SEPARATOR = '\n\n'
+RETRIES = 3
+TYPING = 5  # Seconds shown by a chat action
+IDLE = 60  # Seconds between the sweeps of the state of quiet chats
+
+
+class TokenBucket:
+    """rate tokens per second, up to burst tokens saved"""
+
+    def __init__(self, rate, burst=1):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Wait for a token"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst,
+                self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            # A token is reserved even if it is not there yet
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def full(self, now=None):
+        """True if the bucket is refilled, as good as a new one"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return (self._tokens + (now - self._updated) * self._rate >=
+                    self._burst)
+
+
+def pack(texts, limit=MAX_LENGTH):
+    """Join consecutive texts into messages of up to limit chars,
+    longer texts are split on lines"""
+    message = ''
+    for text in texts:
+        if not text:
+            continue
+        while len(text) > limit:
+            cut = text.rfind('\n', 0, limit)
+            cut = cut if cut > 0 else limit
+            if message:
+                yield message
+                message = ''
+            yield text[:cut]
+            text = text[cut:].lstrip('\n')
+        if message and len(message) + len(SEPARATOR) + len(text) <= limit:
+            message += SEPARATOR + text
+        else:
+            if message:
+                yield message
+            message = text
+    if message:
+        yield message
+
+
+def pool_connections(size):
+    """Let size requests at a time reuse the connections to telegram,
+    uploads included
+
+    telepot has no public hook for its pools: this replaces the private
+    _default_pool_params, _pools and _which_pool of telepot.api 12.7, the
+    version pinned in requirements.txt. Check them when upgrading."""
+    if not all(hasattr(telepot.api, name) for name in (
+            '_default_pool_params', '_pools', '_which_pool')):
+        print('Unknown telepot version, connection pool left as it is')
+        return
+    params = dict(telepot.api._default_pool_params, maxsize=size)
+    telepot.api._pools['default'] = urllib3.PoolManager(**params)
+    telepot.api._which_pool = lambda req, **user_kw: 'default'
+
+
+class Outbox:
+    """Wrap a telepot Bot: calls are paced by a global and a per chat
+    token bucket and retried after the retry_after of a 429 response
+
+    The callers wait for their turn, their calls keep the order."""
+
+    def __init__(self, bot, rate=30, chat_rate=1, chat_burst=3):
+        self._bot = bot
+        self._bucket = TokenBucket(rate, rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats = {}
+        self._typing = {}
+        self._swept = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _sweep(self, now):
+        """Drop the buckets and typing times of quiet chats, with _lock"""
+        if now - self._swept < IDLE:
+            return
+        self._swept = now
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items()
+                        if bucket.full(now)]:
+            del self._chats[chat_id]
+        for chat_id in [chat_id for chat_id, sent in self._typing.items()
+                        if now - sent >= TYPING]:
+            del self._typing[chat_id]
+
+    def _chat_bucket(self, chat_id):
+        with self._lock:
+            self._sweep(time.monotonic())
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                bucket = self._chats[chat_id] = TokenBucket(
+                    self._chat_rate, self._chat_burst)
+            return bucket
+
+    def _call(self, method, chat_id, *args, **kwargs):
+        for attempt in range(RETRIES + 1):
+            if chat_id is not None:
+                self._chat_bucket(chat_id).take()
+            self._bucket.take()
+            try:
+                return method(*args, **kwargs)
+            except TooManyRequestsError as error:
+                if attempt == RETRIES:
+                    raise
+                parameters = (error.json or {}).get('parameters', {})
+                time.sleep(parameters.get('retry_after', 1))
+
+    def __getattr__(self, name):
+        method = getattr(self._bot, name)
+        if not callable(method):
+            return method
+        if not name.startswith(('send', 'edit')):
+            return lambda *args, **kwargs: self._call(
+                method, None, *args, **kwargs)
+
+        def paced(chat, *args, **kwargs):
+            # edit methods get a (chat_id, message_id) identifier
+            chat_id = chat[0] if isinstance(chat, tuple) else chat
+            return self._call(method, chat_id, chat, *args, **kwargs)
+        return paced
+
+    def sendMessages(self, chat_id, texts):
+        """Send the texts in as few messages as possible"""
+        for message in pack(texts):
+            self.sendMessage(chat_id, message)
+
+    def typing(self, chat_id):
+        """Show the bot is working, at most once in TYPING seconds"""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            if now - self._typing.get(chat_id, -TYPING) < TYPING:
+                return
+            self._typing[chat_id] = now
+        try:
+            self._call(self._bot.sendChatAction, None, chat_id, 'typing')
+        except TelegramError:
+            pass
+
+
+__all__ = [
+    'Outbox',
+    'TokenBucket',
+    'pack',
+    'pool_connections',
+]
@@ -15,7 +15,13 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import io
+import json
+import os
 import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from unittest import mock
 from PIL import Image
 try:
@@ -27,14 +33,82 @@ except ImportError:
 import qrcode
 
 
-def decode(file_name):
-    data = zdecode(Image.open(file_name), symbols=[ZBarSymbol.QRCODE])
+def decode_all(file):
+    """Every qr code of file, a path or a file object"""
+    data = zdecode(Image.open(file), symbols=[ZBarSymbol.QRCODE])
+    return [str(symbol.data, 'ascii') for symbol in data]
+
+
+def decode(file):
+    """file is a path or a file object"""
+    data = decode_all(file)
     if not len(data):
         return
 
-    return str(data[0].data, 'ascii')
+    return data[0]
 
 
 def encode(text, stream):
     img = qrcode.make(text)
-    img.save(stream)
+    img.save(stream, 'PNG')
+
+
+@lru_cache(maxsize=64)
+def render(text):
+    """PNG bytes of the qr code of text"""
+    buffer = io.BytesIO()
+    encode(text, buffer)
+    return buffer.getvalue()
+
+
+class FileIds:
+    """Telegram file_id of the qr codes already sent, by payload
+
+    Only the last max_size payloads are kept. If path is provided the map
+    is saved on disk after every change and it is loaded at creation."""
+
+    def __init__(self, path=None, max_size=256):
+        self._path = path
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._ids = OrderedDict()
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self._path, 'rt') as fd:
+                self._ids = OrderedDict(json.load(fd))
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        if not self._path:
+            return
+        tmp = self._path + '.tmp'
+        with open(tmp, 'wt') as fd:
+            json.dump(list(self._ids.items()), fd)
+        os.replace(tmp, self._path)
+
+    def get(self, payload):
+        with self._lock:
+            file_id = self._ids.get(payload)
+            if file_id:
+                self._ids.move_to_end(payload)
+            return file_id
+
+    def set(self, payload, file_id):
+        with self._lock:
+            self._ids[payload] = file_id
+            self._ids.move_to_end(payload)
+            while len(self._ids) > self._max_size:
+                self._ids.popitem(last=False)
+            self.save()
+
+    def discard(self, payload):
+        with self._lock:
+            if self._ids.pop(payload, None):
+                self.save()
+
+    def __len__(self):
+        return len(self._ids)
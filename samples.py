@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Percentiles of the last measures, latencies and waits
+"""
+import threading
+from collections import deque
+
+SAMPLES = 1024
+
+
+class Samples:
+    """The last size measures, shared by threads"""
+
+    def __init__(self, size=SAMPLES):
+        self._lock = threading.Lock()
+        self._values = deque(maxlen=size)
+
+    def append(self, value):
+        with self._lock:
+            self._values.append(value)
+
+    def __len__(self):
+        return len(self._values)
+
+    def percentiles(self, *ps):
+        """Nearest rank percentiles, None if there are no measures"""
+        with self._lock:
+            ordered = sorted(self._values)
+        if not ordered:
+            return tuple(None for _ in ps)
+        last = len(ordered) - 1
+        return tuple(
+            ordered[min(last, int(round(p / 100 * last)))] for p in ps)
+
+
+__all__ = [
+    'SAMPLES',
+    'Samples',
+]
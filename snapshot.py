@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# unsafepay - because Telegram could empty your channels
+# Copyright (C) 2018-2019  Martino Salvetti
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Node data shared by the renderers of a command
+"""
+
+
+class NodeSnapshot:
+    """Fetch node data once per command
+
+    The fields requested at creation are fetched concurrently, every
+    distinct RPC is issued only once. Other fields are fetched on access."""
+
+    # field: (Lighterer future method, args)
+    FETCHES = {
+        'info': ('getinfo_future', ()),
+        'channels': ('listchannels_future', ()),
+        'active_channels': ('listchannels_future', (True, )),
+        'walletbalance': ('walletbalance_future', ()),
+        'channelbalance': ('channelbalance_future', ()),
+    }
+
+    def __init__(self, lit, *fields):
+        self._lit = lit
+        self._futures = {}
+        for field in fields:
+            self._fetch(field)
+
+    def _fetch(self, field):
+        if field not in self._futures:
+            method, args = self.FETCHES[field]
+            self._futures[field] = getattr(self._lit, method)(*args)
+        return self._futures[field]
+
+    def __getattr__(self, field):
+        if field.startswith('_') or field not in self.FETCHES:
+            raise AttributeError(field)
+        value = self._fetch(field).result()
+        # Next accesses do not go through __getattr__
+        setattr(self, field, value)
+        return value
+
+
+class ChannelView:
+    """Channels of the node with their active flag
+
+    Channels are sorted, public first. active_channels is needed only when
+    Lighter does not provide the active flag of the channels."""
+
+    def __init__(self, channels, active_channels=None):
+        self.channels = sorted(channels, key=lambda x: x.private)
+        self.has_active_flag = any(ch.active for ch in self.channels)
+        self._active = {ch.channel_id for ch in self.channels if ch.active}
+        if active_channels is not None:
+            self._active.update(ch.channel_id for ch in active_channels)
+
+    @classmethod
+    def fields(cls, active_flag):
+        """NodeSnapshot fields required to build the view"""
+        if active_flag:
+            return 'channels',
+        return 'channels', 'active_channels'
+
+    @classmethod
+    def from_snapshot(cls, snapshot, active_flag):
+        if active_flag:
+            return cls(snapshot.channels)
+        return cls(snapshot.channels, snapshot.active_channels)
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    @property
+    def n_active(self):
+        return len(self._active)
+
+    def is_active(self, ch):
+        return ch.channel_id in self._active
+
+
+__all__ = [
+    'ChannelView',
+    'NodeSnapshot',
+]
@@ -16,15 +16,38 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
+import asyncio
+import hashlib
+import io
 import os
+import threading
 import tempfile
-from time import time
+from time import time, sleep
 from unittest import skipIf, skip
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 import re
 from commands import Commands
-from fiat_rate import Fiat, RateError
+from aiolighterer import AsyncLighterer
+from aliases import AliasStore
+from cities import city_of
+from dispatcher import Dispatcher
+from samples import Samples
+from aiobot import LoopBridge, LoopDispatcher
+from outbox import Outbox, TokenBucket, pack
+from invoices import InvoiceIndex, InvoiceWatcher, list_since
+from ledger import PaymentsLedger, TransactionsLedger
+from telepot.exception import TelegramError, TooManyRequestsError
+import bot
+from concurrent.futures import ThreadPoolExecutor, Future
+import lighterer
+import lighter_pb2 as pb
+from fiat_rate import Fiat, RateError, MAX_AGE, Local, Kraken, aggregate
 import qr
+import bolt11
+import datasets
+import fakelighter
+import grpc
+import shutil
 from mocker import load, get_lightning_stub
 
 
@@ -89,6 +112,69 @@ class TestLighterer(unittest.TestCase):
         else:
             self.assertEqual(self.commands._alias(false).split()[0], CITYSCAPE)
 
+    def test_peer_aliases(self):
+        peer = ('030c3f19d742ca294a55c00376b3b355c'
+                '3c90d61c6b6b39554dbc7ac19b141c14f')
+        self.assertEqual(self.commands._alias(peer), 'Mock peer')
+
+    def test_resolve_aliases(self):
+        """Renders start no threads and hash every pubkey once"""
+        pubs = ['02%064x' % n for n in range(50)]
+        city_of.cache_clear()
+        with patch('threading.Thread') as thread:
+            aliases = self.commands.resolve_aliases(pubs)
+            self.commands.resolve_aliases(pubs)
+            self.commands.chs()
+            self.commands.channels()
+        thread.assert_not_called()
+        self.assertEqual(set(aliases), set(pubs))
+        # The other channel peer has an alias
+        self.assertEqual(city_of.cache_info().misses, len(pubs) + 1)
+
+        self.commands._updated = 0
+        with patch('threading.Thread') as thread:
+            self.commands.resolve_aliases(pubs)
+            self.commands.resolve_aliases(pubs)
+        thread.assert_called_once()
+
+    def test_render_during_listpeers(self):
+        """A listpeers in flight does not block the aliases of a render"""
+        lit = self.commands._lit
+        started, release = threading.Event(), threading.Event()
+
+        def listpeers():
+            started.set()
+            release.wait(5)
+            return []
+        self.commands._updated = 0
+        with patch.object(lit, 'listpeers', side_effect=listpeers):
+            self.commands.bg_update_aliases()
+            self.assertTrue(started.wait(5))
+            begin = time()
+            self.commands.resolve_aliases(['02' * 33])
+            self.commands.chs()
+            elapsed = time() - begin
+            release.set()
+        self.assertLess(elapsed, 1)
+
+    def test_alias_store(self):
+        pub = '02' * 33
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'aliases.json')
+            store = AliasStore(path)
+            self.assertEqual(store.merge([(pub, 'new', 'ff0000', 20)]), 1)
+            self.assertEqual(store.merge([(pub, 'old', '00ff00', 10)]), 0)
+            self.assertEqual(store.get(pub), 'new')
+            store.merge_graph({'nodes': [
+                {'pub_key': pub, 'alias': 'newer', 'last_update': 30},
+                {'pub_key': '03' * 33, 'alias': '', 'last_update': 30},
+            ]})
+            self.assertEqual(len(store), 1)
+
+            store = AliasStore(path)
+            self.assertEqual(store.get(pub), 'newer')
+            self.assertGreater(store.graph_updated, 0)
+
     def test_cities_file(self):
         """cities.txt must be ascii encoded"""
         with open('cities.txt', 'rt') as fd:
@@ -143,7 +229,24 @@ class TestLighterer(unittest.TestCase):
         self.assertEqual(output.count(ACTIVE), 1)
         self.assertEqual(output.count(NACTIVE), 1)
 
-    @patch('requests.get')
+    def test_active_flag_single_fetch(self):
+        """Channels are fetched once when Lighter provides the flag"""
+        lit = self.commands._lit
+        chs = [pb.Channel(**kwargs) for kwargs in (
+            dict(remote_pubkey='02' * 33, channel_id='1', active=True),
+            dict(remote_pubkey='03' * 33, channel_id='2', active=False),
+        )]
+        lit.listchannels.return_value = chs
+        self.commands.chs()
+        lit.listchannels_future.reset_mock()
+
+        output = self.commands.chs()
+        self.assertEqual(lit.listchannels_future.call_count, 1)
+        self.assertEqual(output.count(ACTIVE), 1)
+        self.assertEqual(output.count(NACTIVE), 1)
+        self.assertEqual(len(self.commands.channels()), 2)
+
+    @patch('requests.Session.get')
     def test_commands(self, mock_get):
         mock_get.return_value = FakeRequests()
 
@@ -182,6 +285,183 @@ class TestLighterer(unittest.TestCase):
                          1)
         self.assertEqual(len(self.commands.channels('03db61876a', False)), 1)
 
+    @patch('commands.CHANNELS_PAGE', 1)
+    def test_channels_page(self):
+        """Only the cards of the page, the view is fetched once"""
+        lit = self.commands._lit
+        lit.listchannels_future.reset_mock()
+        with patch.object(self.commands, '_channel_card',
+                          wraps=self.commands._channel_card) as card:
+            out, page, pages = self.commands.channels_page(refresh=True)
+            self.assertEqual((page, pages), (0, 2))
+            self.assertEqual(card.call_count, 1)
+            calls = lit.listchannels_future.call_count
+            out, page, pages = self.commands.channels_page(5)
+            self.assertEqual((page, pages), (1, 2))
+            self.assertEqual(lit.listchannels_future.call_count, calls)
+        self.assertTrue(out.endswith('2/2'))
+        self.assertEqual(
+            self.commands.channels_page(0, 'no-one')[0], 'No channels')
+
+    def test_payments(self):
+        out = self.commands.payments()
+        self.assertTrue(out.startswith('1 payments, 0.00005678 btc'))
+        self.assertIn('fees 1.000 sat', out)
+        self.assertEqual(self.commands.payments('2019-05'), 'No payments')
+        self.assertIn('1 payments', self.commands.payments(
+            '2019-06-01', '2019-06-30', '3'))
+        lit = self.commands._lit
+        calls = lit.listpayments.call_count
+        self.commands.payments()
+        self.assertEqual(lit.listpayments.call_count, calls)
+
+    def test_txs(self):
+        out = self.commands.txs()
+        self.assertTrue(out.startswith('1 transactions, 0.00002200 btc'))
+        self.assertIn('fees 2234 sat', out)
+        self.assertIn('4 confirmations', out)
+        self.assertEqual(self.commands.txs('2019-05-01'), 'No transactions')
+
+    def test_payment_search(self):
+        r_hash = ('7a569fb8d75d5e2957473dea4589111a'
+                  '243254018b11b9a59c1ae7297478e270')
+        lit = self.commands._lit
+        self.assertIn(r_hash, self.commands.payment('7a569f'))
+        self.assertIn(r_hash, self.commands.payment('food'))
+        self.assertIn('some food', self.commands.payment('some', 'fo'))
+        self.assertEqual(
+            self.commands.payment('drinks'), 'Invoice not found')
+        lit.checkinvoice.reset_mock()
+        self.assertIn(r_hash, self.commands.payment(r_hash))
+        lit.checkinvoice.assert_not_called()
+
+        # A pending invoice of the index is checked on Lighter
+        pending = pb.Invoice(
+            payment_hash='d3' * 32, description='late drinks',
+            state=pb.PENDING)
+        self.commands.invoices.add([pending])
+        with patch.object(lit, 'checkinvoice', return_value=True):
+            self.assertIn('\U0001f44d', self.commands.payment('drinks'))
+        with patch.object(lit, 'checkinvoice', return_value=False):
+            self.assertIn('\U0001f44e', self.commands.payment('d3d3'))
+
+    def test_add_then_payment(self):
+        lit = self.commands._lit
+        self.commands.invoices.sync(lit)
+        new = pb.Invoice(payment_hash='d3' * 32, state=pb.PENDING)
+        response = pb.CreateInvoiceResponse(
+            payment_request='lnbc1new', payment_hash=new.payment_hash)
+        with patch.object(lit, 'createinvoice', return_value=response), \
+                patch.object(lit, 'listinvoices', return_value=[new]):
+            _, payment_hash = self.commands.add('1000')
+            self.assertIn(payment_hash, self.commands.payment())
+
+    def test_bulkpay(self):
+        key = bytes(range(1, 33))
+        pay_reqs = [
+            bolt11.encode(key, bytes([i] * 32), 10, expiry_time=3600)
+            for i in range(6)]
+        lit = self.commands._lit
+        lit.payinvoice.reset_mock()
+
+        def payinvoice(pay_req):
+            if pay_req == pay_reqs[2]:
+                raise lighterer.RpcError
+            return 'preimage'
+        lit.payinvoice.side_effect = payinvoice
+        out = self.commands.bulkpay(*pay_reqs)
+        self.assertEqual(lit.payinvoice.call_count, 6)
+        self.assertTrue(out.startswith('Paid 5/6, 0.00005000 btc'))
+        self.assertIn('\u274c ' + '02' * 8, out)
+
+        # No fees row when every payment fails
+        lit.payinvoice.side_effect = lighterer.RpcError
+        out = self.commands.bulkpay(*pay_reqs[:2])
+        self.assertTrue(out.startswith('Paid 0/2'))
+        self.assertNotIn('fees', out)
+
+        # Nothing is paid if a request is not valid or over the cap
+        lit.payinvoice.reset_mock()
+        out = self.commands.bulkpay(pay_reqs[0], PAY_REQ, 'lnbc1xyz')
+        self.assertEqual(len(out.splitlines()), 3)
+        self.assertIn('expired', out)
+        self.commands.bulk_cap = 5000
+        self.assertIn('exceeds the cap', self.commands.bulkpay(*pay_reqs))
+        lit.payinvoice.assert_not_called()
+
+    def test_paid_message(self):
+        message = self.commands.paid_message(pb.Invoice(
+            amount_bits=7, description='some food', payment_hash='ab'))
+        self.assertIn('0.00000700', message)
+        self.assertTrue(message.endswith('some food\nab'))
+
+    def test_channels_callback(self):
+        fake_bot = Mock()
+        msg = {
+            'id': 'q', 'from': {'id': 1}, 'chat_instance': 'c',
+            'data': 'channels 1 0 ',
+            'message': {'message_id': 7, 'chat': {'id': 1}}}
+        with patch('bot.bot', fake_bot), patch('bot.authorized', 1), \
+                patch('bot.commands', self.commands), \
+                patch('commands.CHANNELS_PAGE', 1):
+            bot.on_message(msg)
+        (identifier, out), kwargs = fake_bot.editMessageText.call_args
+        self.assertEqual(identifier, (1, 7))
+        self.assertTrue(out.endswith('2/2'))
+        buttons = kwargs['reply_markup'].inline_keyboard[0]
+        self.assertEqual(buttons[0].callback_data, 'channels 0 0 ')
+        fake_bot.answerCallbackQuery.assert_called_once_with('q')
+
+    def test_channels_keyboard(self):
+        """Any filter fits the 64 bytes of the callback data"""
+        keyboard = bot.channels_keyboard(1, 3, '50%off')
+        self.assertEqual(
+            [b.callback_data for b in keyboard.inline_keyboard[0]],
+            ['channels 0 0 50%off', 'channels 0 1 50%off',
+             'channels 2 0 50%off'])
+        keyboard = bot.channels_keyboard(99998, 99999, '\u26a1' * 32, True)
+        for button in keyboard.inline_keyboard[0]:
+            self.assertLessEqual(len(button.callback_data.encode()), 64)
+            self.assertTrue(button.callback_data.endswith('\u26a1'))
+
+    def test_send_channels_error(self):
+        fake_bot = Mock()
+        fake_bot.sendMessage.side_effect = [
+            TelegramError('Bad Request', 400, {}), {}]
+        with patch('bot.bot', fake_bot), \
+                patch('bot.commands', self.commands):
+            bot.send_channels(1, 'x' * 100)
+        self.assertEqual(fake_bot.sendMessage.call_count, 2)
+        self.assertNotIn('reply_markup', fake_bot.sendMessage.call_args[1])
+
+    def test_info_snapshot(self):
+        """info issues every distinct RPC once, through futures"""
+        lit = self.commands._lit
+        self.commands.info()
+        self.assertEqual(lit.getinfo_future.call_count, 1)
+        self.assertEqual(lit.walletbalance_future.call_count, 1)
+        self.assertEqual(lit.channelbalance_future.call_count, 1)
+        self.assertEqual(lit.listchannels_future.call_count, 2)
+
+    def test_stats(self):
+        stats = lighterer.RpcStats()
+        self.commands._lit.stats = stats
+        self.assertEqual(self.commands.stats(), 'No calls, yet')
+        for ms in range(1, 101):
+            stats.record('GetInfo', ms / 1e3, size=100)
+        stats.record('PayInvoice', 2, 'DEADLINE_EXCEEDED')
+        self.assertEqual(stats.percentiles('GetInfo', 50, 95, 99),
+                         (.051, .095, .099))
+        self.assertEqual(stats.summary('PayInvoice'),
+                         (1, {'DEADLINE_EXCEEDED': 1}, 0))
+        self.commands._lit.cache = lighterer.ResponseCache()
+        self.commands._lit.cache.hits['getinfo'] += 3
+        output = self.commands.stats()
+        self.assertIn('cache getinfo 3 hits, 0 misses', output)
+        self.assertIn('GetInfo 100 calls', output)
+        self.assertIn('p50 51 ms, p95 95 ms, p99 99 ms', output)
+        self.assertIn('DEADLINE_EXCEEDED 1', output)
+
     def test_cmd_payment(self):
         PAID = '\U0001f44d'
         NOT_PAID = '\U0001f44e'
@@ -220,23 +500,26 @@ class TestLighterer(unittest.TestCase):
         # self.assertIn('Settled on', self.commands.payment(r_hash))
 
     def test_decode(self):
-
-        enc_payreq = self.commands.add('1.23')[0]
+        key = bytes.fromhex(
+            'e126f68f7eafcc8b74f54d269fe206be715000f94dac067d1c04a8ca3b2db734')
+        enc_payreq = bolt11.encode(
+            key, bytes(32), 123000, description='some beer',
+            expiry_time=3600)
+        lit = self.commands._lit
+        lit.decodeinvoice.reset_mock()
         dec_payreq = self.commands.decode(enc_payreq)
         # self.assertIn('To ', dec_payreq) -> Aliases are not supported yet
         self.assertIn('Pubkey ', dec_payreq)
         self.assertIn('Amount ', dec_payreq)
         self.assertIn('Description ', dec_payreq)
         self.assertIn('Created on ', dec_payreq)
-        self.assertIn('Expires ', dec_payreq)  # TODO: test expired
+        self.assertIn('Expires ', dec_payreq)
+        lit.decodeinvoice.assert_not_called()
 
         # Optional outputs
-        cls = build_lighterer_mock('nodescription')
-        with patch('lighterer.Lighterer', cls):
-            nodesc = Commands('fake', 0, None, None)
-
-        dec_payreq = nodesc.decode(enc_payreq)
+        dec_payreq = self.commands.decode(PAY_REQ)
         self.assertNotIn('Description ', dec_payreq)
+        self.assertIn('Expired on ', dec_payreq)
 
         # TODO: implement aliases
         # Test: invoice without alias
@@ -250,6 +533,644 @@ class TestLighterer(unittest.TestCase):
         self.assertIn('This is not a payment request', error.decode('No'))
 
 
+class TestBolt11(unittest.TestCase):
+
+    KEY = bytes.fromhex(
+        'e126f68f7eafcc8b74f54d269fe206be715000f94dac067d1c04a8ca3b2db734')
+    PUBKEY = ('03e7156ae33b0a208d0744199163177e'
+              '909e80176e55d97a2f221ede0f934dd9ad')
+
+    def test_decode(self):
+        decoded = bolt11.decode(PROTOCOL + PAY_REQ)
+        self.assertEqual(decoded.amount_bits, 1)
+        self.assertEqual(decoded.timestamp, 1559578646)
+        self.assertEqual(decoded.expiry_time, 3600)
+        self.assertEqual(decoded.min_final_cltv_expiry, 40)
+        self.assertEqual(len(decoded.payment_hash), 64)
+        self.assertEqual(len(decoded.destination_pubkey), 66)
+
+    def test_round_trip(self):
+        pay_req = bolt11.encode(
+            self.KEY, bytes(range(32)), 2500, 1496314658, '1 cup coffee',
+            expiry_time=60, min_final_cltv_expiry=18)
+        self.assertTrue(pay_req.startswith('lnbc2500u1'))
+        decoded = bolt11.decode(pay_req.upper())
+        self.assertEqual(decoded.destination_pubkey, self.PUBKEY)
+        self.assertEqual(decoded.payment_hash, bytes(range(32)).hex())
+        self.assertEqual(decoded.description, '1 cup coffee')
+        self.assertEqual(
+            (decoded.amount_bits, decoded.timestamp, decoded.expiry_time,
+             decoded.min_final_cltv_expiry), (2500, 1496314658, 60, 18))
+
+    def test_invalid(self):
+        for pay_req in ('No', PAY_REQ[:-1] + 'q', PAY_REQ[:60]):
+            with self.assertRaises(bolt11.InvoiceError):
+                bolt11.decode(pay_req)
+        # A signature of another payee
+        hrp, data = bolt11.bech32_decode(bolt11.encode(
+            self.KEY, bytes(32), description='x'))
+        data[-20] ^= 1
+        with self.assertRaises(bolt11.InvoiceError):
+            bolt11.decode(bolt11.bech32_encode(hrp, data))
+
+
+class TestLightererOptions(unittest.TestCase):
+
+    def test_options(self):
+        options = lighterer.read_options({
+            'host': 'localhost', 'timeout': '3', 'timeout_getinfo': '1'})
+        self.assertEqual(options, {'timeout': 3., 'timeout_getinfo': 1.})
+        options = dict(lighterer.DEFAULT_OPTIONS, **options)
+        self.assertEqual(lighterer.method_timeout(
+            options, '/lighter.Lightning/GetInfo'), 1)
+        self.assertEqual(lighterer.method_timeout(
+            options, b'/lighter.Lightning/ListChannels'), 3)
+        self.assertEqual(lighterer.method_timeout(
+            options, '/lighter.Lightning/PayInvoice'), 120)
+
+    def test_not_reachable(self):
+        lit = lighterer.Lighterer(
+            '127.0.0.1', 1, options={'connect_timeout': .1, 'timeout': 1})
+        self.assertFalse(lit.wait_ready(.1))
+        with self.assertRaises(lighterer.RpcError):
+            lit.getinfo()
+        self.assertEqual(lit.stats.summary('GetInfo'),
+                         (1, {'UNAVAILABLE': 1}, 0))
+
+    def test_cache(self):
+        def done(response):
+            future = Future()
+            future.set_result(response)
+            return future
+
+        lit = lighterer.Lighterer(
+            '127.0.0.1', 1, options={'connect_timeout': .1})
+        lit.stub = Mock()
+        lit.stub.GetInfo.future.return_value = done(pb.GetInfoResponse())
+        lit.stub.ChannelBalance.future.side_effect = lambda request: done(
+            pb.ChannelBalanceResponse(balance=5))
+        lit.stub.DecodeInvoice.future.return_value = done(
+            pb.DecodeInvoiceResponse(amount_bits=7))
+        lit.getinfo()
+        lit.getinfo()
+        self.assertEqual(lit.stub.GetInfo.future.call_count, 1)
+        self.assertEqual(lit.channelbalance(), 5)
+        lit.channelbalance()
+        lit.payinvoice(PAY_REQ)
+        self.assertEqual(lit.channelbalance(), 5)
+        self.assertEqual(lit.stub.ChannelBalance.future.call_count, 2)
+        for _ in range(3):
+            self.assertEqual(lit.decodeinvoice(PAY_REQ).amount_bits, 7)
+        self.assertEqual(lit.stub.DecodeInvoice.future.call_count, 1)
+        self.assertEqual(lit.cache.hits['decodeinvoice'], 2)
+        self.assertEqual(lit.cache.misses['channelbalance'], 2)
+        lit.close_connection()
+
+    def test_cache_concurrent_misses(self):
+        """Simultaneous misses issue one RPC and share its future"""
+        cache = lighterer.ResponseCache()
+        started = threading.Barrier(8)
+
+        def call():
+            sleep(.05)  # Starting the RPC takes a while
+            return Future()
+
+        rpc = Mock(side_effect=call)
+
+        def get(_):
+            started.wait()
+            return cache.get('getinfo', (), rpc, ttl=5)
+
+        with ThreadPoolExecutor(8) as executor:
+            futures = list(executor.map(get, range(8)))
+        self.assertEqual(rpc.call_count, 1)
+        self.assertTrue(all(f is futures[0] for f in futures))
+        self.assertEqual(cache.hits['getinfo'], 7)
+
+
+class TestAsyncLighterer(unittest.TestCase):
+
+    def test_calls(self):
+        async def calls():
+            async with AsyncLighterer('localhost', 1) as lit:
+                lit.stub = Mock()
+                lit.stub.WalletBalance = AsyncMock(
+                    return_value=pb.WalletBalanceResponse(balance=82.8))
+                lit.stub.ListChannels = AsyncMock(
+                    return_value=pb.ListChannelsResponse(
+                        channels=[pb.Channel(channel_id='1')]))
+                lit.stub.GetInfo = AsyncMock(
+                    return_value=pb.GetInfoResponse(alias='mock'))
+                return await asyncio.gather(
+                    lit.walletbalance(), lit.listchannels(True),
+                    lit.getinfo())
+
+        balance, channels, info = asyncio.run(calls())
+        self.assertEqual(balance, 82.8)
+        self.assertEqual(channels[0].channel_id, '1')
+        self.assertEqual(info.alias, 'mock')
+
+
+class TestDispatcher(unittest.TestCase):
+
+    def test_ordering(self):
+        handled = []
+        lock = threading.Lock()
+
+        def handler(msg):
+            sleep(msg['sleep'])
+            with lock:
+                handled.append((msg['chat']['id'], msg['text']))
+
+        def msg(chat_id, text, sleep=0):
+            return {'chat': {'id': chat_id}, 'text': text, 'sleep': sleep}
+
+        dispatcher = Dispatcher(
+            handler, 4, lambda msg: msg['text'] == 'ping')
+        dispatcher(msg(1, 'pay', .2))
+        dispatcher(msg(1, 'balance'))
+        dispatcher(msg(1, 'ping'))
+        dispatcher(msg(2, 'info'))
+        self.assertGreaterEqual(dispatcher.depth(), 1)
+        dispatcher.shutdown()
+
+        self.assertEqual(dispatcher.depth(), 0)
+        # Other chats and read-only commands do not wait for pay
+        self.assertEqual(handled[-2:], [(1, 'pay'), (1, 'balance')])
+        self.assertEqual(
+            set(handled[:2]), {(1, 'ping'), (2, 'info')})
+        p50, = dispatcher.wait_percentiles(50)
+        self.assertLess(p50, .2)
+
+    def test_samples(self):
+        samples = Samples(size=100)
+        self.assertEqual(samples.percentiles(50), (None, ))
+        for value in range(200):
+            samples.append(value)
+        self.assertEqual(len(samples), 100)
+        self.assertEqual(samples.percentiles(0, 50, 100), (100, 150, 199))
+
+
+class TestAioBot(unittest.TestCase):
+
+    def test_bridge(self):
+        class Target:
+            value = 7
+
+            async def double(self, x):
+                await asyncio.sleep(0)
+                return 2 * x
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            bridge = LoopBridge(Target(), loop)
+            with ThreadPoolExecutor(1) as executor:
+                return await loop.run_in_executor(executor, lambda: (
+                    bridge.double(3), bridge.double_future(4).result(),
+                    bridge.value))
+
+        self.assertEqual(asyncio.run(run()), (6, 8, 7))
+
+    def test_dispatcher_ordering(self):
+        handled = []
+
+        def handler(msg):
+            sleep(msg['sleep'])
+            handled.append(msg['text'])
+
+        def msg(text, sleep=0):
+            return {'chat': {'id': 1, 'type': 'private'}, 'message_id': 1,
+                    'text': text, 'sleep': sleep}
+
+        async def run():
+            with ThreadPoolExecutor(4) as executor:
+                dispatcher = LoopDispatcher(
+                    handler, executor, lambda msg: msg['text'] == 'ping')
+                await asyncio.gather(
+                    dispatcher.handle(msg('pay', .1)),
+                    dispatcher.handle(msg('balance')),
+                    dispatcher.handle(msg('ping')))
+                return dispatcher.depth(), len(dispatcher._locks)
+
+        self.assertEqual(asyncio.run(run()), (0, 0))
+        self.assertEqual(handled, ['ping', 'pay', 'balance'])
+
+
+class TestInvoiceWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.invoices = {}
+        self.lit = Mock()
+
+        def listinvoices(max_items=200, search_timestamp=None,
+                         paid=False, pending=False, **kwargs):
+            states = {0} if paid else set()
+            states |= {1} if pending else set()
+            return sorted(
+                (invoice for invoice in self.invoices.values()
+                 if invoice.state in states and
+                 invoice.timestamp >= (search_timestamp or 0)),
+                key=lambda invoice: invoice.timestamp)[:max_items]
+        self.lit.listinvoices.side_effect = listinvoices
+
+    def add(self, payment_hash, timestamp, state=1):
+        self.invoices[payment_hash] = pb.Invoice(
+            payment_hash=payment_hash, timestamp=timestamp, state=state,
+            expiry_time=10 ** 6)
+
+    def test_notify(self):
+        paid = []
+        now = int(time())
+        self.add('old', 1000, 0)
+        self.add('open', now - 100)
+        watcher = InvoiceWatcher(
+            self.lit, lambda invoice: paid.append(invoice.payment_hash),
+            max_items=2)
+        watcher.poll()
+        self.add('new', now + 1)
+        self.add('new2', now + 2)
+        self.add('new3', now + 2)
+        watcher.poll()
+        self.assertEqual(paid, [])
+        self.invoices['open'].state = 0
+        self.invoices['new2'].state = 0
+        watcher.poll()
+        watcher.poll()
+        self.assertEqual(sorted(paid), ['new2', 'open'])
+        # The cursor moves to the oldest invoice still pending
+        self.invoices['new'].state = 0
+        calls = self.lit.listinvoices.call_count
+        watcher.poll()
+        self.assertEqual(
+            self.lit.listinvoices.call_args_list[calls][0][1], now + 1)
+        self.assertEqual(paid[-1], 'new')
+
+
+class TestLedger(unittest.TestCase):
+
+    @staticmethod
+    def payments(n, first=0):
+        return [
+            pb.Payment(payment_hash='%064x' % i, amount_bits=i,
+                       timestamp=1000 + i, fee_base_msat=1000)
+            for i in range(first, first + n)]
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'payments.jsonl')
+            ledger = PaymentsLedger(path)
+            self.assertEqual(ledger.merge(self.payments(100)), 100)
+            self.assertEqual(ledger.merge(self.payments(110, 50)), 60)
+            with open(path) as fd:
+                self.assertEqual(len(fd.readlines()), 160)
+            ledger = PaymentsLedger(path)
+        self.assertEqual(len(ledger), 160)
+        self.assertIn('%064x' % 159, ledger)
+
+    def test_confirmations(self):
+        def tx(txid, confirmations):
+            return pb.Transaction(
+                txid=txid, amount_bits=10, timestamp=1000,
+                num_confirmations=confirmations, dest_addresses=['a'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'txs.jsonl')
+            ledger = TransactionsLedger(path)
+            self.assertEqual(ledger.merge([tx('a', 1), tx('b', 6)]), 2)
+            self.assertEqual(ledger.merge([tx('a', 2), tx('b', 7)]), 0)
+            self.assertEqual(ledger.merge([tx('a', 6), tx('b', 8)]), 0)
+            ledger.merge([tx('a', 7)])
+            with open(path) as fd:
+                self.assertEqual(len(fd.readlines()), 4)
+            ledger = TransactionsLedger(path)
+        confirmations = {
+            tx['txid']: tx['num_confirmations'] for tx in ledger.between()}
+        self.assertEqual(confirmations, {'a': 6, 'b': 6})
+        self.assertEqual(ledger.between()[0]['dest_addresses'], ['a'])
+
+    def test_query(self):
+        ledger = PaymentsLedger()
+        ledger.merge(reversed(self.payments(30)))
+        count, totals = ledger.totals(1010, 1020)
+        self.assertEqual(count, 10)
+        self.assertEqual(totals['amount_bits'], sum(range(10, 20)))
+        self.assertEqual(totals['fee_base_msat'], 10000)
+        page = ledger.between(1010, 1020, 5, 3)
+        self.assertEqual(
+            [payment['timestamp'] for payment in page], [1014, 1013, 1012])
+        self.assertEqual(ledger.between(1010, 1020, 10), [])
+
+
+class TestInvoiceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = InvoiceIndex()
+        self.index.add(
+            pb.Invoice(payment_hash='%064x' % i, timestamp=i,
+                       description='coffee %d at the bar' % i)
+            for i in range(100))
+        self.index.add([pb.Invoice(
+            payment_hash='ab' * 32, timestamp=50, description='Tea')])
+
+    def test_prefix(self):
+        found = self.index.by_prefix('0' * 62 + '1')
+        self.assertEqual(
+            [invoice.timestamp for invoice in found], [31, 30, 29, 28, 27,
+                                                       26, 25, 24, 23, 22])
+        self.assertEqual(len(self.index.by_prefix('ABAB')), 1)
+        self.assertEqual(self.index.by_prefix('ff'), [])
+
+    def test_search(self):
+        self.assertEqual(len(self.index.search('coffee', limit=200)), 100)
+        self.assertEqual(self.index.search('cof 42')[0].timestamp, 42)
+        self.assertEqual(self.index.search('tea')[0].payment_hash, 'ab' * 32)
+        self.assertEqual(self.index.search('tea coffee'), [])
+        self.assertEqual(self.index.newest, 99)
+
+    def test_sync(self):
+        invoices = [pb.Invoice(payment_hash='%064x' % i, timestamp=i + 1)
+                    for i in range(25)]
+
+        def listinvoices(max_items, since=None, **kwargs):
+            if not since:
+                return invoices[-max_items:]
+            return [i for i in invoices if i.timestamp >= since][:max_items]
+
+        lit = Mock()
+        lit.listinvoices.side_effect = listinvoices
+        index = InvoiceIndex()
+        index.sync(lit, max_items=10)
+        self.assertEqual(index.by_prefix('0' * 64)[0].timestamp, 1)
+        self.assertEqual(len(index.by_prefix('0' * 62, limit=100)), 25)
+        self.assertTrue(index.synced)
+
+        # More invoices than a page share a timestamp
+        for i in range(25, 50):
+            invoices.append(pb.Invoice(
+                payment_hash='%064x' % i, timestamp=30))
+        index.sync(lit, max_items=10)
+        self.assertEqual(len(index), 50)
+        pages = list(list_since(lit, 1, 10))
+        self.assertEqual(
+            sum(len(page) for page in pages), len(invoices))
+
+
+class TestDatasets(unittest.TestCase):
+
+    def test_generate(self):
+        data = datasets.generate(50, seed=3)
+        self.assertEqual(data.channels, datasets.generate(50, seed=3).channels)
+        self.assertNotEqual(data.channels, datasets.generate(50).channels)
+        self.assertEqual(len(data.invoices), 50)
+        for ch in data.channels:
+            self.assertLessEqual(
+                ch.local_balance + ch.remote_balance, ch.capacity)
+        for payment in data.payments:
+            self.assertEqual(hashlib.sha256(bytes.fromhex(
+                payment.payment_preimage)).hexdigest(), payment.payment_hash)
+        # Callers get their own copies
+        data.channels[0].capacity = 0
+        self.assertTrue(datasets.generate(50, seed=3).channels[0].capacity)
+
+    def test_list_invoices(self):
+        invoices = datasets.generate(50).invoices
+        newest = datasets.list_invoices(invoices, 5)
+        self.assertEqual(newest, invoices[-5:])
+        since = invoices[10].timestamp
+        self.assertEqual(
+            datasets.list_invoices(invoices, 3, since), invoices[10:13])
+        older = datasets.list_invoices(
+            invoices, 3, since, 'DESCENDING', 'DESCENDING')
+        self.assertEqual(older, invoices[8:11][::-1])
+        paid = datasets.list_invoices(invoices, 100, paid=True)
+        self.assertTrue(all(i.state == pb.PAID for i in paid))
+
+    def test_cached(self):
+        build = Mock(return_value={'a': 1})
+        with tempfile.TemporaryDirectory() as cache, \
+                patch('datasets.CACHE_DIR', cache):
+            self.assertEqual(datasets.cached('x', b'v1', build),
+                             datasets.cached('x', b'v1', build))
+            self.assertEqual(build.call_count, 1)
+            datasets.cached('x', b'v2', build)
+            self.assertEqual(build.call_count, 2)
+        # Payment requests are signed by bolt11
+        with open(bolt11.__file__, 'rb') as fd:
+            self.assertIn(fd.read(), datasets._source())
+
+    def test_scaled_stub(self):
+        lit = get_lightning_stub(Mock(), size=300)
+        self.assertEqual(len(lit.listchannels_future().result()), 300)
+        index = InvoiceIndex()
+        index.sync(lit)
+        self.assertEqual(len(index.by_prefix('', limit=1000)), 300)
+        self.assertIsNot(load()['lightning_stub'][0]['return'],
+                         load()['lightning_stub'][0]['return'])
+
+
+class TestFakeLighter(unittest.TestCase):
+
+    def serve(self, **options):
+        options = dict({'port': '0', 'size': '20', 'tls': 'no'}, **options)
+        server, lightning, port = fakelighter.serve(options)
+        self.addCleanup(server.stop, None)
+        return lightning, port
+
+    def test_behavior(self):
+        behavior = fakelighter.Behavior({
+            'latency': 'fixed 0.5', 'latency_getinfo': 'uniform 1 2',
+            'error_rate_payinvoice': '1', 'throughput': '1000'})
+        self.assertEqual(behavior.latency('listpeers'), 0.5)
+        self.assertTrue(1 <= behavior.latency('getinfo') <= 2)
+        self.assertEqual(
+            behavior.fault('payinvoice'), grpc.StatusCode.UNAVAILABLE)
+        self.assertIsNone(behavior.fault('getinfo'))
+        self.assertEqual(behavior.transfer('listchannels', 2000), 2)
+
+    def test_faults(self):
+        _, port = self.serve(
+            error_rate_getinfo='1', error_code='RESOURCE_EXHAUSTED',
+            latency_listpeers='fixed 0.2')
+        lit = lighterer.Lighterer('127.0.0.1', port)
+        with self.assertRaises(grpc.RpcError) as raised:
+            lit.getinfo()
+        self.assertEqual(
+            raised.exception.code(), grpc.StatusCode.RESOURCE_EXHAUSTED)
+        start = time()
+        self.assertEqual(len(lit.listchannels()), 20)
+        lit.listpeers()
+        self.assertGreaterEqual(time() - start, 0.2)
+
+    def test_locked(self):
+        lightning, port = self.serve(password='secret')
+        lit = lighterer.Lighterer('127.0.0.1', port)
+        with self.assertRaises(grpc.RpcError) as raised:
+            lit.walletbalance()
+        self.assertEqual(
+            raised.exception.code(), grpc.StatusCode.UNIMPLEMENTED)
+        unlocker = fakelighter.pb_grpc.UnlockerStub(lit._channel)
+        unlocker.UnlockLighter(pb.UnlockLighterRequest(password='secret'))
+        self.assertFalse(lightning.locked)
+        self.assertTrue(lit.walletbalance())
+
+    def test_async_unlock(self):
+        lightning, port = self.serve(password='secret')
+
+        async def unlock():
+            async with AsyncLighterer('127.0.0.1', port) as lit:
+                with self.assertRaises(grpc.RpcError):
+                    await lit.unlocklighter('wrong')
+                self.assertTrue(lightning.locked)
+                await lit.unlocklighter('secret')
+                return await lit.walletbalance()
+
+        self.assertTrue(asyncio.run(unlock()))
+        self.assertFalse(lightning.locked)
+
+    @skipIf(not shutil.which('openssl'), 'openssl is missing')
+    def test_commands(self):
+        """The bot commands through TLS and macaroon"""
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {
+                name: os.path.join(tmp, name)
+                for name in ('cert', 'key', 'macaroon')}
+            _, port = self.serve(tls='yes', settle_after='0.1', **paths)
+            commands = Commands(
+                '127.0.0.1', port, paths['cert'], paths['macaroon'],
+                fiat=Fiat(sources=[Local({'eur': 8000.})]))
+            self.assertIn('fake lighter', commands.info())
+            self.assertEqual(len(commands.channels()), 20)
+            lit = commands._lit
+            invoice = lit.createinvoice(1.5, 'coffee')
+            self.assertEqual(lit.decodeinvoice(
+                invoice.payment_request).description, 'coffee')
+            sleep(0.3)
+            self.assertTrue(lit.checkinvoice(invoice.payment_hash))
+            cert = lighterer.Lighterer.read_cert(paths['cert'])
+            bad = lighterer.Lighterer('127.0.0.1', port, cert, b'00')
+            with self.assertRaises(grpc.RpcError) as raised:
+                bad.getinfo()
+            self.assertEqual(
+                raised.exception.code(), grpc.StatusCode.UNAUTHENTICATED)
+
+
+class TestOutbox(unittest.TestCase):
+
+    def test_pack(self):
+        self.assertEqual(list(pack(['a', '', 'b', 'c'], 5)), ['a\n\nb', 'c'])
+        long = '\n'.join(['x' * 3] * 4)
+        self.assertTrue(all(len(m) <= 8 for m in pack([long, 'y'], 8)))
+        channels = ['channel %d\nactive' % i for i in range(200)]
+        self.assertLess(len(list(pack(channels))), 5)
+
+    def test_bucket(self):
+        bucket = TokenBucket(100, 2)
+        start = time()
+        for _ in range(6):
+            bucket.take()
+        self.assertGreaterEqual(time() - start, .035)
+
+    def test_retry_after(self):
+        telegram = Mock()
+        telegram.sendMessage.side_effect = [
+            TooManyRequestsError(
+                'Too Many Requests', 429, {'parameters': {'retry_after': 0}}),
+            {'message_id': 1}]
+        outbox = Outbox(telegram)
+        self.assertEqual(outbox.sendMessage(1, 'hi'), {'message_id': 1})
+        self.assertEqual(telegram.sendMessage.call_count, 2)
+
+    def test_typing(self):
+        telegram = Mock()
+        outbox = Outbox(telegram)
+        outbox.typing(1)
+        outbox.typing(1)
+        telegram.sendChatAction.assert_called_once_with(1, 'typing')
+
+    def test_sweep(self):
+        """The state of quiet chats is dropped"""
+        outbox = Outbox(Mock(), chat_rate=10)
+        for chat_id in range(10):
+            outbox.sendMessage(chat_id, 'hi')
+            outbox.typing(chat_id)
+        outbox.sendMessage(10, 'hi')
+        self.assertEqual(len(outbox._chats), 11)
+        with patch('outbox.IDLE', 0), patch('outbox.TYPING', 0.2):
+            sleep(0.3)
+            outbox.typing(51)
+            outbox.sendMessage(51, 'hi')
+        self.assertEqual(set(outbox._chats), {51})
+        self.assertEqual(set(outbox._typing), {51})
+
+
+class TestPhoto(unittest.TestCase):
+
+    def test_smallest_first(self):
+        sizes = [
+            {'file_id': 'big', 'file_size': 900},
+            {'file_id': 'small', 'file_size': 100},
+            {'file_id': 'mid', 'file_size': 400},
+        ]
+        downloaded = []
+
+        def download_file(file_id, dest):
+            downloaded.append(file_id)
+            dest.write(file_id.encode())
+
+        def decode_all(file):
+            return [PAY_REQ] if file.read() == b'mid' else []
+
+        fake_bot = Mock()
+        fake_bot.download_file.side_effect = download_file
+        with patch('bot.bot', fake_bot), patch('bot.decode_all', decode_all):
+            self.assertEqual(bot.decode_photo(sizes), [PAY_REQ])
+        self.assertEqual(downloaded, ['small', 'mid'])
+
+    def test_document(self):
+        csv = 'name,invoice\nalice,{}\nbob,lightning:{}\n'.format(
+            PAY_REQ, PAY_REQ.upper())
+        fake_bot = Mock()
+        fake_bot.download_file.side_effect = \
+            lambda file_id, dest: dest.write(csv.encode())
+        fake_commands = Mock()
+        fake_commands.bulkpay.return_value = 'Paid 2/2'
+        msg = {
+            'message_id': 1, 'chat': {'id': 1, 'type': 'private'},
+            'date': 0, 'document': {
+                'file_id': 'f', 'mime_type': 'text/csv', 'file_size': 99}}
+        with patch('bot.bot', fake_bot), \
+                patch('bot.commands', fake_commands):
+            bot.document(msg)
+        fake_commands.bulkpay.assert_called_once_with(
+            PAY_REQ, 'lightning:' + PAY_REQ.upper())
+        fake_bot.sendMessage.assert_called_once_with(1, 'Paid 2/2')
+
+    @patch('tempfile.mkstemp', Mock(side_effect=AssertionError))
+    def test_send_qr(self):
+        fake_bot = Mock()
+        fake_bot.sendPhoto.return_value = {}
+        with patch('bot.bot', fake_bot), patch('bot.qr_files', qr.FileIds()):
+            bot.send_qr(1, PAY_REQ)
+        chat_id, (name, fd), caption = fake_bot.sendPhoto.call_args[0]
+        self.assertEqual(caption, PAY_REQ)
+        self.assertTrue(fd.read().startswith(b'\x89PNG'))
+
+    def test_send_qr_file_id(self):
+        fake_bot = Mock()
+        fake_bot.sendPhoto.return_value = {
+            'photo': [{'file_id': 'small'}, {'file_id': 'large'}]}
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('bot.bot', fake_bot), \
+                patch('bot.qr_files', qr.FileIds(tmp + '/qr.json')), \
+                patch('bot.render', wraps=qr.render) as render:
+            bot.send_qr(1, PAY_REQ)
+            bot.send_qr(1, PAY_REQ)
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(fake_bot.sendPhoto.call_args[0][1], 'large')
+            self.assertEqual(
+                qr.FileIds(tmp + '/qr.json').get(PAY_REQ), 'large')
+
+
 class TestQr(unittest.TestCase):
 
     def test_encode(self):
@@ -258,6 +1179,13 @@ class TestQr(unittest.TestCase):
             qr.encode(PAY_REQ, fd)
         os.remove(name)
 
+    @skipIf(isinstance(qr.ZBarSymbol, Mock), 'pyzbar not found')
+    def test_decode_buffer(self):
+        buffer = io.BytesIO()
+        qr.encode(PAY_REQ, buffer)
+        buffer.seek(0)
+        self.assertEqual(qr.decode(buffer), PAY_REQ)
+
     @skipIf(isinstance(qr.ZBarSymbol, Mock), 'pyzbar not found')
     def test_decode(self):
         _, name = tempfile.mkstemp(prefix='unsafepaytests')
@@ -319,7 +1247,7 @@ class TestFiatRate(unittest.TestCase):
         self.assertRegex(fiat.to_fiat_str(7), '^\d*\.\d{2} €')
         self.assertRegex(fiat.to_fiat_str(1000), '^\d*\.\d{2} €')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_kraken_mock(self, mock_get):
 
         mock_get.return_value = FakeRequests()
@@ -328,7 +1256,111 @@ class TestFiatRate(unittest.TestCase):
         fiat = Fiat()
         self.assertAlmostEqual(fiat.get_rate(), expected_price)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
+    def test_stale_while_revalidate(self, mock_get):
+        mock_get.return_value = FakeRequests()
+        expected_price = float(FakeRequests.DATA['result']['XXBTZEUR']['c'][0])
+
+        fiat = Fiat()
+        fiat._cache = {'eur': (3000, time() - MAX_AGE - 1)}
+        with patch.object(fiat, 'refresh') as refresh:
+            rate, age = fiat.get_rate_age()
+        self.assertEqual(rate, 3000)
+        self.assertGreater(age, MAX_AGE)
+        refresh.assert_called_once_with()
+        mock_get.assert_not_called()
+
+        fiat.update()
+        self.assertAlmostEqual(fiat.get_rate(), expected_price)
+        self.assertLess(fiat.age(), 1)
+
+    @patch('requests.Session.get')
+    def test_persistent_rate(self, mock_get):
+        mock_get.return_value = FakeRequests()
+        expected_price = float(FakeRequests.DATA['result']['XXBTZEUR']['c'][0])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'rate.json')
+            Fiat(path).get_rate()
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertAlmostEqual(Fiat(path).get_rate(), expected_price)
+            self.assertEqual(mock_get.call_count, 1)
+
+    def test_multi_currency(self):
+        sources = [
+            Local({'eur': 3000, 'usd': 3500, 'chf': 3400}),
+            Local({'eur': 3010, 'usd': 3510}),
+            Local({'eur': 9000, 'usd': 3490}),  # outlier
+        ]
+        fiat = Fiat(currencies=('usd', 'eur', 'chf'), sources=sources)
+        self.assertEqual(fiat.get_rate(), 3500)
+        self.assertEqual(fiat.get_rate(currency='eur'), 3005)
+        self.assertEqual(fiat.get_rate(currency='chf'), 3400)
+        self.assertEqual(fiat.to_fiat_str(1e8), '$3500.00')
+        self.assertEqual(fiat.to_satoshis(35, currency='usd'), 1000000)
+        with self.assertRaises(RateError):
+            fiat.get_rate(currency='gbp')
+        self.assertEqual(aggregate([1, 1.01, 10]), 1.005)
+
+    def test_disagreeing_sources(self):
+        """No price close to the median, their median is used"""
+        self.assertEqual(aggregate([8000., 9000.]), 8500.)
+        fiat = Fiat(sources=[Local({'eur': 8000.}), Local({'eur': 9000.})])
+        self.assertEqual(fiat.get_rate(), 8500.)
+
+    def test_update_survives(self):
+        fiat = Fiat(sources=[Local({'eur': 8000.})])
+        with patch.object(fiat, 'fetch', side_effect=ZeroDivisionError):
+            fiat.update()
+        self.assertTrue(fiat._fetch_lock.acquire(blocking=False))
+
+    def test_refresh_once(self):
+        """Stale reads start one refresh while the sources are down"""
+        fiat = Fiat(sources=[Local({})])
+        fiat._cache['eur'] = (3000, time() - MAX_AGE - 1)
+        with patch('threading.Thread') as thread:
+            for _ in range(20):
+                self.assertEqual(fiat.get_rate(), 3000)
+        thread.assert_called_once()
+        fiat._refresher = Mock()
+        fiat._tried = 0
+        fiat.get_rate()
+        self.assertTrue(fiat._wakeup.is_set())
+
+    def test_cold_start_fetches_once(self):
+        source = Local({'eur': 3000.})
+        calls = []
+
+        def fetch(session, currencies):
+            calls.append(currencies)
+            sleep(0.05)
+            return {'eur': 3000.}
+        source.fetch = fetch
+        fiat = Fiat(sources=[source])
+        with ThreadPoolExecutor(8) as executor:
+            rates = list(executor.map(lambda _: fiat.get_rate(), range(8)))
+        self.assertEqual(rates, [3000.] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_parse(self):
+        self.assertEqual(Fiat.parse('6.7€'), (6.7, 'eur'))
+        self.assertEqual(Fiat.parse('6.9E'), (6.9, 'eur'))
+        self.assertEqual(Fiat.parse('$5'), (5, 'usd'))
+        self.assertEqual(Fiat.parse('CHF 5'), (5, 'chf'))
+        self.assertEqual(Fiat.parse('£.5'), (.5, 'gbp'))
+        self.assertIsNone(Fiat.parse('0.001'))
+        self.assertIsNone(Fiat.parse('123'))
+        self.assertIsNone(Fiat.parse('$5$'))
+
+    @patch('requests.Session.get')
+    def test_kraken_batch(self, mock_get):
+        mock_get.return_value = FakeRequests()
+        fiat = Fiat(currencies=('eur', 'usd'), sources=[Kraken()])
+        fiat.get_rate()
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('pair=BTCEUR,BTCUSD', mock_get.call_args[0][0])
+
+    @patch('requests.Session.get')
     def test_kraken_mock_error(self, mock_get):
         mock_get.return_value = FakeRateError()
 
@@ -336,7 +1368,7 @@ class TestFiatRate(unittest.TestCase):
         with self.assertRaises(RateError):
             fiat.get_rate()
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_commands_with_rate(self, mock_get):
         mock_get.return_value = FakeRequests()
 
@@ -357,7 +1389,7 @@ class TestFiatRate(unittest.TestCase):
         self.assertTrue(self.commands.is_pay_req(PAY_REQ))
         self.assertTrue(re.match('^(bc|tb)1', self.commands.address()))
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_commands_without_rate(self, mock_get):
         mock_get.return_value = FakeRateError()
 